@@ -0,0 +1,99 @@
+"""
+Compare command logging throughput with per-row and batched inserts.
+
+Run from the repository root against a throwaway database:
+
+    python -m benchmarks.command_log --database nest_bench --rows 20000
+"""
+
+import argparse
+import asyncio
+import time
+
+import asyncpg
+
+TABLE = "command_bench"
+COLUMNS = ("id", "command", "message", "author", "guild")
+SQL_CREATE = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    id BIGINT PRIMARY KEY,
+    command TEXT,
+    message TEXT,
+    author BIGINT,
+    guild BIGINT
+);
+"""
+SQL_INSERT = f"""
+INSERT INTO {TABLE} (id, command, message, author, guild)
+    VALUES ($1, $2, $3, $4, $5)
+"""
+
+
+def records(count: int):
+    """Generate rows shaped like CommandLogger's."""
+    return [
+        (i, "xkcd", f"nest!xkcd {i}", 181353804266995713 + i % 1000, i % 50)
+        for i in range(count)
+    ]
+
+
+async def per_row(pool, rows):
+    """One acquire and INSERT per row, as CommandLogger used to do."""
+    for row in rows:
+        async with pool.acquire() as conn:
+            await conn.execute(SQL_INSERT, *row)
+
+
+async def executemany(pool, rows, batch_size):
+    for i in range(0, len(rows), batch_size):
+        async with pool.acquire() as conn:
+            await conn.executemany(SQL_INSERT, rows[i:i + batch_size])
+
+
+async def copy(pool, rows, batch_size):
+    for i in range(0, len(rows), batch_size):
+        async with pool.acquire() as conn:
+            await conn.copy_records_to_table(
+                TABLE, records=rows[i:i + batch_size], columns=COLUMNS
+            )
+
+
+async def run(args):
+    pool = await asyncpg.create_pool(database=args.database)
+    rows = records(args.rows)
+
+    async with pool.acquire() as conn:
+        await conn.execute(SQL_CREATE)
+
+    cases = {
+        "per-row INSERT": lambda: per_row(pool, rows),
+        f"executemany x{args.batch_size}": lambda: executemany(
+            pool, rows, args.batch_size
+        ),
+        f"COPY x{args.batch_size}": lambda: copy(pool, rows, args.batch_size),
+    }
+
+    try:
+        for name, case in cases.items():
+            async with pool.acquire() as conn:
+                await conn.execute(f"TRUNCATE {TABLE}")
+            start = time.perf_counter()
+            await case()
+            elapsed = time.perf_counter() - start
+            print(f"{name:>24}: {args.rows / elapsed:>10.0f} rows/s")
+    finally:
+        async with pool.acquire() as conn:
+            await conn.execute(f"DROP TABLE {TABLE}")
+        await pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database", default="nest_bench")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    asyncio.get_event_loop().run_until_complete(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
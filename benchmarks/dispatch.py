@@ -0,0 +1,447 @@
+"""
+Measure messages per second through NestClient, without Discord.
+
+Builds a client, loads every module as main.py does, and feeds synthetic
+MESSAGE_CREATE payloads through discord.py's own parser, as the gateway
+would. Most messages are chat, and a share invoke commands. The Discord
+REST API is replaced by an in-process stub that answers like Discord
+does, and third-party APIs by a local aiohttp server the web client is
+redirected to. With ``--fake-database``, the prefix and locale stores
+run against an in-memory stand-in for PostgreSQL that counts queries and
+answers each after ``--query-latency`` milliseconds.
+
+Reports throughput, p50/p99 latency from parsing a payload until every
+event handler it triggered has finished, and memory allocated per
+message, traced one message at a time in a separate pass so tracing does
+not skew timings. ``--json`` prints the results on one line, to compare
+runs before and after a change.
+
+Run from the repository root:
+
+    python -m benchmarks.dispatch --messages 20000 --command-ratio 0.01
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+import discord
+from aiohttp import web
+from discord.ext import commands
+
+# Guild n has id GUILD + 10 * n, and its only channel the next id.
+GUILD = 10 ** 17
+SELF = GUILD - 2
+AUTHORS = GUILD + 10 ** 7
+MESSAGES = GUILD + 10 ** 8
+PREFIX = "nest!"
+CUSTOM_PREFIX = "?"
+
+COMMANDS = (
+    "ping", "stats", "xkcd", "xkcd 614", "pypi discord.py", "mods",
+    "dice 2d6", "coin", "clapify make it faster", "dog", "inspiro",
+)
+CHATTER = (
+    "hello everyone", "has anyone seen the new episode yet?", "lol",
+    "brb getting food", "that's not how that works", "gg",
+    "can someone help me with my code, it keeps crashing on startup",
+)
+
+# Responses of third-party APIs, by host.
+FIXTURES = {
+    "xkcd.com": {
+        "num": 614, "img": "https://imgs.xkcd.com/comics/woodpecker.png",
+        "safe_title": "Woodpecker", "day": "24", "month": "7",
+        "year": "2009",
+    },
+    "pypi.python.org": {
+        "info": {
+            "name": "discord.py", "version": "1.7.3",
+            "description": "A modern, easy to use, feature-rich, and "
+                           "async ready API wrapper for Discord.",
+            "license": "MIT", "author": "Rapptz", "docs_url": None,
+            "home_page": "https://github.com/Rapptz/discord.py",
+            "requires_python": ">=3.5.3",
+            "package_url": "https://pypi.org/project/discord.py/",
+        },
+    },
+    "api.weeb.sh": {"url": "https://cdn.weeb.sh/images/bench.gif"},
+    "random.dog": {"url": "https://random.dog/bench.jpg"},
+    "random.birb.pw": {"file": "bench.jpg"},
+    "nekos.life": {"url": "https://cdn.nekos.life/meow/bench.jpg"},
+    "inspirobot.me": "https://generated.inspirobot.me/a/bench.jpg",
+}
+
+
+def user(user_id: int, name: str, bot: bool = False) -> dict:
+    return {"id": str(user_id), "username": name, "discriminator": "0001",
+            "avatar": None, "bot": bot}
+
+
+def guild_create(guild_id: int, authors: int) -> dict:
+    """GUILD_CREATE payload of a guild with one channel."""
+    members = [{"user": user(SELF, "Nest", bot=True), "roles": [],
+                "joined_at": None, "deaf": False, "mute": False}]
+    for number in range(authors):
+        members.append({"user": user(AUTHORS + number, f"user{number}"),
+                        "roles": [], "joined_at": None, "deaf": False,
+                        "mute": False})
+    return {
+        "id": str(guild_id), "name": "bench", "owner_id": str(AUTHORS),
+        "member_count": len(members), "unavailable": False,
+        "roles": [{"id": str(guild_id), "name": "@everyone", "position": 0,
+                   "permissions_new": "104324673"}],
+        "channels": [{"id": str(guild_id + 1), "type": 0, "name": "general",
+                      "position": 0, "permission_overwrites": []}],
+        "members": members,
+    }
+
+
+def message_create(message_id: int, guild_id: int, author: int,
+                   content: str) -> dict:
+    return {
+        "id": str(message_id), "channel_id": str(guild_id + 1),
+        "guild_id": str(guild_id), "content": content,
+        "author": user(author, f"user{author - AUTHORS}"),
+        "member": {"roles": [], "joined_at": None, "deaf": False,
+                   "mute": False},
+        "timestamp": datetime.utcnow().isoformat(), "edited_timestamp": None,
+        "tts": False, "mention_everyone": False, "mentions": [],
+        "mention_roles": [], "attachments": [], "embeds": [],
+        "pinned": False, "type": 0,
+    }
+
+
+def workload(count: int, ratio: float, guilds: int, authors: int,
+             prefixes: Dict[int, str], seed: int) -> List[dict]:
+    """Payloads of chat, with ``ratio`` of them invoking commands."""
+    rng = random.Random(seed)
+    payloads = []
+    for number in range(count):
+        guild_id = GUILD + 10 * rng.randrange(guilds)
+        if rng.random() < ratio:
+            content = prefixes.get(guild_id, PREFIX) + rng.choice(COMMANDS)
+        else:
+            content = rng.choice(CHATTER)
+        author = AUTHORS + rng.randrange(authors)
+        payloads.append(message_create(MESSAGES + number, guild_id, author,
+                                       content))
+    return payloads
+
+
+class FakeREST:
+    """Stands in for discord.py's HTTPClient.request, answering at once."""
+
+    def __init__(self):
+        self.requests = {}
+        self._ids = itertools.count(GUILD + 10 ** 9)
+
+    async def request(self, route, *, files=None, form=None, **kwargs):
+        key = f"{route.method} {route.path}"
+        self.requests[key] = self.requests.get(key, 0) + 1
+        if route.path == "/channels/{channel_id}/messages":
+            payload = kwargs.get("json") or {}
+            channel_id = int(route.channel_id)
+            return {
+                **message_create(next(self._ids), channel_id - 1, SELF,
+                                 payload.get("content") or ""),
+                "author": user(SELF, "Nest", bot=True),
+                "embeds": [payload["embed"]] if payload.get("embed") else [],
+            }
+        return None
+
+
+class FakeConnection:
+    """Answers the queries of the prefix and locale stores from memory."""
+
+    def __init__(self, database: "FakeDatabase"):
+        self._database = database
+
+    async def _query(self, query: str):
+        key = " ".join(query.split())
+        queries = self._database.queries
+        queries[key] = queries.get(key, 0) + 1
+        if self._database.latency:
+            await asyncio.sleep(self._database.latency)
+
+    async def fetchval(self, query: str, *args):
+        await self._query(query)
+        if "FROM guild" in query:
+            return self._database.prefixes.get(args[0])
+        return None
+
+    async def fetch(self, query: str, *args):
+        await self._query(query)
+        prefixes = self._database.prefixes
+        if "DISTINCT" in query:
+            return [{"first": prefix[:1]} for prefix in set(prefixes.values())]
+        if "ANY($1)" in query:
+            return [{"id": guild_id, "prefix": prefixes[guild_id]}
+                    for guild_id in args[0] if guild_id in prefixes]
+        return []
+
+    async def execute(self, query: str, *args):
+        await self._query(query)
+
+
+class FakeAcquire:
+    def __init__(self, database: "FakeDatabase"):
+        self._database = database
+
+    async def __aenter__(self) -> FakeConnection:
+        return FakeConnection(self._database)
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class FakeDatabase(commands.Cog, name="PostgreSQL"):
+    """Stands in for the PostgreSQL cog, counting queries by text."""
+
+    def __init__(self, prefixes: Dict[int, str], latency: float):
+        self.prefixes = prefixes
+        self.latency = latency
+        self.queries: Dict[str, int] = {}
+
+    def acquire(self, workload: str) -> FakeAcquire:
+        return FakeAcquire(self)
+
+    def subscribe(self, kind, cache):
+        pass
+
+    def on_change(self, kind, callback):
+        # As the real cog does once it starts listening.
+        callback(None)
+
+    async def notify(self, conn, kind, key):
+        pass
+
+
+class RedirectedSession:
+    """Sends every GET to the local API server, keeping host and path."""
+
+    def __init__(self, session, base: str):
+        self._session = session
+        self._base = base
+
+    def get(self, url: str, **kwargs):
+        parts = urlsplit(url)
+        return self._session.get(
+            f"{self._base}/{parts.hostname}{parts.path}", **kwargs
+        )
+
+
+async def api_server() -> web.AppRunner:
+    """Serve FIXTURES on a free local port."""
+
+    async def handle(request):
+        host = request.match_info["host"]
+        if host not in FIXTURES:
+            return web.Response(status=404)
+        if isinstance(FIXTURES[host], str):
+            return web.Response(text=FIXTURES[host])
+        return web.json_response(FIXTURES[host])
+
+    app = web.Application()
+    app.router.add_get("/{host}/{path:.*}", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner
+
+
+def build(args, prefixes: Dict[int, str]):
+    """A client with every module loaded, fed by a fake gateway and REST.
+
+    Returns the client, the REST stub, the fake database if enabled and
+    the runner of the API server.
+    """
+    from nest import client
+
+    bot = client.NestClient(
+        prefix=PREFIX, database=args.database,
+        tokens={"weebsh": "", "osu": ""},
+    )
+    # Modules may fetch from APIs as soon as they are loaded.
+    runner = bot.loop.run_until_complete(api_server())
+    port = runner.addresses[0][1]
+    bot.web.session = RedirectedSession(bot.session,
+                                        f"http://127.0.0.1:{port}")
+    bot.load_modules(
+        module for module in os.listdir("modules")
+        if not module.startswith(".")
+    )
+
+    database = None
+    if args.fake_database:
+        from modules.db.locale import LocaleStore
+        from modules.db.prefix import PrefixStore
+
+        database = FakeDatabase(prefixes, args.query_latency / 1000)
+        bot.add_cog(database)
+        bot.add_cog(PrefixStore(bot))
+        bot.add_cog(LocaleStore(bot))
+
+    rest = FakeREST()
+    bot.http.request = rest.request
+    state = bot._connection
+    state.user = discord.ClientUser(state=state,
+                                    data=user(SELF, "Nest", bot=True))
+    return bot, rest, database, runner
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def replay(bot, payloads: List[dict], concurrency: int,
+                 trace: bool = False) -> dict:
+    """Parse payloads, with at most ``concurrency`` being handled at once."""
+    parse = bot._connection.parsers["MESSAGE_CREATE"]
+    scheduled = []
+    schedule = bot._schedule_event
+
+    def collect(*args, **kwargs):
+        task = schedule(*args, **kwargs)
+        scheduled.append(task)
+        return task
+
+    bot._schedule_event = collect
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    allocated = []
+
+    async def handle(payload):
+        async with semaphore:
+            if trace:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            parse(payload)
+            tasks = scheduled[:]
+            scheduled.clear()
+            if tasks:
+                await asyncio.gather(*tasks)
+            latencies.append(time.perf_counter() - start)
+            if trace:
+                allocated.append(tracemalloc.get_traced_memory()[1] - before)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handle(payload) for payload in payloads))
+    elapsed = time.perf_counter() - start
+    bot._schedule_event = schedule
+    return {"elapsed": elapsed, "latencies": latencies,
+            "allocated": allocated}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--command-ratio", type=float, default=0.01,
+                        help="Share of messages invoking a command.")
+    parser.add_argument("--guilds", type=int, default=1)
+    parser.add_argument("--authors", type=int, default=100,
+                        help="Members of each guild.")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Messages handled at once.")
+    parser.add_argument("--warmup", type=int, default=1000)
+    parser.add_argument("--database",
+                        help="Database for the db and logging modules, "
+                             "which are skipped without one.")
+    parser.add_argument("--fake-database", action="store_true",
+                        help="Run the prefix and locale stores against an "
+                             "in-memory database.")
+    parser.add_argument("--query-latency", type=float, default=0.5,
+                        help="Milliseconds each fake query takes.")
+    parser.add_argument("--custom-prefixes", type=float, default=0.1,
+                        help="Share of guilds with a custom prefix, in the "
+                             "fake database.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true",
+                        help="Print results as JSON, e.g. to compare runs.")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    guild_ids = [GUILD + 10 * number for number in range(args.guilds)]
+    prefixes = {}
+    if args.fake_database:
+        prefixes = {guild_id: CUSTOM_PREFIX for guild_id in guild_ids
+                    if rng.random() < args.custom_prefixes}
+
+    bot, rest, database, runner = build(args, prefixes)
+    loop = bot.loop
+    for guild_id in guild_ids:
+        bot._connection.parsers["GUILD_CREATE"](
+            guild_create(guild_id, args.authors)
+        )
+
+    payloads = workload(args.warmup + args.messages, args.command_ratio,
+                        args.guilds, args.authors, prefixes, args.seed)
+    warmup, payloads = payloads[:args.warmup], payloads[args.warmup:]
+    loop.run_until_complete(replay(bot, warmup, args.concurrency))
+
+    rest.requests.clear()
+    if database is not None:
+        database.queries.clear()
+    blocks = sys.getallocatedblocks()
+    result = loop.run_until_complete(
+        replay(bot, payloads, args.concurrency)
+    )
+    retained = (sys.getallocatedblocks() - blocks) / args.messages
+
+    tracemalloc.start()
+    traced = loop.run_until_complete(
+        replay(bot, payloads[:2000], 1, trace=True)
+    )
+    tracemalloc.stop()
+
+    latencies = result["latencies"]
+    report = {
+        "messages": args.messages,
+        "command_ratio": args.command_ratio,
+        "concurrency": args.concurrency,
+        "throughput": args.messages / result["elapsed"],
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "allocated_kib": sum(traced["allocated"])
+        / len(traced["allocated"]) / 1024,
+        "retained_blocks": retained,
+        "rest_requests": rest.requests,
+        "db_queries": database.queries if database is not None else {},
+    }
+
+    loop.run_until_complete(runner.cleanup())
+    loop.run_until_complete(bot.close())
+    loop.run_until_complete(bot.session.close())
+
+    if args.json:
+        print(json.dumps(report))
+        return
+
+    print(f"{args.messages} messages, {args.command_ratio:.1%} commands, "
+          f"concurrency {args.concurrency}")
+    print(f"throughput: {report['throughput']:9.0f} messages/s")
+    print(f"   latency: p50 {report['p50_ms']:.3f}ms, "
+          f"p99 {report['p99_ms']:.3f}ms, max {report['max_ms']:.3f}ms")
+    print(f"    memory: {report['allocated_kib']:.1f}KiB peak allocated, "
+          f"{report['retained_blocks']:.2f} blocks retained per message")
+    for route, count in sorted(rest.requests.items()):
+        print(f"      REST: {count:6} {route}")
+    for query, count in sorted(report["db_queries"].items()):
+        print(f"        DB: {count:6} {query}")
+
+
+if __name__ == "__main__":
+    main()
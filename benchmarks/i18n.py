@@ -0,0 +1,106 @@
+"""
+Time I18n.getstr on hit and miss paths against the old nested lookup, and
+formatting through str.format against pre-parsed templates.
+
+Run from the repository root:
+
+    python -m benchmarks.i18n
+"""
+
+import argparse
+import json
+import os
+import timeit
+
+from nest import i18n
+from nest.helpers import dictwalk
+
+MODULES = ("core", "fun", "lookups", "moderation")
+
+
+def nested_getstr(data: dict, default: str, string: str, *, locale: str,
+                  cog: str):
+    """I18n.getstr as it was before the flat catalog."""
+    try:
+        item = dictwalk(data, [locale, cog, string])
+    except KeyError:
+        try:
+            item = dictwalk(data, [default, cog, string])
+        except KeyError:
+            item = string
+    return item
+
+
+def nested_data() -> dict:
+    """Language data as I18n kept it before the flat catalog."""
+    with open(os.path.join("nest", "i18n.json")) as file:
+        data = json.load(file)
+    for module in MODULES:
+        path = os.path.join("modules", module, "i18n")
+        for filename in os.listdir(path):
+            with open(os.path.join(path, filename)) as file:
+                data.setdefault(filename[:-5], {}).update(json.load(file))
+    return data
+
+
+def build() -> i18n.I18n:
+    catalog = i18n.I18n(locale="en_US")
+    for module in MODULES:
+        catalog.load_module(module)
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=1000000)
+    args = parser.parse_args()
+
+    catalog = build()
+    data = nested_data()
+
+    cases = {
+        "hit": ("ping_response", "en_US", "InfoCommands"),
+        "fallback": ("ping_response", "fr_FR", "InfoCommands"),
+        "miss": ("Play Count", "en_US", "GamingLookups"),
+    }
+
+    for name, (string, locale, cog) in cases.items():
+        old = timeit.timeit(
+            lambda: nested_getstr(
+                data, "en_US", string, locale=locale, cog=cog
+            ),
+            number=args.number,
+        )
+        new = timeit.timeit(
+            lambda: catalog.getstr(string, locale=locale, cog=cog),
+            number=args.number,
+        )
+        print(
+            f"{name:>8}: nested {old / args.number * 1e9:6.0f}ns, "
+            f"i18n {new / args.number * 1e9:6.0f}ns"
+        )
+
+    kwargs = {
+        "bot": "Nest", "guilds": 1200, "channels": 34000, "users": 560000,
+        "uptime": "3 days, 4 hours", "commands": 140,
+    }
+    old = timeit.timeit(
+        lambda: catalog.getstr(
+            "information", locale="en_US", cog="InfoCommands"
+        ).format(**kwargs),
+        number=args.number,
+    )
+    new = timeit.timeit(
+        lambda: catalog.template(
+            "information", locale="en_US", cog="InfoCommands"
+        ).render(**kwargs),
+        number=args.number,
+    )
+    print(
+        f"  format: str.format {old / args.number * 1e9:6.0f}ns, "
+        f"template {new / args.number * 1e9:6.0f}ns"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Measure I18n startup time and memory with many locales.
+
+Generates synthetic locales from the en_US strings of every module, then
+starts I18n in a fresh process for each loading strategy:
+
+- eager: every locale loaded from JSON and kept, as before lazy loading
+- lazy: locales loaded from JSON on first use
+- catalog: locales loaded from compiled catalogs on first use
+
+Run from the repository root:
+
+    python -m benchmarks.i18n_locales --locales 50
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+MODULES = ("core", "fun", "lookups", "moderation")
+MODES = ("eager", "lazy", "catalog")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss() -> int:
+    """Resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        # Peak rather than current, and in KiB on Linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def generate(directory: str, locales: int, strings: int):
+    """Write every module's strings once per locale, padded to size."""
+    names = ["en_US"] + [f"x{number:02d}_XX" for number in range(1, locales)]
+    for module in MODULES:
+        with open(os.path.join(ROOT, "modules", module, "i18n",
+                               "en_US.json")) as file:
+            source = json.load(file)
+
+        path = os.path.join(directory, "modules", module, "i18n")
+        os.makedirs(path)
+        for locale in names:
+            data = {}
+            for cog, items in source.items():
+                data[cog] = {
+                    string: f"{item} [{locale}]" if isinstance(item, str)
+                    else item
+                    for string, item in items.items()
+                }
+                for number in range(strings):
+                    data[cog][f"bench_{number}"] = (
+                        f"Synthetic string {number} of {cog} in {locale}, "
+                        "with a {field} to format."
+                    )
+            with open(os.path.join(path, f"{locale}.json"), "w") as file:
+                json.dump(data, file, ensure_ascii=False)
+    return names
+
+
+def child(mode: str, serve: int):
+    """Start I18n, use a few locales and report time and memory."""
+    import nest.i18n
+
+    before = rss()
+    start = time.perf_counter()
+
+    i18n = nest.i18n.I18n(
+        locale="en_US", catalog="catalogs" if mode == "catalog" else None
+    )
+    for module in MODULES:
+        i18n.load_module(module)
+
+    # Startup ends once the default locale is ready to serve.
+    names = sorted(i18n._sources) if mode == "eager" else ["en_US"]
+    i18n.cache_size = len(names)
+    for locale in names:
+        i18n.getstr("ping_response", locale=locale, cog="InfoCommands")
+    startup = time.perf_counter() - start
+
+    i18n.cache_size = max(i18n.cache_size, nest.i18n.CACHE_SIZE)
+
+    served = [name for name in sorted(i18n._sources)
+              if name.startswith("x")][:serve]
+    start = time.perf_counter()
+    for locale in served:
+        i18n.getstr("ping_response", locale=locale, cog="InfoCommands")
+    first_use = (time.perf_counter() - start) / max(len(served), 1)
+
+    print(json.dumps({
+        "startup": startup,
+        "first_use": first_use,
+        "rss": rss() - before,
+        "loaded": len(i18n._loaded),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--locales", type=int, default=50)
+    parser.add_argument("--strings", type=int, default=200,
+                        help="Synthetic strings added to each cog.")
+    parser.add_argument("--serve", type=int, default=3,
+                        help="Locales used after startup.")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.serve)
+        return
+
+    directory = tempfile.mkdtemp(prefix="nest-i18n-")
+    try:
+        generate(directory, args.locales, args.strings)
+        env = {**os.environ, "PYTHONPATH": ROOT}
+        subprocess.run(
+            [sys.executable, "-m", "utils.build_i18n",
+             "--output", os.path.join(directory, "catalogs")],
+            cwd=directory, env=env, check=True, stdout=subprocess.DEVNULL,
+        )
+
+        print(f"{args.locales} locales, "
+              f"{args.strings} extra strings per cog")
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.i18n_locales",
+                 "--child", mode, "--serve", str(args.serve)],
+                cwd=directory, env=env, check=True, stdout=subprocess.PIPE,
+            ).stdout
+            result = json.loads(output)
+            print(
+                f"{mode:>8}: startup {result['startup'] * 1000:7.1f}ms, "
+                f"first use {result['first_use'] * 1000:6.2f}ms, "
+                f"RSS +{result['rss'] / 2 ** 20:6.1f}MiB, "
+                f"{result['loaded']} locales loaded"
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Measure the overhead metrics add to every message, and scrape time.
+
+A message invoking a command is timed three times by NestClient: parsing
+the prefix, fetching the locale and running the command. Each is two
+``time.perf_counter`` calls and an observation, through the histogram
+child NestClient keeps per phase, which are timed here against the same
+work without them, and against looking up the child on every call.
+
+Run from the repository root:
+
+    python -m benchmarks.metrics
+"""
+
+import argparse
+import time
+import timeit
+
+from nest import metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=1000000)
+    parser.add_argument("--commands", type=int, default=150,
+                        help="Distinct commands observed before scraping.")
+    args = parser.parse_args()
+
+    registry = metrics.Registry()
+    prefix = registry.histogram("prefix", "")
+    locale = registry.histogram("locale", "")
+    command = registry.histogram("command", "", labels=("command",))
+
+    def bare():
+        pass
+
+    def looked_up():
+        start = time.perf_counter()
+        prefix.observe(time.perf_counter() - start)
+        start = time.perf_counter()
+        locale.observe(time.perf_counter() - start)
+        start = time.perf_counter()
+        command.observe(time.perf_counter() - start, "stats")
+
+    prefix_child, locale_child = prefix.child(), locale.child()
+    children = {}
+
+    def instrumented():
+        start = time.perf_counter()
+        prefix_child.observe(time.perf_counter() - start)
+        start = time.perf_counter()
+        locale_child.observe(time.perf_counter() - start)
+        start = time.perf_counter()
+        seconds = time.perf_counter() - start
+        child = children.get("stats")
+        if child is None:
+            child = children["stats"] = command.child("stats")
+        child.observe(seconds)
+
+    base = timeit.timeit(bare, number=args.number)
+    observe = timeit.timeit(lambda: prefix_child.observe(0.0003),
+                            number=args.number)
+    old = timeit.timeit(looked_up, number=args.number)
+    message = timeit.timeit(instrumented, number=args.number)
+    print(f" observe: {(observe - base) / args.number * 1e9:6.0f}ns")
+    print(f" message: {(message - base) / args.number * 1e9:6.0f}ns "
+          f"(3 phases), {(old - base) / args.number * 1e9:6.0f}ns "
+          "looking up children")
+
+    for number in range(args.commands):
+        command.observe(number / 1000, f"command{number}")
+    start = time.perf_counter()
+    body = registry.render()
+    print(f"  render: {(time.perf_counter() - start) * 1000:6.2f}ms, "
+          f"{len(body.splitlines())} lines for {args.commands} commands")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Time the mods command's member scan against the moderator index.
+
+Builds a synthetic guild with many members and roles, a few of which can
+ban members, then times finding the moderators visible in a channel by
+checking every member, as the command used to, and through ModIndex.
+Rebuilding the index, as after a role change, is timed too.
+
+Run from the repository root:
+
+    python -m benchmarks.mods --members 100000
+"""
+
+import argparse
+import random
+import timeit
+
+import discord
+
+from modules.moderation.staff import ModIndex
+
+BAN_MEMBERS = discord.Permissions(ban_members=True).value
+ADMINISTRATOR = discord.Permissions(administrator=True).value
+STATUSES = ("online", "idle", "dnd", "offline")
+
+
+class State:
+    """Just enough connection state to build a guild from data."""
+
+    self_id = 1
+    member_cache_flags = discord.MemberCacheFlags.all()
+
+    def __init__(self):
+        self._users = {}
+
+    def store_user(self, data):
+        user_id = int(data["id"])
+        user = self._users.get(user_id)
+        if user is None:
+            user = self._users[user_id] = discord.User(state=self, data=data)
+        return user
+
+    def store_emoji(self, guild, data):
+        return None
+
+    def _get_guild(self, guild_id):
+        return None
+
+
+def synthetic_guild(members: int, roles: int, mods: int) -> discord.Guild:
+    """A guild with ``mods`` members holding one of two moderator roles."""
+    rng = random.Random(0)
+    guild_id = 10 ** 17
+    role_data = [{"id": str(guild_id), "name": "@everyone", "position": 0,
+                  "permissions_new": str(discord.Permissions.general().value
+                                     & ~BAN_MEMBERS & ~ADMINISTRATOR)}]
+    for position in range(1, roles + 1):
+        role_data.append({
+            "id": str(guild_id + position), "name": f"role {position}",
+            "position": position, "permissions_new": "0",
+        })
+    role_data[-1]["permissions_new"] = str(ADMINISTRATOR)
+    role_data[-2]["permissions_new"] = str(BAN_MEMBERS)
+    mod_roles = [role_data[-1]["id"], role_data[-2]["id"]]
+    plain_roles = [role["id"] for role in role_data[1:-2]]
+
+    member_data, presences = [], []
+    for number in range(members):
+        user_id = str(guild_id + 10 ** 6 + number)
+        member_roles = rng.sample(plain_roles, min(3, len(plain_roles)))
+        if number < mods:
+            member_roles.append(mod_roles[number % 2])
+        member_data.append({
+            "user": {"id": user_id, "username": f"user{number}",
+                     "discriminator": "0001", "avatar": None},
+            "roles": member_roles, "joined_at": None, "deaf": False,
+            "mute": False,
+        })
+        presences.append({"user": {"id": user_id},
+                          "status": rng.choice(STATUSES),
+                          "activities": [], "client_status": {}})
+
+    channel_id = str(guild_id + 1)
+    return discord.Guild(state=State(), data={
+        "id": str(guild_id), "name": "bench",
+        "owner_id": str(guild_id + 10 ** 6),
+        "member_count": members, "roles": role_data, "members": member_data,
+        "presences": presences, "channels": [{
+            "id": channel_id, "type": 0, "name": "general", "position": 0,
+            "permission_overwrites": [{
+                "id": mod_roles[1], "type": "role", "allow": "0",
+                "deny": str(BAN_MEMBERS),
+            }],
+        }],
+    })
+
+
+def scan(guild: discord.Guild, channel) -> list:
+    """The mods command's lookup before the index."""
+    return [m for m in guild.members
+            if m.permissions_in(channel).ban_members and not m.bot]
+
+
+def indexed(index: ModIndex, guild: discord.Guild, channel) -> list:
+    mods = []
+    for member_id in index.get(guild):
+        mod = guild.get_member(member_id)
+        if mod is not None and not mod.bot \
+                and mod.permissions_in(channel).ban_members:
+            mods.append(mod)
+    return mods
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--members", type=int, default=100000)
+    parser.add_argument("--roles", type=int, default=50)
+    parser.add_argument("--mods", type=int, default=40)
+    parser.add_argument("--number", type=int, default=5)
+    args = parser.parse_args()
+
+    guild = synthetic_guild(args.members, args.roles, args.mods)
+    channel = guild.text_channels[0]
+    index = ModIndex()
+    assert {m.id for m in scan(guild, channel)} == \
+        {m.id for m in indexed(index, guild, channel)}
+
+    def rebuild():
+        index.invalidate(guild)
+        index.get(guild)
+
+    print(f"{args.members} members, {args.roles} roles, "
+          f"{len(index.get(guild))} indexed")
+    for name, func in (
+        ("scan", lambda: scan(guild, channel)),
+        ("index", lambda: indexed(index, guild, channel)),
+        ("rebuild", rebuild),
+    ):
+        seconds = timeit.timeit(func, number=args.number) / args.number
+        print(f"{name:>8}: {seconds * 1000:9.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Measure how long loading every module takes, and what it imports.
+
+Starts a client in a fresh process, loads every module and reports the
+time taken and the memory used. Then repeats it under ``python -X
+importtime`` and lists the slowest imports, in the same format:
+microseconds spent in the import itself, and including what it imported.
+
+Run from the repository root:
+
+    python -m benchmarks.startup --top 25
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+IMPORTTIME_RE = re.compile(
+    r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$"
+)
+
+
+def rss() -> int:
+    """Resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        # Peak rather than current, and in KiB on Linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def child():
+    """Load every module, as main.py does, and report time and memory."""
+    start = time.perf_counter()
+    from nest import client
+
+    bot = client.NestClient(
+        prefix={"user": "nest!"},
+        database=None,
+        tokens={"weebsh": "", "osu": ""},
+    )
+    imported = time.perf_counter()
+    bot.load_modules(
+        module for module in os.listdir("modules")
+        if not module.startswith(".")
+    )
+    loaded = time.perf_counter()
+
+    print(json.dumps({
+        "nest": imported - start,
+        "modules": loaded - imported,
+        "rss": rss(),
+        "load_times": bot.load_times,
+    }))
+
+
+def profile(top: int):
+    """Print the slowest imports, as ``python -X importtime`` does."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "benchmarks.startup",
+         "--child"],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True,
+    ).stderr
+
+    imports = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            imports.append((int(cumulative), int(own), len(indent), name))
+
+    total = sum(own for _, own, _, _ in imports)
+    print(f"{len(imports)} modules imported in {total / 1000:.1f}ms")
+    print("import time: self [us] | cumulative | imported package")
+    for cumulative, own, depth, name in sorted(imports, reverse=True)[:top]:
+        print(f"import time: {own:>9} | {cumulative:>10} | "
+              f"{' ' * depth}{name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top", type=int, default=25,
+                        help="Number of slowest imports to list.")
+    parser.add_argument("--child", action="store_true",
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child"],
+        check=True, stdout=subprocess.PIPE,
+    ).stdout
+    result = json.loads(output.splitlines()[-1])
+    print(
+        f"import nest {result['nest'] * 1000:.1f}ms, "
+        f"load modules {result['modules'] * 1000:.1f}ms, "
+        f"RSS {result['rss'] / 2 ** 20:.1f}MiB"
+    )
+    for name, seconds in sorted(result["load_times"].items()):
+        print(f"{name:>12}: {seconds * 1000:6.1f}ms")
+    print()
+    profile(args.top)
+
+
+if __name__ == "__main__":
+    main()
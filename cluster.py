@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+"""
+Run the Nest client as several processes, each with a share of the shards.
+
+The shard range is split into contiguous chunks, one per cluster. Each
+cluster runs its own client in a worker process, and is restarted with
+backoff when it dies. Clusters reach each other through the launcher, see
+:mod:`nest.ipc`.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import secrets
+import signal
+import time
+from typing import Dict, List
+
+import aiohttp
+
+import main
+from nest import ipc
+
+GATEWAY = "https://discord.com/api/v7/gateway/bot"
+CHECK_INTERVAL = 1
+MAX_BACKOFF = 60
+STABLE = 300
+STOP_TIMEOUT = 10
+
+
+def split(shard_count: int, clusters: int) -> List[List[int]]:
+    """Split shards into contiguous chunks of nearly equal size.
+
+    Parameters
+    ----------
+    shard_count: int
+        Total number of shards.
+    clusters: int
+        Number of chunks, capped at the number of shards.
+    """
+    clusters = max(1, min(clusters, shard_count))
+    size, extra = divmod(shard_count, clusters)
+    chunks = []
+    start = 0
+    for cluster in range(clusters):
+        end = start + size + (cluster < extra)
+        chunks.append(list(range(start, end)))
+        start = end
+    return chunks
+
+
+async def recommended_shards(token: str) -> int:
+    """|coro|
+
+    Ask Discord how many shards the bot should use.
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            GATEWAY, headers={"Authorization": f"Bot {token}"}
+        ) as resp:
+            resp.raise_for_status()
+            data = await resp.json()
+    return int(data["shards"])
+
+
+def worker(cluster: int, shard_ids: List[int], shard_count: int,
+           port: int, secret: str):
+    """Run one cluster, in a process started by the launcher."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"[cluster {cluster}] %(levelname)s %(name)s: %(message)s",
+    )
+    settings = main.load_settings()
+    settings.pop("cluster", None)
+    # Each cluster serves its own metrics, on consecutive ports.
+    metrics = dict(settings.get("metrics") or {})
+    if metrics.get("port"):
+        metrics["port"] = int(metrics["port"]) + cluster
+        settings["metrics"] = metrics
+    bot = main.create_bot(
+        settings, shard_ids=shard_ids, shard_count=shard_count
+    )
+
+    bot.ipc = ipc.IPCClient(cluster, port, secret)
+    bot.ipc.handlers["stats"] = bot.local_stats
+    bot.loop.create_task(bot.ipc.run())
+
+    # Do not outlive the launcher if it is killed without stopping us.
+    async def watch_parent(parent: int):
+        while os.getppid() == parent:
+            await asyncio.sleep(CHECK_INTERVAL)
+        await bot.close()
+
+    bot.loop.create_task(watch_parent(os.getppid()))
+    bot.run()
+
+
+class Cluster:
+    """A worker process and its restart history."""
+
+    def __init__(self, cluster: int, shard_ids: List[int]):
+        self.id = cluster
+        self.shard_ids = shard_ids
+        self.process = None
+        self.started = 0.0
+        self.failures = 0
+        self.restart_at = 0.0
+
+
+class Launcher:
+    """Start clusters and restart them when they die.
+
+    Parameters
+    ----------
+    chunks: List[List[int]]
+        Shard ids run by each cluster.
+    shard_count: int
+        Total number of shards.
+    """
+
+    def __init__(self, chunks: List[List[int]], shard_count: int):
+        self._logger = logging.getLogger("nest.cluster")
+        self._context = multiprocessing.get_context("spawn")
+        self._secret = secrets.token_hex(32)
+        self._server = ipc.IPCServer(self._secret)
+        self._port = None
+        self._stopping = None
+        self.shard_count = shard_count
+        self.clusters: Dict[int, Cluster] = {
+            cluster: Cluster(cluster, shard_ids)
+            for cluster, shard_ids in enumerate(chunks)
+        }
+
+    def _start(self, cluster: Cluster):
+        self._logger.info(
+            f"Starting cluster {cluster.id} with shards "
+            f"{cluster.shard_ids[0]}-{cluster.shard_ids[-1]}"
+        )
+        cluster.process = self._context.Process(
+            target=worker,
+            name=f"nest-cluster-{cluster.id}",
+            args=(cluster.id, cluster.shard_ids, self.shard_count,
+                  self._port, self._secret),
+        )
+        cluster.process.start()
+        cluster.started = time.monotonic()
+
+    def _check(self, cluster: Cluster):
+        now = time.monotonic()
+        if cluster.process is None:
+            if now >= cluster.restart_at:
+                self._start(cluster)
+            return
+        if cluster.process.is_alive():
+            if now - cluster.started > STABLE:
+                cluster.failures = 0
+            return
+
+        code = cluster.process.exitcode
+        cluster.process.join()
+        cluster.process = None
+        if now - cluster.started > STABLE:
+            cluster.failures = 0
+        delay = min(2 ** cluster.failures, MAX_BACKOFF)
+        cluster.failures += 1
+        cluster.restart_at = now + delay
+        self._logger.warning(
+            f"Cluster {cluster.id} exited with {code}, "
+            f"restarting in {delay}s"
+        )
+
+    async def run(self):
+        """|coro|
+
+        Run every cluster until :meth:`stop` is called.
+        """
+        self._stopping = asyncio.Event()
+        self._port = await self._server.start()
+        try:
+            while not self._stopping.is_set():
+                for cluster in self.clusters.values():
+                    self._check(cluster)
+                try:
+                    await asyncio.wait_for(self._stopping.wait(),
+                                           CHECK_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self._shutdown()
+
+    def stop(self):
+        """Stop every cluster and return from :meth:`run`."""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def _shutdown(self):
+        processes = [cluster.process for cluster in self.clusters.values()
+                     if cluster.process is not None]
+        self._logger.info(f"Stopping {len(processes)} clusters")
+        for process in processes:
+            process.terminate()
+
+        deadline = time.monotonic() + STOP_TIMEOUT
+        while any(process.is_alive() for process in processes):
+            if time.monotonic() > deadline:
+                for process in processes:
+                    if process.is_alive():
+                        self._logger.warning(f"Killing {process.name}")
+                        os.kill(process.pid, signal.SIGKILL)
+                break
+            await asyncio.sleep(0.1)
+
+        for process in processes:
+            process.join()
+        await self._server.close()
+
+
+async def launch(args: argparse.Namespace):
+    settings = main.load_settings()
+    config = settings.get("cluster") or {}
+
+    shard_count = args.shards or config.get("shards")
+    if shard_count:
+        shard_count = int(shard_count)
+    else:
+        shard_count = await recommended_shards(settings["tokens"]["discord"])
+    clusters = int(args.clusters or config.get("clusters")
+                   or os.cpu_count() or 1)
+
+    chunks = split(shard_count, clusters)
+    logging.getLogger("nest.cluster").info(
+        f"Running {shard_count} shards in {len(chunks)} clusters"
+    )
+
+    launcher = Launcher(chunks, shard_count)
+    loop = asyncio.get_event_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, launcher.stop)
+        except NotImplementedError:
+            pass
+    await launcher.run()
+
+
+def start():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clusters", type=int,
+                        help="Number of processes, one per core by default.")
+    parser.add_argument("--shards", type=int,
+                        help="Total number of shards, as Discord recommends "
+                             "by default.")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[launcher] %(levelname)s %(name)s: %(message)s",
+    )
+    asyncio.get_event_loop().run_until_complete(launch(args))
+
+
+if __name__ == "__main__":
+    start()
@@ -9,7 +9,7 @@ import logging
 
 import yaml
 
-from nest import client, helpers, exceptions
+from nest import client, helpers
 
 DEFAULTS = {
     "prefix": "nest!",
@@ -17,9 +17,9 @@ DEFAULTS = {
 }
 
 
-def main():
+def load_settings() -> dict:
     """
-    Parse config from file or environment and launch bot.
+    Parse config from file or environment.
     """
     logger = logging.getLogger()
     if os.path.isfile("config.yml"):
@@ -52,26 +52,34 @@ def main():
 
             pointer[keys[-1]] = val
 
-    settings = {**DEFAULTS, **config["settings"], "tokens": config["tokens"]}
+    return {**DEFAULTS, **config["settings"], "tokens": config["tokens"]}
+
 
-    bot = client.NestClient(**settings)
+def create_bot(settings: dict, **options) -> client.NestClient:
+    """
+    Create a client and load every module into it.
+
+    Parameters
+    ----------
+    settings: dict
+        Settings returned by :func:`load_settings`.
+    **options:
+        Passed to the client, e.g. ``shard_ids`` and ``shard_count``.
+    """
+    bot = client.NestClient(**settings, **options)
 
-    if settings["database"]:
-        bot.load_module("db")
+    # Ignore hidden directories
+    bot.load_modules(
+        module for module in os.listdir("modules") if not module.startswith(".")
+    )
+    return bot
 
-    for module in os.listdir("modules"):
-        # Ignore hidden directories
-        if not module.startswith(".") and module != "db":
-            try:
-                bot.load_module(module)
-            except exceptions.MissingFeatures as exc:
-                if (
-                    settings.get("database", None)
-                    and exc.features != {"database"}
-                ):
-                    raise
 
-    bot.run()
+def main():
+    """
+    Parse config from file or environment and launch bot.
+    """
+    create_bot(load_settings()).run()
 
 
 if __name__ == "__main__":
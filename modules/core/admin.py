@@ -6,6 +6,8 @@ import discord
 
 from discord.ext import commands
 
+from nest import helpers
+
 HASTE_POST_URL = "https://hastebin.com/documents/"
 HASTE_URL = "https://hastebin.com/{key}.py"
 
@@ -19,6 +21,7 @@ class AdminCommands(commands.Cog):
 
     @commands.is_owner()
     @commands.group()
+    @helpers.untranslated
     async def module(self, ctx):
         """Group command for modules."""
 
@@ -35,6 +38,64 @@ class AdminCommands(commands.Cog):
         ctx.bot.load_module(module)
         await ctx.send(f"Successfully loaded {module}!")
 
+    @module.command()
+    @helpers.untranslated
+    async def times(self, ctx):
+        """Show how long each module took to load at startup."""
+        lines = []
+        for name, seconds in sorted(
+            ctx.bot.load_times.items(), key=lambda item: -item[1]
+        ):
+            lines.append(f"{name}: {seconds * 1000:.1f}ms")
+        await ctx.send("```yml\n{}\n```".format("\n".join(lines) or "none"))
+
+    @commands.is_owner()
+    @commands.command()
+    @helpers.untranslated
+    async def caches(self, ctx):
+        """Show hit rates of in-process caches."""
+        lines = []
+        for name, cache in sorted(ctx.bot.caches.items()):
+            stats = cache.stats()
+            lookups = stats["hits"] + stats["misses"]
+            ratio = stats["hits"] / lookups * 100 if lookups else 0
+            lines.append(
+                f"{name}: {stats['size']}/{stats['maxsize']} entries, "
+                f"{stats['hits']} hits, {stats['misses']} misses ({ratio:.1f}%)"
+            )
+        await ctx.send("```yml\n{}\n```".format("\n".join(lines) or "none"))
+
+    @commands.is_owner()
+    @commands.command()
+    @helpers.untranslated
+    async def hosts(self, ctx):
+        """Show how long requests waited for each web API host."""
+        lines = []
+        for host, limiter in sorted(ctx.bot.web.limiters.items()):
+            stats = limiter.stats()
+            average = stats["queued"] / stats["requests"] * 1000 \
+                if stats["requests"] else 0
+            lines.append(
+                f"{host}: {stats['requests']} requests, "
+                f"{stats['rejected']} rejected, queued {average:.1f}ms avg, "
+                f"{stats['max_queued'] * 1000:.1f}ms max"
+            )
+        await ctx.send("```yml\n{}\n```".format("\n".join(lines) or "none"))
+
+    @commands.is_owner()
+    @commands.command()
+    @helpers.untranslated
+    async def breakers(self, ctx):
+        """Show the circuit breaker state of each web API."""
+        lines = []
+        for api, breaker in sorted(ctx.bot.web.breakers.items()):
+            line = f"{api}: {breaker.state}, {breaker.failures} failures, " \
+                f"tripped {breaker.trips} times"
+            if breaker.opened is not None:
+                line += f", opened {breaker.opened:.0f}s ago"
+            lines.append(line)
+        await ctx.send("```yml\n{}\n```".format("\n".join(lines) or "none"))
+
     @commands.is_owner()
     @commands.command(usage='<code>')
     async def eval(self, ctx, *, code: str):
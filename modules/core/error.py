@@ -30,7 +30,10 @@ class ErrorHandler(commands.Cog):
             traceback.print_exception(type(error), error, error.__traceback__)
             return
 
-        ctx._ = functools.partial(ctx._, cog="ErrorHandler")
+        await ctx.fetch_locale()
+        ctx._ = functools.partial(
+            ctx.bot.i18n.getstr, locale=ctx.locale, cog="ErrorHandler"
+        )
         error = getattr(error, 'original', error)
         etype = type(error)
 
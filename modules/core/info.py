@@ -19,12 +19,14 @@ class InfoCommands(commands.Cog):
     async def stats(self, ctx):
         """Display statistics about the bot."""
         uptime = relativedelta(datetime.now(), ctx.bot.created)
+        stats = await ctx.bot.stats()
 
-        text = ctx._("information").format(
+        text = ctx.render(
+            "information",
             bot=ctx.bot.user.name,
-            guilds=len(ctx.bot.guilds),
-            channels=sum(1 for _ in ctx.bot.get_all_channels()),
-            users=sum(1 for _ in ctx.bot.get_all_members()),
+            guilds=stats["guilds"],
+            channels=stats["channels"],
+            users=stats["users"],
             uptime=ctx.bot.i18n.format_timedelta(ctx.locale, uptime),
             commands=len(ctx.bot.commands),
         )
@@ -38,4 +40,4 @@ class InfoCommands(commands.Cog):
         pre_typing = time.monotonic()
         await ctx.trigger_typing()
         latency = int(round((time.monotonic() - pre_typing) * 1000))
-        await ctx.send(ctx._("ping_response").format(latency))
+        await ctx.send(ctx.render("ping_response", latency))
@@ -33,5 +33,5 @@ class LocaleManager(commands.Cog):
             await ctx.send(ctx._("locale_invalid").format(locale))
             return
 
-        await ctx.bot.providers["locale"].set(ctx, locale)
-        await ctx.send(ctx._("locale_success", locale=locale).format(locale))
+        await ctx.bot.get_cog("LocaleStore").set(ctx, locale)
+        await ctx.send(ctx._("locale_success").format(locale))
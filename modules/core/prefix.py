@@ -7,7 +7,7 @@ class PrefixManager(commands.Cog):
         """Get the current prefix."""
 
         prefix = await ctx.bot.get_cog("PrefixStore").get(ctx.message)
-        await ctx.send(ctx._("current_prefix").format(prefix=prefix))
+        await ctx.send(ctx.render("current_prefix", prefix=prefix))
 
     @commands.command()
     @commands.has_permissions(manage_guild=True)
@@ -16,4 +16,4 @@ class PrefixManager(commands.Cog):
         """Set a prefix for a guild."""
 
         await ctx.bot.get_cog("PrefixStore").set(ctx, prefix)
-        await ctx.send(ctx._("prefix_set_success").format(prefix=prefix))
+        await ctx.send(ctx.render("prefix_set_success", prefix=prefix))
@@ -1,9 +1,345 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
 import asyncpg
 from discord.ext import commands
 
+from nest.cache import LRUCache
+
+CHANNEL = "nest_invalidate"
+RECONNECT_DELAY = 5
+
+# Defaults of each pool, overridden by the ``database_pools`` setting.
+POOLS = {
+    # Prefix and locale lookups, many short queries worth preparing.
+    "read": {
+        "min_size": 2, "max_size": 10, "statement_cache_size": 100,
+        "command_timeout": 5, "acquire_timeout": 5, "max_queries": 50000,
+        "max_inactive_connection_lifetime": 300,
+    },
+    # Batches of the command log, few connections running long COPYs.
+    "write": {
+        "min_size": 1, "max_size": 2, "statement_cache_size": 20,
+        "command_timeout": 60, "acquire_timeout": 30, "max_queries": 50000,
+        "max_inactive_connection_lifetime": 300,
+    },
+    # Settings changes and maintenance, rare enough to open on demand.
+    "admin": {
+        "min_size": 0, "max_size": 2, "statement_cache_size": 20,
+        "command_timeout": 30, "acquire_timeout": 10, "max_queries": 50000,
+        "max_inactive_connection_lifetime": 60,
+    },
+}
+
+
+class Workload:
+    """A connection pool for one kind of query, created in the background.
+
+    Attributes
+    ----------
+    name: str
+        Name of the pool, e.g. ``read``.
+    options: Dict[str, Any]
+        Keyword arguments to ``asyncpg.create_pool``.
+    timeout: float
+        Seconds to wait for the pool to be created, then for a connection.
+    pool: Optional[asyncpg.pool.Pool]
+        The pool, or None until created.
+    waiting: int
+        Tasks waiting for a connection.
+    """
+
+    def __init__(self, name: str, config: Dict[str, Any],
+                 loop: asyncio.AbstractEventLoop):
+        self.name = name
+        self.options = dict(config)
+        self.timeout = float(self.options.pop("acquire_timeout"))
+        self.pool: Optional[asyncpg.pool.Pool] = None
+        self.ready = loop.create_future()
+        self.waiting = 0
+
+    def in_use(self) -> int:
+        if self.pool is None:
+            return 0
+        return self.pool.get_size() - self.pool.get_idle_size()
+
+
+class Acquire:
+    """Acquires a connection from a pool, timing how long it waits."""
+
+    def __init__(self, workload: Workload, histogram):
+        self._workload = workload
+        self._histogram = histogram
+        self._conn = None
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        workload = self._workload
+        start = time.perf_counter()
+        workload.waiting += 1
+        try:
+            pool = workload.pool
+            if pool is None:
+                pool = await asyncio.wait_for(
+                    asyncio.shield(workload.ready), workload.timeout
+                )
+            self._conn = await pool.acquire(timeout=workload.timeout)
+        finally:
+            workload.waiting -= 1
+        self._histogram.observe(time.perf_counter() - start, workload.name)
+        return self._conn
+
+    async def __aexit__(self, *exc_info):
+        conn, self._conn = self._conn, None
+        await self._workload.pool.release(conn)
+
+
 class PostgreSQL(commands.Cog):
+    """
+    Provider for the database connection pools.
+
+    Queries are split by workload into pools, see :data:`POOLS`, so bulk
+    writes never hold the connections hot reads need. Each pool's sizes,
+    prepared statement cache, query timeout and connection lifetime are
+    read from ``database_pools.<name>``. Pools are created in the
+    background, connections asked for before then wait up to their
+    ``acquire_timeout``.
+
+    A dedicated connection outside the pools LISTENs for invalidations
+    sent by other processes, and evicts the changed keys from the caches
+    subscribed to them. Invalidations this process sent are ignored, as
+    it updates its own caches when writing.
+
+    Connections should be taken with :meth:`acquire`, which records how
+    long they took to get. Query times are recorded by statement type, on
+    asyncpg versions with query loggers.
+    """
+
     def __init__(self, bot):
         self._db = bot.options["database"]
-        self.pool = bot.loop.run_until_complete(
-            asyncpg.create_pool(database=self._db)
+        self._logger = logging.getLogger("nest.db")
+        self._caches: Dict[str, List[LRUCache]] = {}
+        self._callbacks: Dict[str, List[Callable]] = {}
+        self._listener = None
+        self._loop = bot.loop
+        self._restart = None
+        # Tags the invalidations this process sends.
+        self._origin = uuid.uuid4().hex
+        self._metrics = bot.metrics
+        self._acquire_seconds = bot.metrics.histogram(
+            "nest_db_acquire_seconds",
+            "Time spent waiting for a database connection.",
+            labels=("pool",),
         )
+        self._query_seconds = bot.metrics.histogram(
+            "nest_db_query_seconds", "Time spent running database queries.",
+            labels=("statement",),
+        )
+
+        config = bot.options.get("database_pools", {})
+        self.workloads: Dict[str, Workload] = {
+            name: Workload(name, {**defaults, **(config.get(name) or {})},
+                           bot.loop)
+            for name, defaults in POOLS.items()
+        }
+        for name, help, func in (
+            ("size", "Open connections per pool.",
+             lambda workload: workload.pool.get_size()
+             if workload.pool else 0),
+            ("in_use", "Connections taken from each pool.",
+             Workload.in_use),
+            ("max", "Maximum connections per pool.",
+             lambda workload: workload.pool.get_max_size()
+             if workload.pool else workload.options["max_size"]),
+            ("waiting", "Tasks waiting for a connection per pool.",
+             lambda workload: workload.waiting),
+        ):
+            bot.metrics.gauge(
+                f"nest_db_pool_{name}", help,
+                lambda func=func: {(workload.name,): func(workload)
+                                   for workload in self.workloads.values()},
+                labels=("pool",),
+            )
+
+        self._pool_tasks = [
+            bot.loop.create_task(self._create_pool(workload))
+            for workload in self.workloads.values()
+        ]
+        self._start_listening()
+
+    def cog_unload(self):
+        for task in self._pool_tasks:
+            task.cancel()
+        if self._restart is not None:
+            self._restart.cancel()
+        self._listen_task.cancel()
+        if self._listener and not self._listener.is_closed():
+            asyncio.ensure_future(self._listener.close())
+        for workload in self.workloads.values():
+            if workload.pool is not None:
+                asyncio.ensure_future(workload.pool.close())
+        for name in ("size", "in_use", "max", "waiting"):
+            self._metrics.unregister(f"nest_db_pool_{name}")
+
+    def acquire(self, workload: str) -> Acquire:
+        """Take a connection from a pool, as ``pool.acquire()`` does.
+
+        Usage::
+
+            async with db.acquire("read") as conn:
+                await conn.fetchval("SELECT 1")
+
+        Parameters
+        ----------
+        workload: str
+            Pool to take from, one of ``read``, ``write`` or ``admin``.
+        """
+        try:
+            return Acquire(self.workloads[workload], self._acquire_seconds)
+        except KeyError:
+            raise ValueError(
+                f"Database workload must be one of {tuple(self.workloads)}"
+            ) from None
+
+    async def _create_pool(self, workload: Workload):
+        """Create a pool, retrying until the database is reachable."""
+        while True:
+            try:
+                workload.pool = await asyncpg.create_pool(
+                    database=self._db, init=self._init, **workload.options
+                )
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError):
+                self._logger.exception(
+                    f"Could not create the {workload.name} pool"
+                )
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            workload.ready.set_result(workload.pool)
+            return
+
+    async def _init(self, conn: asyncpg.Connection):
+        if hasattr(conn, "add_query_logger"):
+            conn.add_query_logger(self._log_query)
+
+    def _log_query(self, record):
+        statement = record.query.lstrip().split(None, 1)
+        self._query_seconds.observe(
+            record.elapsed, statement[0].upper() if statement else ""
+        )
+
+    def subscribe(self, kind: str, cache: LRUCache):
+        """Evict keys from a cache when another process changes them.
+
+        Parameters
+        ----------
+        kind: str
+            Kind of data held by the cache, e.g. ``prefix``.
+        cache: nest.cache.LRUCache
+            Cache keyed by integer IDs.
+        """
+        self._caches.setdefault(kind, []).append(cache)
+
+    def on_change(self, kind: str, callback: Callable[[Optional[int]], None]):
+        """Call a function when another process changes a key.
+
+        Parameters
+        ----------
+        kind: str
+            Kind of data to watch, e.g. ``prefix``.
+        callback: Callable[[Optional[int]], None]
+            Called with the changed key, or None when any key may have
+            changed unnoticed, e.g. after reconnecting.
+        """
+        self._callbacks.setdefault(kind, []).append(callback)
+
+    def _changed(self, kind: str, key: Optional[int]):
+        for callback in self._callbacks.get(kind, ()):
+            try:
+                callback(key)
+            except Exception:
+                self._logger.exception(f"Could not handle change to {kind}")
+
+    async def notify(self, conn: asyncpg.Connection, kind: str, key: int):
+        """|coro|
+
+        Tell every other process that a key has changed.
+        The notification is only delivered once the transaction commits.
+
+        Parameters
+        ----------
+        conn: asyncpg.Connection
+            Connection the change was written with.
+        kind: str
+            Kind of data that was changed.
+        key: int
+            ID of the changed row.
+        """
+        await conn.execute(
+            "SELECT pg_notify($1, $2)", CHANNEL, f"{kind}:{key}:{self._origin}"
+        )
+
+    def _on_notify(self, conn, pid, channel, payload: str):
+        kind, _, rest = payload.partition(":")
+        key, _, origin = rest.partition(":")
+        try:
+            key = int(key)
+        except ValueError:
+            self._logger.warning(f"Ignoring malformed invalidation {payload}")
+            return
+        if origin == self._origin:
+            return
+
+        for cache in self._caches.get(kind, ()):
+            cache.pop(key)
+        self._changed(kind, key)
+
+    def _start_listening(self):
+        self._restart = None
+        self._listen_task = self._loop.create_task(self._listen())
+        self._listen_task.add_done_callback(self._listen_done)
+
+    def _listen_done(self, task: asyncio.Task):
+        if task.cancelled():
+            return
+        # Caches would keep values other processes changed until their TTL.
+        self._logger.error("Invalidation listener died, restarting it",
+                           exc_info=task.exception())
+        self._restart = self._loop.call_later(
+            RECONNECT_DELAY, self._start_listening
+        )
+
+    async def _listen(self):
+        """Keep the LISTEN connection open, reconnecting if it drops."""
+        while True:
+            listener = None
+            try:
+                listener = await asyncpg.connect(database=self._db)
+                await listener.add_listener(CHANNEL, self._on_notify)
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError,
+                    asyncpg.InterfaceError):
+                self._logger.exception("Could not LISTEN for invalidations")
+                if listener is not None:
+                    listener.terminate()
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            self._listener = listener
+
+            # Anything written while disconnected was never heard about.
+            for caches in self._caches.values():
+                for cache in caches:
+                    cache.clear()
+            for kind in self._callbacks:
+                self._changed(kind, None)
+
+            # Ping the connection, a dropped socket is only noticed on use.
+            while not self._listener.is_closed():
+                await asyncio.sleep(RECONNECT_DELAY)
+                try:
+                    await self._listener.execute("SELECT 1")
+                except (OSError, asyncpg.PostgresError,
+                        asyncpg.InterfaceError):
+                    self._listener.terminate()
+
+            self._logger.warning("LISTEN connection lost, reconnecting")
@@ -1,10 +1,78 @@
+import asyncio
+import functools
+from typing import Dict, Optional
+
 from discord.ext import commands
 
+from nest.cache import LRUCache, MISSING
+
+CACHE_SIZE = 50000
+CACHE_TTL = 3600
+
 
 class LocaleStore(commands.Cog):
+    """
+    Provider for user locales.
+
+    Locales are cached per user, including users without a locale set.
+    Cache size and TTL are read from the ``cache.locale`` setting, and
+    other processes are notified of every change.
+
+    Lookups of the same user share a single query, whose result is only
+    cached if the user's locale did not change while it ran.
+    """
+
     def __init__(self, bot):
         self._db = bot.get_cog("PostgreSQL")
 
+        config = bot.options.get("cache", {}).get("locale", {})
+        self.cache = LRUCache(
+            maxsize=int(config.get("size", CACHE_SIZE)),
+            ttl=float(config.get("ttl", CACHE_TTL)),
+        )
+        # Queries in flight, by user.
+        self._loads: Dict[int, asyncio.Future] = {}
+
+        bot.caches["locale"] = self.cache
+        self._db.subscribe("locale", self.cache)
+        self._db.on_change("locale", self._changed)
+
+    def _changed(self, user_id: Optional[int]):
+        if user_id is None:
+            self._loads.clear()
+        else:
+            self._loads.pop(user_id, None)
+
+    async def _load(self, user_id: int) -> Optional[str]:
+        async with self._db.acquire("read") as conn:
+            return await conn.fetchval(
+                "SELECT locale FROM userdata WHERE id=$1", user_id,
+            )
+
+    def _loaded(self, user_id: int, load: asyncio.Future):
+        failed = load.cancelled() or load.exception() is not None
+        # Users changed while loading were dropped from _loads.
+        if self._loads.get(user_id) is load:
+            del self._loads[user_id]
+            if not failed:
+                self.cache.set(user_id, load.result())
+
+    def cached(self, ctx: commands.Context):
+        """Returns the locale for a context if it is cached, without a query.
+
+        Parameters
+        ----------
+        ctx: commands.Context
+            Context to return a locale for.
+
+        Returns
+        -------
+        str
+            Locale for the given context, or None if not cached or not set.
+        """
+        locale = self.cache.get(ctx.message.author.id)
+        return None if locale is MISSING else locale
+
     async def get(self, ctx: commands.Context):
         """|coro|
 
@@ -20,12 +88,20 @@ class LocaleStore(commands.Cog):
         str
             Locale for the given context.
         """
-        async with self._db.pool.acquire() as conn:
-            locale = await conn.fetchval(
-                "SELECT locale FROM userdata WHERE id=$1",
-                ctx.message.author.id,
+        user_id = ctx.message.author.id
+
+        locale = self.cache.get(user_id)
+        if locale is not MISSING:
+            return locale
+
+        load = self._loads.get(user_id)
+        if load is None:
+            load = self._loads[user_id] = asyncio.ensure_future(
+                self._load(user_id)
             )
-        return locale
+            load.add_done_callback(functools.partial(self._loaded, user_id))
+        # Cancelling one lookup must not fail the others sharing the query.
+        return await asyncio.shield(load)
 
     async def set(self, ctx: commands.Context, locale: str):
         """|coro|
@@ -39,12 +115,17 @@ class LocaleStore(commands.Cog):
         data: Dict[str, str]
             Dictionary of prefixes.
         """
-        async with self._db.pool.acquire() as conn:
-            await conn.execute(
-                """
-                INSERT INTO userdata (id, locale) VALUES ($1, $2)
-                    ON CONFLICT (id) DO UPDATE SET (id, locale) = ($1, $2);
-                """,
-                ctx.author.id,
-                locale,
-            )
+        async with self._db.acquire("admin") as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    """
+                    INSERT INTO userdata (id, locale) VALUES ($1, $2)
+                        ON CONFLICT (id) DO UPDATE SET (id, locale) = ($1, $2);
+                    """,
+                    ctx.author.id,
+                    locale,
+                )
+                await self._db.notify(conn, "locale", ctx.author.id)
+
+        self._loads.pop(ctx.author.id, None)
+        self.cache.set(ctx.author.id, locale)
@@ -1,16 +1,198 @@
+import asyncio
+import functools
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import asyncpg
 import discord
 from discord.ext import commands
 
+from nest.cache import LRUCache, MISSING
+
+CACHE_SIZE = 10000
+CACHE_TTL = 3600
+PRELOAD_BATCH = 5000
+PRELOAD_DELAY = 5.0
+
 
 class PrefixStore(commands.Cog):
     """
     Provider for prefixes.
+
+    Prefixes are cached per guild, including guilds without a custom prefix.
+    Cache size and TTL are read from the ``cache.prefix`` setting, and
+    other processes are notified of every change.
+
+    The first characters of every custom prefix are loaded when the store
+    starts and kept up to date, so that messages which cannot start with
+    their guild's prefix are rejected without a query, see :meth:`get`.
+
+    Prefixes of guilds becoming available are loaded in bulk, one query
+    per shard once it is ready, or per ``cache.prefix.preload_batch``
+    guilds, whichever comes first. Lookups of the same guild while it
+    loads share a single query.
+
+    Attributes
+    ----------
+    first_chars: Optional[Set[str]]
+        First character of every custom prefix, or None until loaded.
+    skipped: int
+        Lookups answered without a query by the first character check.
     """
 
     def __init__(self, bot):
         self._db = bot.get_cog("PostgreSQL")
+        self._logger = logging.getLogger("nest.db.prefix")
+        self.first_chars: Optional[Set[str]] = None
+        self.skipped = 0
+
+        config = bot.options.get("cache", {}).get("prefix", {})
+        self.cache = LRUCache(
+            maxsize=int(config.get("size", CACHE_SIZE)),
+            ttl=float(config.get("ttl", CACHE_TTL)),
+        )
+        self._loop = bot.loop
+        self._batch = int(config.get("preload_batch", PRELOAD_BATCH))
+        self._delay = float(config.get("preload_delay", PRELOAD_DELAY))
+        # Guilds waiting to be preloaded, and their flush timers, by shard.
+        self._pending: Dict[Optional[int], Set[int]] = {}
+        self._timers: Dict[Optional[int], asyncio.TimerHandle] = {}
+        # Queries in flight, by every guild they load.
+        self._loads: Dict[int, asyncio.Future] = {}
+
+        bot.caches["prefix"] = self.cache
+        self._db.subscribe("prefix", self.cache)
+        self._db.on_change("prefix", self._changed)
+
+        self._loop.create_task(self._load_first_chars())
+        # When reloaded, guilds are already available.
+        for guild in bot.guilds:
+            self._queue(guild)
+
+    def cog_unload(self):
+        for timer in self._timers.values():
+            timer.cancel()
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild):
+        self._queue(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        self._queue(guild)
+
+    @commands.Cog.listener()
+    async def on_shard_ready(self, shard_id):
+        self._flush(shard_id)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        for shard_id in list(self._pending):
+            self._flush(shard_id)
+
+    def _queue(self, guild: discord.Guild):
+        # Not a lookup, so it must not count as a cache hit or miss.
+        if guild.id in self._loads or guild.id in self.cache:
+            return
+        shard_id = guild.shard_id
+        pending = self._pending.setdefault(shard_id, set())
+        pending.add(guild.id)
+        if len(pending) >= self._batch:
+            self._flush(shard_id)
+        elif shard_id not in self._timers:
+            self._timers[shard_id] = self._loop.call_later(
+                self._delay, self._flush, shard_id
+            )
+
+    def _flush(self, shard_id: Optional[int]):
+        timer = self._timers.pop(shard_id, None)
+        if timer is not None:
+            timer.cancel()
+        guild_ids = self._pending.pop(shard_id, None)
+        if guild_ids:
+            self._start(guild_ids)
+
+    def _start(self, guild_ids: Iterable[int]) -> asyncio.Future:
+        guild_ids = list(guild_ids)
+        load = asyncio.ensure_future(self._load(guild_ids))
+        for guild_id in guild_ids:
+            self._loads[guild_id] = load
+        load.add_done_callback(functools.partial(self._loaded, guild_ids))
+        return load
 
-    async def get(self, message: discord.Message):
+    async def _load(self, guild_ids: List[int]) -> Dict[int, Optional[str]]:
+        async with self._db.acquire("read") as conn:
+            rows = await conn.fetch(
+                "SELECT id, prefix FROM guild WHERE id = ANY($1)", guild_ids,
+            )
+        prefixes = dict.fromkeys(guild_ids)
+        prefixes.update((row["id"], row["prefix"]) for row in rows)
+        return prefixes
+
+    def _loaded(self, guild_ids: List[int], load: asyncio.Future):
+        if load.cancelled():
+            prefixes = {}
+        elif load.exception() is not None:
+            if len(guild_ids) > 1:
+                self._logger.error("Could not preload prefixes",
+                                   exc_info=load.exception())
+            prefixes = {}
+        else:
+            prefixes = load.result()
+
+        for guild_id in guild_ids:
+            # Guilds changed while loading were dropped from _loads.
+            if self._loads.get(guild_id) is load:
+                del self._loads[guild_id]
+                if guild_id in prefixes:
+                    self.cache.set(guild_id, prefixes[guild_id])
+
+    def _changed(self, guild_id: Optional[int]):
+        if guild_id is None:
+            self._loads.clear()
+            asyncio.ensure_future(self._load_first_chars())
+        else:
+            self._loads.pop(guild_id, None)
+            asyncio.ensure_future(self._add_first_char(guild_id))
+
+    async def _load_first_chars(self):
+        try:
+            async with self._db.acquire("read") as conn:
+                rows = await conn.fetch(
+                    "SELECT DISTINCT left(prefix, 1) AS first FROM guild "
+                    "WHERE prefix IS NOT NULL"
+                )
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError):
+            self._logger.exception("Could not load custom prefixes")
+            self.first_chars = None
+            return
+        self.first_chars = {row["first"] for row in rows}
+
+    async def _add_first_char(self, guild_id: int):
+        try:
+            async with self._db.acquire("read") as conn:
+                prefix = await conn.fetchval(
+                    "SELECT prefix FROM guild WHERE id=$1", guild_id,
+                )
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError):
+            self._logger.exception("Could not load a changed prefix")
+            self.first_chars = None
+            return
+        if prefix is not None and self.first_chars is not None:
+            self.first_chars.add(prefix[:1])
+
+    def _may_start_with_prefix(
+        self, content: str, default: Union[str, Tuple[str, ...]]
+    ) -> bool:
+        first_chars = self.first_chars
+        if first_chars is None or "" in first_chars \
+                or not isinstance(default, (str, tuple)):
+            return True
+        # A custom prefix replaces the default, so only a query can tell.
+        return content.startswith(default) or content[:1] in first_chars
+
+    async def get(self, message: discord.Message,
+                  default: Union[str, Tuple[str, ...]] = None):
         """|coro|
 
         Returns a valid prefix when given a message.
@@ -19,18 +201,40 @@ class PrefixStore(commands.Cog):
         ----------
         message: discord.Message
             The message to get a prefix for.
+        default: Union[str, Tuple[str, ...]]
+            Prefix, or prefixes, used by guilds without a custom prefix.
+            When given, and the message can neither start with it nor with
+            any known custom prefix, None is returned without a query, as
+            the message cannot be a command anyway.
 
         Returns
         -------
         str
             Prefix set by guild, if any.
         """
-        if message.guild:
-            async with self._db.pool.acquire() as conn:
-                return await conn.fetchval(
-                    "SELECT prefix FROM guild WHERE id=$1",
-                    message.guild.id,
-                )
+        guild = message.guild
+        if not guild:
+            return None
+
+        prefix = self.cache.get(guild.id)
+        if prefix is not MISSING:
+            return prefix
+
+        if default is not None and not self._may_start_with_prefix(
+            message.content, default
+        ):
+            self.skipped += 1
+            return None
+
+        # Don't wait for the rest of the shard to load this guild.
+        if guild.id in self._pending.get(guild.shard_id, ()):
+            self._flush(guild.shard_id)
+        load = self._loads.get(guild.id)
+        if load is None:
+            load = self._start([guild.id])
+        # Cancelling one lookup must not fail the others sharing the query.
+        prefixes = await asyncio.shield(load)
+        return prefixes[guild.id]
 
     async def set(self, ctx: commands.Context, prefix: str):
         """|coro|
@@ -47,14 +251,21 @@ class PrefixStore(commands.Cog):
         if not ctx.guild:
             return
 
-        async with self._db.pool.acquire() as conn:
-            await conn.execute(
-                """
-                INSERT INTO guild (id, prefix)
-                    VALUES ($1, $2)
-                    ON CONFLICT (id) DO UPDATE
-                        SET (id, prefix) = ($1, $2);
-                """,
-                ctx.guild.id,
-                prefix,
-            )
+        async with self._db.acquire("admin") as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    """
+                    INSERT INTO guild (id, prefix)
+                        VALUES ($1, $2)
+                        ON CONFLICT (id) DO UPDATE
+                            SET (id, prefix) = ($1, $2);
+                    """,
+                    ctx.guild.id,
+                    prefix,
+                )
+                await self._db.notify(conn, "prefix", ctx.guild.id)
+
+        self._loads.pop(ctx.guild.id, None)
+        self.cache.set(ctx.guild.id, prefix)
+        if self.first_chars is not None:
+            self.first_chars.add(prefix[:1])
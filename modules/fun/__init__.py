@@ -15,7 +15,7 @@ def setup(bot):
 
     bot.add_cog(DeveloperFun())
     bot.add_cog(Comics())
-    bot.add_cog(RandomImages())
+    bot.add_cog(RandomImages(bot))
     bot.add_cog(RandomCommands())
     bot.add_cog(ReactionImages(bot))
     bot.add_cog(TextManipulation())
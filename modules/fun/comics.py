@@ -20,19 +20,19 @@ class Comics(commands.Cog):
         else:
             url = f"https://xkcd.com/info.0.json"
 
-        async with ctx.bot.session.get(url) as resp:
-            if resp.status not in [200, 404]:
-                raise exceptions.WebAPIInvalidResponse(
-                    api="xkcd", status=resp.status
-                )
-
-            if resp.status == 404:
-                await ctx.send(
-                    ctx._("not_a_comic").format(num=number, comic="XKCD")
-                )
-                return
-
-            data = await resp.json()
+        resp = await ctx.bot.web.fetch(url, api="xkcd")
+        if resp.status not in [200, 404]:
+            raise exceptions.WebAPIInvalidResponse(
+                api="xkcd", status=resp.status
+            )
+
+        if resp.status == 404:
+            await ctx.send(
+                ctx._("not_a_comic").format(num=number, comic="XKCD")
+            )
+            return
+
+        data = resp.json()
 
         number = data["num"]
         image = data["img"]
@@ -5,7 +5,7 @@ Provides the fakegit command.
 import discord
 from discord.ext import commands
 
-from nest import exceptions
+from nest import exceptions, helpers
 
 WHATTHECOMMIT_API_URL = "http://whatthecommit.com/index.json"
 
@@ -14,6 +14,7 @@ class DeveloperFun(commands.Cog):
     """Developer humor (or lack thereof)."""
 
     @commands.command()
+    @helpers.untranslated
     async def fakegit(self, ctx):
         """Generate a fake commit message that looks like a Discord webhook."""
 
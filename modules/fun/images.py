@@ -9,6 +9,8 @@ from discord.ext import commands
 
 from nest import exceptions
 
+from .pool import ImagePool
+
 SERVICES = {
     "dog": ("https://random.dog/woof.json?filter=mp4", "url"),
     "birb": ("https://random.birb.pw/tweet.json", "file"),
@@ -37,14 +39,7 @@ def gen_command(service: str, url: str, key: str):
     async def image(self, ctx):
         """Image search command, common for all APIs."""
 
-        async with ctx.bot.session.get(url) as resp:
-            if not resp.status == 200:
-                raise exceptions.WebAPIInvalidResponse(
-                    api=service, status=resp.status
-                )
-
-            data = await resp.json(content_type=None)  # some APIs don't set it
-            img = TEXT.get(service, "") + data[key]
+        img = await self._pool.get(service)
 
         embed = discord.Embed()
         embed.set_image(url=img)
@@ -61,16 +56,39 @@ def gen_command(service: str, url: str, key: str):
 class _RandomImages:
     """Hidden base class."""
 
-    @commands.command(aliases=["inspirobot", "inspire"])
-    async def inspiro(self, ctx):
-        """Generate a random image from Inspirobot."""
+    def __init__(self, bot):
+        self._web = bot.web
+        self._pool = ImagePool(self._fetch, **bot.options.get("image_pool", {}))
 
-        async with ctx.bot.session.get(INSPIROBOT_URL) as resp:
+    def cog_unload(self):
+        self._pool.close()
+
+    async def _fetch(self, service: str) -> str:
+        """Fetch a new image URL from a service."""
+        if service == "inspiro":
+            resp = await self._web.fetch(
+                INSPIROBOT_URL, api="inspirobot", cache=False
+            )
             if resp.status != 200:
                 raise exceptions.WebAPIInvalidResponse(
                     api="inspirobot", status=resp.status
                 )
-            url = await resp.text()
+            return resp.text()
+
+        url, key = SERVICES[service]
+        resp = await self._web.fetch(url, api=service, cache=False)
+        if not resp.status == 200:
+            raise exceptions.WebAPIInvalidResponse(
+                api=service, status=resp.status
+            )
+
+        return TEXT.get(service, "") + resp.json()[key]
+
+    @commands.command(aliases=["inspirobot", "inspire"])
+    async def inspiro(self, ctx):
+        """Generate a random image from Inspirobot."""
+
+        url = await self._pool.get("inspiro")
 
         embed = discord.Embed()
         embed.set_image(url=url)
@@ -0,0 +1,94 @@
+"""
+Keep random images fetched ahead of time.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, Hashable
+
+from nest import exceptions
+
+POOL_SIZE = 5
+LOW_WATER = 2
+
+
+class ImagePool:
+    """Per-key buffers of image URLs, refilled in the background.
+
+    A buffer is only filled once its key is first used, so that loading a
+    module doesn't spend the rate limit commands share on prefetches.
+
+    Parameters
+    ----------
+    fetch: Callable[[Hashable], Awaitable[str]]
+        Coroutine function fetching a new image URL for a key.
+    size: int
+        Number of URLs buffered per key. 0 disables buffering.
+    low_water: int
+        Refill a buffer once it holds fewer URLs than this.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[Hashable], Awaitable[str]],
+        *,
+        size: int = POOL_SIZE,
+        low_water: int = LOW_WATER,
+    ):
+        self._logger = logging.getLogger("nest.fun.pool")
+        self._fetch = fetch
+        self._buffers: Dict[Hashable, deque] = {}
+        self._refills: Dict[Hashable, asyncio.Future] = {}
+        self.size = int(size)
+        self.low_water = min(int(low_water), self.size)
+
+    async def get(self, key: Hashable) -> str:
+        """|coro|
+
+        Take a buffered URL, or fetch one if the buffer is empty.
+
+        Parameters
+        ----------
+        key: Hashable
+            Key to get a URL for, e.g. a service or category.
+        """
+        buffer = self._buffers.setdefault(key, deque())
+        url = buffer.popleft() if buffer else None
+
+        if url is None or len(buffer) < self.low_water:
+            self.refill(key)
+
+        if url is None:
+            url = await self._fetch(key)
+        return url
+
+    def refill(self, key: Hashable):
+        """Start refilling a buffer, unless it is already being refilled."""
+        if not self.size or key in self._refills:
+            return
+
+        task = asyncio.ensure_future(self._fill(key))
+        self._refills[key] = task
+        task.add_done_callback(lambda _: self._refills.pop(key, None))
+
+    def close(self):
+        """Stop every refill in progress."""
+        for task in tuple(self._refills.values()):
+            task.cancel()
+
+    async def _fill(self, key: Hashable):
+        buffer = self._buffers.setdefault(key, deque())
+        while len(buffer) < self.size:
+            try:
+                buffer.append(await self._fetch(key))
+            except (exceptions.WebAPIException, KeyError, ValueError):
+                # Commands fall back to a live fetch and report the error.
+                self._logger.warning(f"Could not prefetch {key}", exc_info=True)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Nobody awaits refills, so this is the only report.
+                self._logger.exception(f"Could not prefetch {key}")
+                return
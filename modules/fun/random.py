@@ -5,6 +5,8 @@ RNG commands.
 import random
 from discord.ext import commands
 
+from nest import helpers
+
 AAA = ("a", "A")
 
 
@@ -44,6 +46,7 @@ class RandomCommands(commands.Cog):
         await ctx.send(random.choice(ctx._("8ball")))
 
     @commands.command(aliases=("a", "aa"))
+    @helpers.untranslated
     async def aaa(self, ctx):
         """AAAAAAA!"""
         await ctx.send(random.choice(AAA) * random.randint(1, 200))
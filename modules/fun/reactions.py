@@ -7,6 +7,8 @@ from discord.ext import commands
 
 from nest import exceptions
 
+from .pool import ImagePool
+
 WEEBSH_API = "https://api.weeb.sh/images/random"
 
 CATEGORIES = (
@@ -33,16 +35,7 @@ def gen_command(category: str):
     )
     async def image(self, ctx):
         """Image search command, common for all categories."""
-        async with ctx.bot.session.get(
-            WEEBSH_API, params={"type": category}, headers=self._headers
-        ) as resp:
-            if not resp.status == 200:
-                raise exceptions.WebAPIInvalidResponse(
-                    api="weeb.sh", status=resp.status
-                )
-
-            data = await resp.json()  # some APIs don't set it
-            img = data["url"]
+        img = await self._pool.get(category)
 
         embed = discord.Embed()
         embed.set_image(url=img)
@@ -59,6 +52,27 @@ class _ReactionImages:
 
     def __init__(self, bot):
         self._headers = {"Authorization": bot.tokens["weebsh"]}
+        self._web = bot.web
+        self._pool = ImagePool(self._fetch, **bot.options.get("image_pool", {}))
+
+    def cog_unload(self):
+        self._pool.close()
+
+    async def _fetch(self, category: str) -> str:
+        """Fetch a new image URL for a category."""
+        resp = await self._web.fetch(
+            WEEBSH_API,
+            api="weeb.sh",
+            params={"type": category},
+            headers=self._headers,
+            cache=False,
+        )
+        if not resp.status == 200:
+            raise exceptions.WebAPIInvalidResponse(
+                api="weeb.sh", status=resp.status
+            )
+
+        return resp.json()["url"]
 
 
 for c in CATEGORIES:
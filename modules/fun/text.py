@@ -7,6 +7,8 @@ import string
 import discord
 from discord.ext import commands
 
+from nest import helpers
+
 XD = """```
 {word}           {word}     {word}  {word}
   {word}       {word}       {word}     {word}
@@ -25,6 +27,7 @@ class TextManipulation(commands.Cog):
         return embed
 
     @commands.command()
+    @helpers.untranslated
     async def bigtext(self, ctx, *, text: commands.clean_content):
         """Convert text into huge emoji."""
 
@@ -33,12 +36,14 @@ class TextManipulation(commands.Cog):
         await ctx.send(res, embed=self._create_embed(ctx.author))
 
     @commands.command()
+    @helpers.untranslated
     async def xd(self, ctx, *, word: commands.clean_content):
         """Make an XD out of the word given."""
 
         await ctx.send(XD.format(word=word), embed=self._create_embed(ctx.author))
 
     @commands.command()
+    @helpers.untranslated
     async def clapify(self, ctx, *, text: commands.clean_content):
         """Add clap emojis after each word."""
 
@@ -46,6 +51,7 @@ class TextManipulation(commands.Cog):
         await ctx.send(res, embed=self._create_embed(ctx.author))
 
     @commands.command()
+    @helpers.untranslated
     async def tobleflep(self, ctx):
         """Tableflip, but random."""
 
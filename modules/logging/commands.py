@@ -2,12 +2,94 @@
 Log usage of commands.
 """
 
+import asyncio
+import logging
+
+import asyncpg
 from discord.ext import commands
 
+COLUMNS = ("id", "command", "message", "author", "guild")
+SQL_INSERT = """
+INSERT INTO command (id, command, message, author, guild)
+    VALUES ($1, $2, $3, $4, $5)
+    ON CONFLICT DO NOTHING
+"""
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1000
+QUEUE_SIZE = 10000
+RESTART_DELAY = 1
+
 
 class CommandLogger(commands.Cog):
+    """
+    Buffers commands and writes them to the database in batches.
+
+    Configured by the ``command_log`` setting: ``batch_size`` rows or
+    ``flush_interval`` milliseconds trigger a flush, whichever comes first.
+    Once ``queue_size`` rows are waiting, new rows are dropped and counted
+    in ``dropped``.
+    """
+
     def __init__(self, bot):
         self._db = bot.get_cog("PostgreSQL")
+        self._logger = logging.getLogger("nest.logging")
+
+        config = bot.options.get("command_log", {})
+        self.batch_size = int(config.get("batch_size", BATCH_SIZE))
+        self.flush_interval = int(
+            config.get("flush_interval", FLUSH_INTERVAL)
+        ) / 1000
+
+        self.dropped = 0
+        self._loop = bot.loop
+        self._closing = False
+        self._shutdown = None
+        self._full = asyncio.Event()
+        self._queue = asyncio.Queue(
+            maxsize=int(config.get("queue_size", QUEUE_SIZE))
+        )
+        self._flusher = None
+        self._start_flusher()
+
+    def cog_unload(self):
+        # NestClient.close has already shut down the logger before
+        # extensions are unloaded, this only matters when reloading.
+        if self._shutdown is None:
+            asyncio.ensure_future(self.shutdown())
+
+    def _start_flusher(self):
+        if self._closing:
+            return
+        self._flusher = self._loop.create_task(self._flush_loop())
+        self._flusher.add_done_callback(self._flusher_done)
+
+    def _flusher_done(self, task: asyncio.Task):
+        if task.cancelled() or self._closing:
+            return
+        # Rows would pile up until the queue is full, then be dropped.
+        self._logger.error("Command log flusher died, restarting it",
+                           exc_info=task.exception())
+        self._loop.call_later(RESTART_DELAY, self._start_flusher)
+
+    async def shutdown(self):
+        """|coro|
+
+        Stop the background flusher and write every queued row.
+        Calling it again waits for the first call to finish.
+        """
+        if self._shutdown is None:
+            self._shutdown = asyncio.ensure_future(self._stop())
+        await asyncio.shield(self._shutdown)
+
+    async def _stop(self):
+        self._closing = True
+        self._full.set()
+        try:
+            await self._flusher
+        except Exception:
+            self._logger.exception("Command log flusher failed")
+        await self._flush()
 
     @commands.Cog.listener()
     async def on_command(self, ctx: commands.Context):
@@ -20,14 +102,51 @@ class CommandLogger(commands.Cog):
         ctx: commands.Context
             The context to log.
         """
-        async with self._db.pool.acquire() as conn:
-            await conn.execute(
-                """
-                INSERT INTO command (id, command, message, author, guild) VALUES ($1, $2, $3, $4, $5)
-                """,
-                ctx.message.id,
-                ctx.command.name,
-                ctx.message.content,
-                ctx.author.id,
-                ctx.guild.id if ctx.guild else None
-            )
+        record = (
+            ctx.message.id,
+            ctx.command.name,
+            ctx.message.content,
+            ctx.author.id,
+            ctx.guild.id if ctx.guild else None,
+        )
+
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return
+
+        if self._shutdown is not None and self._shutdown.done():
+            # The flusher is gone, write commands finishing after shutdown.
+            self._loop.create_task(self._flush())
+        elif self._queue.qsize() >= self.batch_size:
+            self._full.set()
+
+    async def _flush_loop(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self._flush()
+
+    async def _flush(self):
+        """Write queued rows in batches of at most ``batch_size``."""
+        while not self._queue.empty():
+            count = min(self.batch_size, self._queue.qsize())
+            batch = [self._queue.get_nowait() for _ in range(count)]
+            try:
+                await self._write(batch)
+            except Exception:
+                self._logger.exception(f"Could not log {count} commands")
+
+    async def _write(self, batch: list):
+        async with self._db.acquire("write") as conn:
+            try:
+                await conn.copy_records_to_table(
+                    "command", records=batch, columns=COLUMNS
+                )
+            except asyncpg.UniqueViolationError:
+                # COPY can't skip duplicates, so retry the batch row by row.
+                await conn.executemany(SQL_INSERT, batch)
@@ -0,0 +1,9 @@
+-- Hourly per-command, per-guild usage counts, kept up to date by
+-- utils/command_log.py maintain. DMs are counted under guild 0.
+CREATE TABLE IF NOT EXISTS command_hourly (
+    hour TIMESTAMPTZ NOT NULL,
+    command TEXT NOT NULL,
+    guild BIGINT NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (hour, command, guild)
+);
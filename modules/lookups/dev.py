@@ -23,17 +23,17 @@ class PackageLookups(commands.Cog):
         """
         data_url = URL_PYPI_API.format(package=package)
 
-        async with ctx.bot.session.get(data_url) as resp:
-            if not resp.status in [200, 404]:
-                raise exceptions.WebAPIInvalidResponse(
-                    api="PyPI", status=resp.status
-                )
+        resp = await ctx.bot.web.fetch(data_url, api="pypi")
+        if not resp.status in [200, 404]:
+            raise exceptions.WebAPIInvalidResponse(
+                api="PyPI", status=resp.status
+            )
 
-            if resp.status == 404:
-                await ctx.send("{package} isn't a package on PyPI!")
-                return
+        if resp.status == 404:
+            await ctx.send("{package} isn't a package on PyPI!")
+            return
 
-            data = await resp.json()
+        data = resp.json()
 
         info = data["info"]
 
@@ -57,17 +57,17 @@ class PackageLookups(commands.Cog):
         """
         data_url = URL_NPM_API.format(package=package, version=version)
 
-        async with ctx.bot.session.get(data_url) as resp:
-            if not resp.status in [200, 404]:
-                raise exceptions.WebAPIInvalidResponse(
-                    api="NPMjs", status=resp.status
-                )
+        resp = await ctx.bot.web.fetch(data_url, api="npm")
+        if not resp.status in [200, 404]:
+            raise exceptions.WebAPIInvalidResponse(
+                api="NPMjs", status=resp.status
+            )
 
-            if resp.status == 404:
-                await ctx.send("{package} isn't a package on PyPI!")
-                return
+        if resp.status == 404:
+            await ctx.send("{package} isn't a package on PyPI!")
+            return
 
-            info = await resp.json()
+        info = resp.json()
 
         embed = discord.Embed(
             title=f"{info['name']} `({info['version']})`",
@@ -6,26 +6,36 @@ from io import BytesIO
 
 import discord
 from discord.ext import commands
-from pycountry import countries
 
-from nest import exceptions
+from nest import exceptions, helpers
+
+pycountry = helpers.lazy_import("pycountry")
 
 URL_MCUUID_API = "https://api.mojang.com/users/profiles/minecraft/{user}"
 URL_MCSKIN_API = "https://visage.surgeplay.com/{image}/{uuid}.png"
 URL_OSU_API = "https://osu.ppy.sh/api/get_user"
 
 
+def country_name(code: str) -> str:
+    """Return the name of a country from its ISO 3166-1 alpha-2 code."""
+    try:
+        country = pycountry.countries.get(alpha_2=code)
+    except (KeyError, LookupError):
+        country = None
+    return country.name if country else code
+
+
 class GamingLookups(commands.Cog):
     @commands.command()
     async def mcskin(self, ctx, user: str, image: str = "full"):
         url = URL_MCUUID_API.format(user=user)
 
         # Mojang API returns empty response instead of 404 :(
-        async with ctx.bot.session.get(url) as resp:
-            if resp.status == 204:
-                uuid = None
-            else:
-                uuid = (await resp.json())["id"]
+        resp = await ctx.bot.web.fetch(url, api="mojang")
+        if resp.status == 204:
+            uuid = None
+        else:
+            uuid = resp.json()["id"]
 
         if not uuid:
             await ctx.send(ctx._("mc_usernotfound").format(user))
@@ -33,13 +43,13 @@ class GamingLookups(commands.Cog):
 
         url = URL_MCSKIN_API.format(image=image, uuid=uuid)
 
-        async with ctx.bot.session.get(url) as resp:
-            if resp.status == 200:
-                image = BytesIO(await resp.read())
-            else:
-                raise exceptions.WebAPIInvalidResponse(
-                    api="surgeplay", status=resp.status
-                )
+        resp = await ctx.bot.web.fetch(url, api="surgeplay")
+        if resp.status == 200:
+            image = BytesIO(resp.body)
+        else:
+            raise exceptions.WebAPIInvalidResponse(
+                api="surgeplay", status=resp.status
+            )
 
         await ctx.send(file=discord.File(fp=image, filename=f"{uuid}.png"))
 
@@ -47,13 +57,14 @@ class GamingLookups(commands.Cog):
     async def osu(self, ctx, user: str):
         query = {"k": ctx.bot.tokens["osu"], "u": user}
 
-        async with ctx.bot.session.get(URL_OSU_API, params=query) as response:
-            if response.status == 200:
-                data = await response.json()
-            else:
-                return
+        response = await ctx.bot.web.fetch(URL_OSU_API, api="osu", params=query)
+        if response.status == 200:
+            data = response.json()
+        else:
+            return
 
-        user = data[0]
+        # Responses are shared with other commands, so copy before editing.
+        user = dict(data[0])
 
         keys = {
             ctx._("Play Count"): "playcount",
@@ -81,7 +92,7 @@ class GamingLookups(commands.Cog):
 
         # Convert some data in the dict before iterating through it
         user["accuracy"] = round(float(user["accuracy"]), 2)
-        user["country"] = countries.get(alpha_2="PH").name
+        user["country"] = country_name(user["country"])
 
         for field, value in keys.items():
             embed.add_field(name=field, value=user[value], inline=True)
@@ -19,13 +19,13 @@ class Kitsu(commands.Cog):
         req = "anime" if ctx.invoked_with == "kitsu" else ctx.invoked_with
         url = f"https://kitsu.io/api/edge/{req}"
         params = {"filter[text]": name, "page[limit]": 1}
-        async with ctx.bot.session.get(url, params=params) as resp:
-            if not resp.status == 200:
-                raise exceptions.WebAPIInvalidResponse(
-                    api="kitsu", status=resp.status
-                )
+        resp = await ctx.bot.web.fetch(url, api="kitsu", params=params)
+        if not resp.status == 200:
+            raise exceptions.WebAPIInvalidResponse(
+                api="kitsu", status=resp.status
+            )
 
-            data = await resp.json(content_type="application/vnd.api+json")
+        data = resp.json()
 
         if not data["meta"]["count"]:
             raise exceptions.WebAPINoResults(api="kitsu", q=name)
@@ -5,8 +5,6 @@ Provides language commands.
 :license: MIT, see LICENSE.md for details.
 """
 
-import json
-
 import discord
 from discord.ext import commands
 
@@ -24,14 +22,13 @@ class LanguageCommands(commands.Cog):
         url = API_JISHO_ORG.format(word)
         headers = {"Content-type": "application/json"}
 
-        async with ctx.bot.session.get(url, headers=headers) as response:
-            if response.status == 200:
-                data = await response.text()
-                response = json.loads(data)
-            else:
-                raise exceptions.WebAPIInvalidResponse(
-                    api="jisho", status=response.status
-                )
+        response = await ctx.bot.web.fetch(url, api="jisho", headers=headers)
+        if response.status == 200:
+            response = response.json()
+        else:
+            raise exceptions.WebAPIInvalidResponse(
+                api="jisho", status=response.status
+            )
 
         data = response["data"][0]
 
@@ -58,16 +55,15 @@ class LanguageCommands(commands.Cog):
         """Grab a word from urban dictionary."""
 
         params = {"term": word}
-        async with ctx.bot.session.get(
-            API_URBAN_DICTIONARY, params=params
-        ) as response:
-            if response.status == 200:
-                data = await response.text()
-                response = json.loads(data)
-            else:
-                raise exceptions.WebAPIInvalidResponse(
-                    api="urbandictionary.com", status=response.status
-                )
+        response = await ctx.bot.web.fetch(
+            API_URBAN_DICTIONARY, api="urban", params=params
+        )
+        if response.status == 200:
+            response = response.json()
+        else:
+            raise exceptions.WebAPIInvalidResponse(
+                api="urbandictionary.com", status=response.status
+            )
 
         if not response["list"]:
             raise exceptions.WebAPINoResults(api="urbandictionary", q=word)
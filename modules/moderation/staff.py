@@ -2,8 +2,13 @@
 Basic moderation utilities for Birb.
 """
 
+from typing import Dict, Set
+
+import discord
 from discord.ext import commands
 
+from nest import helpers
+
 MOD_EMOTICONS = {
     "online": "<:online2:464520569975603200>",
     "offline": "<:offline2:464520569929334784>",
@@ -11,23 +16,122 @@ MOD_EMOTICONS = {
     "dnd": "<:dnd2:464520569560498197>"
 }
 
+
+def is_candidate(member: discord.Member) -> bool:
+    """Whether a member can ban members anywhere in their guild."""
+    return member.guild_permissions.ban_members
+
+
+class ModIndex:
+    """Members of each guild who have ``ban_members``, built on first use.
+
+    Member updates are applied one member at a time. Changes to roles or
+    the guild owner, which can affect any member, discard the guild's
+    entry so it is rebuilt on next use.
+    """
+
+    def __init__(self):
+        self._guilds: Dict[int, Set[int]] = {}
+
+    def get(self, guild: discord.Guild) -> Set[int]:
+        """Ids of the members of a guild who have ``ban_members``."""
+        candidates = self._guilds.get(guild.id)
+        if candidates is None:
+            candidates = self._guilds[guild.id] = self._build(guild)
+        return candidates
+
+    @staticmethod
+    def _build(guild: discord.Guild) -> Set[int]:
+        roles = [role for role in guild.roles
+                 if role.permissions.ban_members
+                 or role.permissions.administrator]
+        if guild.default_role in roles:
+            return {member.id for member in guild.members}
+
+        candidates = {member.id for role in roles for member in role.members}
+        if guild.owner_id is not None:
+            candidates.add(guild.owner_id)
+        return candidates
+
+    def update(self, member: discord.Member):
+        """Recheck a member, e.g. after their roles changed."""
+        candidates = self._guilds.get(member.guild.id)
+        if candidates is None:
+            return
+        if is_candidate(member):
+            candidates.add(member.id)
+        else:
+            candidates.discard(member.id)
+
+    def remove(self, member: discord.Member):
+        """Forget a member who left their guild."""
+        candidates = self._guilds.get(member.guild.id)
+        if candidates is not None:
+            candidates.discard(member.id)
+
+    def invalidate(self, guild: discord.Guild):
+        """Rebuild a guild's entry on next use."""
+        self._guilds.pop(guild.id, None)
+
+
 class CheckMods(commands.Cog):
+    def __init__(self):
+        self.index = ModIndex()
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        self.index.update(member)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        if before.roles != after.roles:
+            self.index.update(after)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        self.index.remove(member)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        if before.permissions != after.permissions:
+            self.index.invalidate(after.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        self.index.invalidate(role.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_update(self, before, after):
+        if before.owner_id != after.owner_id:
+            self.index.invalidate(after)
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild):
+        # Members may have been cached without a join event.
+        self.index.invalidate(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.index.invalidate(guild)
+
     @commands.command(aliases=["staff"])
+    @helpers.untranslated
     async def mods(self, ctx):
-        mods = [m for m in ctx.guild.members 
-                if m.permissions_in(ctx.channel).ban_members and not m.bot]
-
         mods_by_status = {'online': [], 'offline': [], 'idle': [], 'dnd': []}
-        
-        for mod in mods:
-            mods_by_status[str(mod.status)].append(mod)
-        
+
+        # Only channel overwrites are left to check for indexed members.
+        for member_id in sorted(self.index.get(ctx.guild)):
+            mod = ctx.guild.get_member(member_id)
+            if mod is None or mod.bot:
+                continue
+            if mod.permissions_in(ctx.channel).ban_members:
+                mods_by_status[str(mod.status)].append(mod)
+
         msg = ""
 
         for status in ['online', 'idle', 'dnd', 'offline']:
             if mods_by_status[status]:
                 msg += MOD_EMOTICONS[status] + " " + \
                     ", ".join(str(mod) for mod in mods_by_status[status]) + "\n"
-        
-        await ctx.send(msg)
 
+        await ctx.send(msg)
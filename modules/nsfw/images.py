@@ -1,9 +1,10 @@
 import discord
 from discord.ext import commands
-import nsfw_dl
-import nsfw_dl.errors
 
-from nest import exceptions
+from nest import exceptions, helpers
+
+nsfw_dl = helpers.lazy_import("nsfw_dl")
+nsfw_errors = helpers.lazy_import("nsfw_dl.errors")
 
 SERVICES = ["rule34", "e621", "furrybooru", "gelbooru", "konachan", "tbib",
             "xbooru", "yandere"]
@@ -32,6 +33,7 @@ def gen_command(service: str):
     @commands.is_nsfw()
     @commands.command()
     @wrap_fn(service, f"Search {service} for images.")
+    @helpers.untranslated
     async def nsfwsearch(self, ctx, *, query: str = ""):
         """
         NSFW search utility command, common for every library.
@@ -43,7 +45,7 @@ def gen_command(service: str):
             service_arg += 'Random'
         try:
             content = await self.client.download(service_arg, args=query)
-        except nsfw_dl.errors.NoResultsFound:
+        except nsfw_errors.NoResultsFound:
             raise exceptions.WebAPINoResults(api=service, q=query)
         embed = discord.Embed()
         embed.set_image(url=content)
@@ -54,8 +56,18 @@ def gen_command(service: str):
 
 class _NSFWCommands:
     def __init__(self, bot):
-        self.client = nsfw_dl.NSFWDL(session=bot.session, loop=bot.loop)
-        self.client.async_ = True
+        self._bot = bot
+        self._client = None
+
+    @property
+    def client(self):
+        """nsfw_dl client, created on first use to defer importing it."""
+        if self._client is None:
+            self._client = nsfw_dl.NSFWDL(
+                session=self._bot.session, loop=self._bot.loop
+            )
+            self._client.async_ = True
+        return self._client
 
 for sv in SERVICES:
     setattr(_NSFWCommands, sv, gen_command(sv))
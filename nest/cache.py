@@ -0,0 +1,116 @@
+"""
+In-process caches for data that rarely changes.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+MISSING = object()
+
+
+class LRUCache:
+    """Bounded mapping with least-recently-used eviction and expiry.
+
+    ``None`` is a valid value, so negative results can be cached too.
+    Lookups return :data:`MISSING` on a miss to tell the two apart.
+
+    Attributes
+    ----------
+    maxsize: int
+        Maximum number of entries kept before the oldest is evicted.
+    ttl: float
+        Seconds an entry stays valid, or None to never expire.
+    on_evict: Callable[[Hashable, Any], None]
+        Called with the key and value of every entry evicted to make room.
+    hits: int
+        Lookups answered from the cache.
+    misses: int
+        Lookups that found no entry, or only an expired one.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None,
+                 on_evict: Callable[[Hashable, Any], None] = None):
+        self._data: OrderedDict = OrderedDict()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Return a cached value, marking it as recently used.
+
+        Parameters
+        ----------
+        key: Hashable
+            Key to look up.
+        default: Any
+            Returned when the key is missing or expired.
+        """
+        try:
+            value, expires = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        if expires is not None and expires <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float = MISSING):
+        """Store a value, evicting the least recently used entry if full.
+
+        Parameters
+        ----------
+        key: Hashable
+            Key to store under.
+        value: Any
+            Value to store, None included.
+        ttl: float
+            Overrides the cache's TTL for this entry.
+        """
+        if ttl is MISSING:
+            ttl = self.ttl
+        expires = time.monotonic() + ttl if ttl is not None else None
+
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            evicted, (value, _) = self._data.popitem(last=False)
+            if self.on_evict is not None:
+                self.on_evict(evicted, value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove an entry without touching the hit counters."""
+        item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def clear(self):
+        """Remove every entry."""
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return size and hit/miss counters."""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Whether a key has a valid entry, without touching the hit
+        counters or marking it as recently used."""
+        item = self._data.get(key)
+        return item is not None and (
+            item[1] is None or item[1] > time.monotonic()
+        )
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,74 @@
+"""
+Compiled catalogs of translated strings, one file per locale.
+
+A catalog holds every string of a locale, from the core and every module,
+already checked against the default locale, so loading it skips parsing
+each translation. It is a JSON object::
+
+    {"format": 1, "strings": {"<cog>": {"<string>": <item>, ...}, ...}}
+"""
+
+import json
+import os
+from typing import Any, Dict, Tuple
+
+FORMAT = 1
+EXTENSION = ".cat"
+
+
+class CatalogError(Exception):
+    """The file is not a catalog."""
+
+
+def dump(path: str, strings: Dict[Tuple[str, str], Any]):
+    """Write a catalog, replacing any existing one atomically.
+
+    Parameters
+    ----------
+    path: str
+        File to write to.
+    strings: Dict[Tuple[str, str], Any]
+        Items keyed by cog and internal string name.
+    """
+    cogs: Dict[str, Dict[str, Any]] = {}
+    for (cog, string), item in sorted(strings.items()):
+        cogs.setdefault(cog, {})[string] = item
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as file:
+        json.dump({"format": FORMAT, "strings": cogs}, file,
+                  ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def load(path: str) -> Dict[Tuple[str, str], Any]:
+    """Read every item of a catalog.
+
+    Parameters
+    ----------
+    path: str
+        File to read.
+
+    Returns
+    -------
+    Dict[Tuple[str, str], Any]
+        Items keyed by cog and internal string name.
+
+    Raises
+    ------
+    CatalogError
+        The file is not a catalog.
+    """
+    with open(path, encoding="utf-8") as file:
+        try:
+            data = json.load(file)
+        except ValueError:
+            raise CatalogError(f"{path} is not a catalog") from None
+
+    if not isinstance(data, dict) or data.get("format") != FORMAT:
+        raise CatalogError(f"{path} is not a catalog")
+    return {
+        (cog, string): item
+        for cog, items in data["strings"].items()
+        for string, item in items.items()
+    }
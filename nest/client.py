@@ -5,21 +5,33 @@ Provides the Nest client class.
 import asyncio
 import functools
 import logging
+import time
 import traceback
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Iterable, Set, Union
 
 import aiohttp
 import discord
 from discord.ext import commands
 from discord.ext.commands.view import StringView
 
-from nest import i18n, exceptions
+from nest import counters, i18n, exceptions, ipc, loader, metrics, web
+from nest.cache import LRUCache
+
+
+def _timed(func, *args) -> float:
+    """Call a function and return how many seconds it took."""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
 
 
 class PrefixGetter:
-    def __init__(self, default: str):
+    def __init__(self, default: Union[str, Dict[str, str]]):
         self._default = default
+        # What messages start with in guilds without a custom prefix.
+        self._starts = tuple(default.values()) \
+            if isinstance(default, dict) else default
 
     async def __call__(self, bot, message: discord.Message):
         """|coro|
@@ -38,9 +50,9 @@ class PrefixGetter:
             A prefix the bot is listening for in each category.
         """
         cog = bot.get_cog("PrefixStore")
-        if cog:
+        if cog and self._may_be_prefixed(bot, message):
             try:
-                prefix = cog.get(message)
+                prefix = cog.get(message, default=self._starts)
                 if asyncio.iscoroutine(prefix):
                     prefix = await prefix
             except Exception as e:
@@ -54,6 +66,20 @@ class PrefixGetter:
 
         return commands.when_mentioned_or(prefix)(bot, message)
 
+    @staticmethod
+    def _may_be_prefixed(bot, message: discord.Message) -> bool:
+        """Whether a message needs its guild's prefix to be looked up.
+
+        Bots are never answered, and mentions work with any prefix.
+        """
+        content = message.content
+        if not content or message.author.bot:
+            return False
+        if content.startswith("<@") and bot.user is not None:
+            user_id = bot.user.id
+            return not content.startswith((f"<@{user_id}>", f"<@!{user_id}>"))
+        return True
+
 async def get_locale(bot, ctx: commands.Context):
     """|coro|
 
@@ -81,6 +107,98 @@ async def get_locale(bot, ctx: commands.Context):
             traceback.print_exc()
 
 
+class NestContext(commands.Context):
+    """Invocation context that resolves the author's locale on demand.
+
+    The locale is resolved from the locale cache the first time it is
+    read, and memoized. :meth:`NestClient.invoke` only queries it up front
+    when it is not cached, unless the command is marked with
+    :func:`nest.helpers.untranslated`.
+
+    Attributes
+    ----------
+    locale: str
+        Locale to respond in.
+    _: Callable[..., str]
+        Function that translates a string for the locale and command cog.
+        :meth:`render` also formats it, from a pre-parsed template.
+    """
+
+    def __init__(self, **attrs):
+        super().__init__(**attrs)
+        self._locale = None
+        self._translate = None
+
+    async def fetch_locale(self) -> str:
+        """|coro|
+
+        Look up and memoize the locale of the author.
+
+        Returns
+        -------
+        str:
+            Locale to use in responses.
+        """
+        if self._locale is None:
+            user_locale = await get_locale(self.bot, self)
+            self.locale = user_locale or self.bot.i18n.locale
+        return self._locale
+
+    @property
+    def locale(self) -> str:
+        if self._locale is not None:
+            return self._locale
+
+        cog = self.bot.get_cog("LocaleStore")
+        if cog is not None and self.author.id not in cog.cache:
+            # Without an await only a cached locale can be used, so the
+            # default is returned without memoizing it in case it is
+            # fetched later.
+            return self.bot.i18n.locale
+        user_locale = cog.cached(self) if cog else None
+        self.locale = user_locale or self.bot.i18n.locale
+        return self._locale
+
+    @locale.setter
+    def locale(self, value: str):
+        self._locale = value
+        # Once per context rather than on every lookup.
+        self.bot.i18n.touch(value)
+
+    @property
+    def _(self):
+        if self._translate is None:
+            if not self.command:
+                raise AttributeError("_")
+            self._translate = self._gettext
+        return self._translate
+
+    @_.setter
+    def _(self, value):
+        self._translate = value
+
+    def _gettext(self, string: str) -> str:
+        # The locale is read on every call, as it may be resolved later.
+        return self.bot.i18n.getstr(
+            string, locale=self.locale, cog=self.command.cog_name
+        )
+
+    def render(self, string: str, *args, **kwargs) -> str:
+        """Translate a string for the locale and command cog and format it.
+
+        Parameters
+        ----------
+        string: str
+            Internal name of translated string.
+        *args, **kwargs:
+            Arguments to format the string with.
+        """
+        template = self.bot.i18n.template(
+            string, locale=self.locale, cog=self.command.cog_name
+        )
+        return template.render(*args, **kwargs)
+
+
 class NestClient(commands.AutoShardedBot):
     """Main client for Nest.
 
@@ -94,6 +212,23 @@ class NestClient(commands.AutoShardedBot):
         Time when bot instance was initialised.
     i18n: nest.i18n.I18n
         Internationalization functions for the bot.
+    caches: Dict[str, nest.cache.LRUCache]
+        In-process caches registered by modules, by name.
+    web: nest.web.WebClient
+        Client for web APIs, which caches their responses.
+    features: Set[str]
+        Features modules can require in their manifest, e.g. ``database``.
+    counters: nest.counters.Counters
+        Running counts of guilds, channels and users, recounted every
+        ``counters.interval`` seconds in case events were missed.
+    metrics: nest.metrics.Registry
+        Histograms of time spent handling messages and commands, served
+        at ``/metrics`` on ``metrics.port`` when it is set.
+    ipc: Optional[nest.ipc.IPCClient]
+        Connection to the cluster launcher, when run by ``cluster.py``.
+    load_times: Dict[str, float]
+        Seconds spent importing and setting up each module loaded by
+        :meth:`load_modules`.
     """
 
     def __init__(self, **options):
@@ -104,10 +239,76 @@ class NestClient(commands.AutoShardedBot):
         self._logger = logging.getLogger("NestClient")
         self.tokens: Dict[str, str] = options.pop("tokens", {})
         self.owner_ids = set(options.pop("owners", []))
+        self.features: Set[str] = set()
+        if options.get("database"):
+            self.features.add("database")
+        self.load_times: Dict[str, float] = {}
+        self.ipc = None
+        self.counters = counters.Counters()
+        for event, listener in self.counters.listeners().items():
+            self.add_listener(listener, event)
+        self._recount = None
+
+        self.metrics = metrics.Registry()
+        # Observed on every message, through the child of each phase.
+        self._prefix_seconds = self.metrics.histogram(
+            "nest_prefix_seconds",
+            "Time spent parsing messages for a prefix and command.",
+        ).child()
+        self._locale_seconds = self.metrics.histogram(
+            "nest_locale_seconds", "Time spent fetching the author's locale.",
+        ).child()
+        self._command_seconds = self.metrics.histogram(
+            "nest_command_seconds", "Time spent running commands.",
+            labels=("command",),
+        )
+        self._command_children: Dict[str, metrics.Child] = {}
+        for key in ("guilds", "channels", "users"):
+            self.metrics.gauge(
+                f"nest_{key}", f"Number of {key} seen by this process.",
+                functools.partial(getattr, self.counters, key),
+            )
+        self.metrics.gauge(
+            "nest_gateway_latency_seconds", "Heartbeat latency per shard.",
+            lambda: {(str(shard),): latency
+                     for shard, latency in self.latencies},
+            labels=("shard",),
+        )
+        self._metrics_runner = None
         self.created = datetime.now()
-        self.session = aiohttp.ClientSession(loop=self.loop)
+        self.session = aiohttp.ClientSession(
+            loop=self.loop,
+            connector=aiohttp.TCPConnector(
+                limit=int(options.get("http", {}).get("limit", 100)),
+                loop=self.loop,
+            ),
+        )
+        self.caches: Dict[str, LRUCache] = {}
+        self.web = web.WebClient(
+            self.session,
+            limits=options.get("http", {}),
+            histogram=self.metrics.histogram(
+                "nest_http_seconds", "Time spent on requests to web APIs.",
+                labels=("api",),
+            ),
+            queue_histogram=self.metrics.histogram(
+                "nest_http_queue_seconds",
+                "Time requests to web APIs waited for their host's limiter.",
+                labels=("host",),
+            ),
+            **options.get("http_cache", {}),
+        )
+        self.caches["http"] = self.web.cache
 
-        self.i18n = i18n.I18n(locale=options.pop("locale", "en_US"))
+        i18n_options = dict(options.get("i18n", {}))
+        watch = i18n_options.pop("watch", False)
+        interval = i18n_options.pop("poll_interval", 2)
+        self.i18n = i18n.I18n(
+            locale=options.pop("locale", "en_US"), **i18n_options
+        )
+        if str(watch).lower() not in ("", "false", "off", "0"):
+            self.i18n.watch(loop=self.loop, poll=watch == "poll",
+                            interval=float(interval))
         self.options = options
 
     async def on_ready(self):
@@ -116,11 +317,23 @@ class NestClient(commands.AutoShardedBot):
             f"Logged in as {self.user.name}. ID: {str(self.user.id)}"
         )
 
+        self.counters.reconcile(self.guilds)
+        if self._recount is None:
+            self._recount = self.loop.create_task(self._reconcile_counters())
+
         # Set the game.
         await self.change_presence(activity=discord.Activity(name="with code"))
 
+    async def _reconcile_counters(self):
+        interval = float(
+            self.options.get("counters", {}).get("interval", counters.INTERVAL)
+        )
+        while True:
+            await asyncio.sleep(interval)
+            self.counters.reconcile(self.guilds)
+
     async def get_context(
-        self, message: discord.Message, *, cls=commands.Context
+        self, message: discord.Message, *, cls=NestContext
     ) -> commands.Context:
         """|coro|
 
@@ -137,7 +350,7 @@ class NestClient(commands.AutoShardedBot):
             The message to get the invocation context from.
         cls
             The factory class that will be used to create the context.
-            By default, this is :class:`.Context`. Should a custom
+            By default, this is :class:`NestContext`. Should a custom
             class be provided, it must be similar enough to :class:`.Context`'s
             interface.
 
@@ -147,18 +360,84 @@ class NestClient(commands.AutoShardedBot):
             The invocation context. The type of this can change via the
             ``cls`` parameter.
         """
+        start = time.perf_counter()
         ctx = await super().get_context(message, cls=cls)
+        self._prefix_seconds.observe(time.perf_counter() - start)
+        return ctx
 
-        if ctx.command:
-            user_locale = await get_locale(self, ctx)
-            ctx.locale = user_locale if user_locale else self.i18n.locale
-            ctx._ = functools.partial(
-                self.i18n.getstr,
-                locale=ctx.locale,
-                cog=ctx.command.cog_name,
-            )
+    async def invoke(self, ctx: commands.Context):
+        """|coro|
 
-        return ctx
+        Invokes the command given under the invocation context. If the
+        author's locale is not cached, it is fetched first, unless the
+        command never sends translated text. A cached locale is resolved
+        by the context when first read, without awaiting.
+
+        Parameters
+        -----------
+        ctx: :class:`.Context`
+            The invocation context to invoke.
+        """
+        if (
+            ctx.command
+            and isinstance(ctx, NestContext)
+            and not getattr(ctx.command.callback, "__nest_untranslated__", False)
+            and not self._locale_cached(ctx)
+        ):
+            start = time.perf_counter()
+            await ctx.fetch_locale()
+            self._locale_seconds.observe(time.perf_counter() - start)
+
+        if ctx.command is None:
+            await super().invoke(ctx)
+            return
+
+        start = time.perf_counter()
+        try:
+            await super().invoke(ctx)
+        finally:
+            seconds = time.perf_counter() - start
+            name = ctx.command.qualified_name
+            child = self._command_children.get(name)
+            if child is None:
+                child = self._command_children[name] = \
+                    self._command_seconds.child(name)
+            child.observe(seconds)
+
+    def _locale_cached(self, ctx: commands.Context) -> bool:
+        """Whether the locale of a context can be read without a query."""
+        cog = self.get_cog("LocaleStore")
+        return cog is None or ctx.author.id in cog.cache
+
+    def local_stats(self) -> Dict[str, int]:
+        """Count the guilds, channels and users of this process's shards."""
+        return self.counters.as_dict()
+
+    async def stats(self) -> Dict[str, int]:
+        """|coro|
+
+        Count guilds, channels and users across every cluster.
+
+        Falls back to the counts of this process if the other clusters
+        cannot be reached.
+        """
+        stats = self.local_stats()
+        if self.ipc is None:
+            return stats
+
+        try:
+            clusters = await self.ipc.gather("stats")
+        except ipc.IPCError:
+            self._logger.warning("Could not gather stats from clusters",
+                                 exc_info=True)
+            return stats
+
+        clusters[self.ipc.cluster] = stats
+        return {
+            key: sum(cluster.get(key, 0) for cluster in clusters.values()
+                     if cluster)
+            for key in stats
+        }
 
     def load_module(self, name: str):
         """Loads a module from the modules directory.
@@ -185,6 +464,55 @@ class NestClient(commands.AutoShardedBot):
         self.load_extension(f"modules.{name}")
         self.i18n.load_module(name)
 
+    def load_modules(self, names: Iterable[str]):
+        """Load several modules, in the order their manifests require.
+
+        Modules are loaded one at a time in dependency order, then the
+        default locale is parsed. Modules with unmet requirements are
+        skipped. The time logged for each module covers ``load_extension``
+        as a whole, which executes the package's ``__init__`` even if it
+        was imported before, then runs its ``setup``.
+
+        Parameters
+        ----------
+        names: Iterable[str]
+            Names of folders within the modules directory.
+
+        Raises
+        ------
+        CircularDependency
+            Some modules depend on each other.
+        ClientException
+            An extension does not have a setup function.
+        ImportError
+            An extension could not be imported.
+        """
+        loaded = {name[8:] for name in self.extensions
+                  if name.startswith("modules.")}
+        order, skipped = loader.resolve(
+            [loader.read_manifest(name) for name in names
+             if name not in loaded],
+            self.features,
+            loaded,
+        )
+        for name, reason in sorted(skipped.items()):
+            self._logger.info(f"Skipping module {name}: {reason}")
+
+        start = time.perf_counter()
+        for name in order:
+            self.i18n.load_module(name)
+            seconds = _timed(self.load_extension, f"modules.{name}")
+            self.load_times[name] = seconds
+            self._logger.info(
+                f"Loaded module {name} in {seconds * 1000:.1f}ms"
+            )
+        self.i18n.preload()
+
+        self._logger.info(
+            f"Loaded {len(order)} modules in "
+            f"{(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+
     def reload_module(self, name: str):
         """Loads a module from the modules directory.
 
@@ -208,6 +536,41 @@ class NestClient(commands.AutoShardedBot):
         self.reload_extension(f"modules.{name}")
         self.i18n.load_module(name)
 
+    async def close(self):
+        """|coro|
+
+        Shut down every cog that defines a ``shutdown`` coroutine and
+        stop watching translations, then close the connection to Discord.
+        """
+        for name, cog in tuple(self.cogs.items()):
+            shutdown = getattr(cog, "shutdown", None)
+            if shutdown is None:
+                continue
+            try:
+                await shutdown()
+            except Exception:
+                self._logger.exception(f"Failed to shut down {name}")
+
+        if self._recount is not None:
+            self._recount.cancel()
+        if self._metrics_runner is not None:
+            await self._metrics_runner.cleanup()
+        self.i18n.unwatch()
+        await super().close()
+
+    async def start(self, *args, **kwargs):
+        """|coro|
+
+        Serve metrics if ``metrics.port`` is set, then log in and connect.
+        """
+        config = self.options.get("metrics", {})
+        if config.get("port") and self._metrics_runner is None:
+            self._metrics_runner = await metrics.serve(
+                self.metrics, int(config["port"]),
+                config.get("host", metrics.HOST),
+            )
+        await super().start(*args, **kwargs)
+
     def run(self, bot: bool = True):
         """
         Start running the bot.
@@ -0,0 +1,117 @@
+"""
+Running counts of guilds, channels and members, kept up to date by events.
+"""
+
+import logging
+from typing import Callable, Dict, Iterable, Tuple
+
+import discord
+
+INTERVAL = 600
+
+
+class Counters:
+    """Totals over every guild, updated one guild at a time.
+
+    Each guild's last known channel and member counts are kept, so that
+    counting a guild twice, e.g. when it becomes available again after a
+    reconnect, replaces its counts instead of adding them again.
+
+    Attributes
+    ----------
+    guilds: int
+        Number of guilds.
+    channels: int
+        Number of channels in every guild.
+    users: int
+        Number of members of every guild, counting users once per guild.
+    """
+
+    def __init__(self):
+        self._logger = logging.getLogger("nest.counters")
+        self._counts: Dict[int, Tuple[int, int]] = {}
+        self.guilds = 0
+        self.channels = 0
+        self.users = 0
+
+    @staticmethod
+    def _count(guild: discord.Guild) -> Tuple[int, int]:
+        members = guild.member_count
+        if members is None:
+            members = len(guild.members)
+        return len(guild.channels), members
+
+    def update(self, guild: discord.Guild):
+        """Count a guild, replacing its previous counts."""
+        channels, members = self._count(guild)
+        old_channels, old_members = self._counts.get(guild.id, (0, 0))
+        if guild.id not in self._counts:
+            self.guilds += 1
+        self._counts[guild.id] = (channels, members)
+        self.channels += channels - old_channels
+        self.users += members - old_members
+
+    def remove(self, guild: discord.Guild):
+        """Stop counting a guild."""
+        counts = self._counts.pop(guild.id, None)
+        if counts is not None:
+            self.guilds -= 1
+            self.channels -= counts[0]
+            self.users -= counts[1]
+
+    def reconcile(self, guilds: Iterable[discord.Guild]) -> Dict[str, int]:
+        """Recount every guild, e.g. to correct for missed events.
+
+        Parameters
+        ----------
+        guilds: Iterable[discord.Guild]
+            Every guild the client is in.
+
+        Returns
+        -------
+        Dict[str, int]:
+            How far off each total was.
+        """
+        before = self.as_dict()
+        self._counts.clear()
+        self.guilds = self.channels = self.users = 0
+        for guild in guilds:
+            self.update(guild)
+
+        drift = {key: self.as_dict()[key] - value
+                 for key, value in before.items()}
+        if any(drift.values()):
+            self._logger.info(f"Corrected counters by {drift}")
+        return drift
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "guilds": self.guilds,
+            "channels": self.channels,
+            "users": self.users,
+        }
+
+    def listeners(self) -> Dict[str, Callable]:
+        """Event listeners keeping the counters up to date, by event."""
+
+        async def on_guild(guild):
+            self.update(guild)
+
+        async def on_guild_remove(guild):
+            self.remove(guild)
+
+        async def on_member(member):
+            self.update(member.guild)
+
+        async def on_channel(channel):
+            self.update(channel.guild)
+
+        return {
+            "on_guild_join": on_guild,
+            "on_guild_available": on_guild,
+            "on_guild_remove": on_guild_remove,
+            "on_member_join": on_member,
+            "on_member_remove": on_member,
+            "on_guild_channel_create": on_channel,
+            "on_guild_channel_delete": on_channel,
+        }
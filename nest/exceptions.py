@@ -18,6 +18,18 @@ class MissingFeatures(ClientException):
         )
 
 
+class CircularDependency(ClientException):
+    """
+    Raised when modules depend on each other, so none can load first.
+    """
+
+    def __init__(self, modules: list):
+        self.modules = modules
+        super().__init__(
+            f"Modules depend on each other: {', '.join(modules)}"
+        )
+
+
 class WebAPIException(Exception):
     """
     Base exception from which API exceptions are derived.
@@ -46,6 +58,14 @@ class WebAPIUnreachable(WebAPIException):
     pass
 
 
+class WebAPIRateLimited(WebAPIException):
+    """
+    Raised when a request to a web API waited too long to be sent.
+    """
+
+    pass
+
+
 class WebAPIInvalidResponse(WebAPIException):
     """
     Raised when a web API returns an invalid response.
@@ -59,5 +79,6 @@ class WebAPIInvalidResponse(WebAPIException):
 EXC_I18N_MAP = {
     WebAPIInvalidResponse: "invalid_response",
     WebAPINoResults: "no_results",
-    WebAPIUnreachable: "unreachable"
+    WebAPIUnreachable: "unreachable",
+    WebAPIRateLimited: "rate_limited",
 }
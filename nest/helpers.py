@@ -2,6 +2,8 @@
 Miscallaneous utils separate from the rest of Nest's core.
 """
 
+import importlib
+import importlib.util
 from typing import List
 
 
@@ -58,3 +60,68 @@ def smart_truncate(content: str, length: int = 400, suffix: str = "..") -> str:
         content = content.rsplit(".", 1)[0] + "."  # Cut to nearest sentence.
         content += suffix
     return content
+
+
+def untranslated(func):
+    """Mark a command as never sending translated text.
+
+    Invocations of the command skip looking up the author's locale.
+    Apply below the command decorator, like a check.
+
+    Parameters
+    ----------
+    func:
+        Command callback to mark.
+    """
+    func.__nest_untranslated__ = True
+    return func
+
+
+class LazyModule:
+    """Stand-in for a module, which imports it on first attribute access.
+
+    Parameters
+    ----------
+    name: str
+        Absolute name of the module.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Defer importing a module until one of its attributes is used.
+
+    Only checks that the module can be found, so that missing dependencies
+    are still reported when the importing cog is loaded. The module itself
+    is imported, e.g., on the first invocation of a command using it.
+
+    Parameters
+    ----------
+    name: str
+        Absolute name of the module, e.g. ``"pycountry"``.
+
+    Raises
+    ------
+    ModuleNotFoundError
+        The module is not installed.
+    """
+    # find_spec imports parent packages, so only check the top level one.
+    top = name.split(".", 1)[0]
+    if importlib.util.find_spec(top) is None:
+        raise ModuleNotFoundError(f"No module named {top!r}", name=top)
+    return LazyModule(name)
@@ -1,47 +1,219 @@
 """
 Implement internationalization on a per-module level.
 """
+import ast
+import asyncio
 import json
 import logging
 import os
-from typing import Dict
+import string as _string
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 
 from dateutil.relativedelta import relativedelta
 
-from nest.helpers import dictwalk
+from nest import catalog, watcher
 
 TIME_UNITS = ["years", "months", "days", "hours", "minutes", "seconds"]
+CACHE_SIZE = 8
+
+_FORMATTER = _string.Formatter()
+
+
+class Template:
+    """A translated string, parsed once to be formatted many times.
+
+    Strings with only plain fields are compiled to the equivalent f-string
+    when first rendered, so rendering again neither re-parses the string
+    nor builds argument tuples.
+
+    Parameters
+    ----------
+    text: str
+        String in :meth:`str.format` syntax.
+
+    Attributes
+    ----------
+    fields: FrozenSet[str]
+        Names of the arguments the string uses, with positional
+        arguments named by their index.
+
+    Raises
+    ------
+    ValueError
+        The string is not valid format syntax.
+    """
+
+    __slots__ = ("text", "fields", "_parts", "_render")
+
+    def __init__(self, text: str):
+        self.text = text
+        parts = []
+        fields = set()
+        auto = 0
+        manual = False
+
+        for literal, field, spec, conversion in _FORMATTER.parse(text):
+            if field is None:
+                parts.append((literal, None, False, "", None))
+                continue
+
+            if field == "" or field[0] in ".[":
+                field = f"{auto}{field}"
+                auto += 1
+            elif field[0].isdigit():
+                manual = True
+            if auto and manual:
+                raise ValueError(
+                    "cannot switch between automatic and manual field numbering"
+                )
+            if conversion and conversion not in "rsa":
+                raise ValueError(f"unknown conversion {conversion!r}")
+
+            name = field.split(".", 1)[0].split("[", 1)[0]
+            fields.add(name)
+            simple = name == field and "{" not in spec
+            key = int(name) if name.isdigit() and simple else field
+            parts.append((literal, key, not simple, spec, conversion))
+
+        self.fields: FrozenSet[str] = frozenset(fields)
+        self._parts = tuple(parts)
+        self._render = None
+
+    def _compile(self):
+        """Build ``lambda args, kwargs: f"..."`` from the parsed fields."""
+        values = []
+        for literal, key, _, spec, conversion in self._parts:
+            if literal:
+                values.append(ast.Constant(literal))
+            if key is None:
+                continue
+
+            source = "args" if isinstance(key, int) else "kwargs"
+            values.append(ast.FormattedValue(
+                value=ast.Subscript(
+                    value=ast.Name(source, ast.Load()),
+                    slice=ast.Constant(key),
+                    ctx=ast.Load(),
+                ),
+                conversion=ord(conversion) if conversion else -1,
+                format_spec=(
+                    ast.JoinedStr([ast.Constant(spec)]) if spec else None
+                ),
+            ))
+
+        arguments = ast.arguments(
+            posonlyargs=[],
+            args=[ast.arg("args"), ast.arg("kwargs")],
+            kwonlyargs=[],
+            kw_defaults=[],
+            defaults=[],
+        )
+        tree = ast.Expression(ast.Lambda(arguments, ast.JoinedStr(values)))
+        ast.fix_missing_locations(tree)
+        return eval(compile(tree, "<template>", "eval"), {})
+
+    def render(self, *args, **kwargs) -> str:
+        """Format the string, like :meth:`str.format`."""
+        render = self._render
+        if render is None:
+            if any(nested for _, _, nested, _, _ in self._parts):
+                render = self._format
+            else:
+                render = self._compile()
+            self._render = render
+        return render(args, kwargs)
+
+    def _format(self, args: tuple, kwargs: dict) -> str:
+        """Format the parsed fields one by one, for complex fields."""
+        out = []
+        for literal, key, nested, spec, conversion in self._parts:
+            out.append(literal)
+            if key is None:
+                continue
+
+            if nested:
+                value = _FORMATTER.get_field(key, args, kwargs)[0]
+                spec = _FORMATTER.vformat(spec, args, kwargs)
+            elif isinstance(key, int):
+                value = args[key]
+            else:
+                value = kwargs[key]
+
+            if conversion:
+                value = _FORMATTER.convert_field(value, conversion)
+            out.append(format(value, spec))
+        return "".join(out)
+
+    def __repr__(self):
+        return f"<Template {self.text!r}>"
 
 
 class I18n:
     """Internationalization functions for Nest.
 
+    Locales are loaded on first use, from a catalog built by
+    ``utils.build_i18n`` when one is newer than the JSON files, and
+    unloaded again once more than ``cache_size`` locales are in use. The
+    default locale stays loaded. Strings a locale lacks are filled in from
+    the default locale when it is loaded, so each lookup is a single dict
+    lookup; :meth:`touch` keeps the locales in use from being unloaded.
+
+    Each translated string is also parsed into a :class:`Template`. A
+    translation with invalid syntax, or with other fields than the default
+    locale's, is logged and replaced by the default locale's string.
+
+    Parameters
+    ----------
+    locale: str
+        Default locale.
+    catalog: str
+        Directory of compiled catalogs, if any.
+    cache_size: int
+        Number of locales besides the default one kept loaded.
+
     Attributes
     ----------
     locale: str
         Default locale.
+    loads: int
+        Number of times a locale was loaded, including reloads after
+        being unloaded.
+    watcher: Optional[nest.watcher.Watcher]
+        Watcher reloading changed files, once :meth:`watch` is called.
     """
 
-    def __init__(self, locale: str):
-        self._i18n_data = {}
+    def __init__(self, locale: str, *, catalog: str = None,
+                 cache_size: int = CACHE_SIZE):
+        # Files to read each locale from, with the section of the file
+        # holding it, or None if the file holds a single locale.
+        self._sources: Dict[str, List[Tuple[str, Optional[str]]]] = {}
+        self._directories: Set[str] = set()
+        self._core = None
+        self._default: Optional[Tuple[Dict, Dict]] = None
         self._logger = logging.getLogger("nest.i18n")
+        # Loaded locales, least recently used first.
+        self._loaded: OrderedDict = OrderedDict()
+        self.catalog = catalog
+        self.cache_size = int(cache_size)
+        self.loads = 0
+        self.watcher = None
         self.locale = locale
         self.load_locales()
 
     def load_locales(self):
-        """Load core data about each supported locale."""
+        """Register core data about each supported locale."""
         directory = os.path.dirname(os.path.realpath(__file__))
         path = os.path.join(directory, "i18n.json")
 
         with open(path) as datafile:
             data = json.load(datafile)
 
-        for lang, lang_data in data.items():
-            if lang not in self._i18n_data:
-                self._logger.debug(f"Registering lang {lang}")
-                self._i18n_data[lang] = {}
+        for lang in data:
+            self._register(lang, (path, lang))
 
-            self._i18n_data[lang].update(lang_data)
+        self._core = path
+        self._reload()
 
     def locales(self, current_locale: str) -> Dict[str, str]:
         """Return dictionary of language data.
@@ -54,22 +226,20 @@ class I18n:
 
         locales = {}
         current_lang = current_locale[:2]
-        for locale, data in self._i18n_data.items():
+        for locale in self._sources:
             lang = locale[:2]
-            try:
-                l_user = data["names"].get(
-                    current_lang, data["names"].get(self.lang)
-                )
-
-                l_native = data["names"].get(lang)
-                locales[locale] = {"user": l_user, "native": l_native}
-            except (KeyError, ValueError):
+            names = self._peek(locale, "names")
+            if not names:
                 self._logger.warning(f"{locale} has no name data! Ignoring.")
                 continue
+
+            l_user = names.get(current_lang, names.get(self.lang))
+            l_native = names.get(lang)
+            locales[locale] = {"user": l_user, "native": l_native}
         return locales
 
     def load_module(self, module):
-        """Load language data for a module.
+        """Register language data for a module.
 
         Parameters
         ----------
@@ -82,19 +252,312 @@ class I18n:
         if not os.path.exists(path):
             return
 
+        self._directories.add(path)
+        if self.watcher is not None:
+            self.watcher.add(path)
+
         for filename in os.listdir(path):
             if not filename.endswith(".json"):
                 self._logger.warning(f"Ignoring {filename}!")
                 continue
 
-            locale = filename[:-5]
+            self._register(filename[:-5], (os.path.join(path, filename), None))
 
-            if locale not in self._i18n_data:
-                self._logger.debug(f"Creating locale {locale}.")
-                self._i18n_data[locale] = {}
+        self._reload()
 
-            with open(f"{path}/{filename}") as file:
-                self._i18n_data[locale].update(json.load(file))
+    def build(self, directory: str) -> List[str]:
+        """Compile every registered locale into a catalog.
+
+        Parameters
+        ----------
+        directory: str
+            Directory to write ``<locale>.cat`` files to.
+
+        Returns
+        -------
+        List[str]:
+            Paths of the written catalogs.
+        """
+        os.makedirs(directory, exist_ok=True)
+        defaults = self._load(self.locale)[1]
+        paths = []
+        for locale in sorted(self._sources):
+            strings = self._read_json(locale)
+            if locale != self.locale:
+                self._validate(locale, strings, defaults)
+
+            path = os.path.join(directory, locale + catalog.EXTENSION)
+            catalog.dump(path, strings)
+            paths.append(path)
+        return paths
+
+    def preload(self):
+        """Load the default locale now, rather than on first use."""
+        self._load(self.locale)
+
+    def watch(self, *, loop: asyncio.AbstractEventLoop = None,
+              poll: bool = False, **kwargs):
+        """Reload translations whenever their files change.
+
+        Parameters
+        ----------
+        loop: asyncio.AbstractEventLoop
+            Loop to watch from.
+        poll: bool
+            Poll for changes instead of using inotify.
+        **kwargs:
+            Passed to :func:`nest.watcher.watch`.
+        """
+        if self.watcher is not None:
+            return
+
+        self.watcher = watcher.watch(self.reload, loop=loop, poll=poll,
+                                     **kwargs)
+        self.watcher.add(os.path.dirname(self._core))
+        for directory in self._directories:
+            self.watcher.add(directory)
+        if self.catalog:
+            self.watcher.add(self.catalog)
+
+    def unwatch(self):
+        """Stop reloading changed files."""
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+
+    def reload(self, paths: Iterable[str]):
+        """Reload the locales stored in changed files.
+
+        Locales other than the default one are unloaded, and read again on
+        next use. The default locale is read again right away, and replaces
+        the old data only once it has been read completely; as every other
+        locale includes its strings, they are all unloaded along with it.
+
+        Parameters
+        ----------
+        paths: Iterable[str]
+            Changed, created or deleted files. Files that do not hold
+            translations are ignored.
+        """
+        changed = set()
+        for path in paths:
+            directory, filename = os.path.split(path)
+            locale, extension = os.path.splitext(filename)
+
+            if path == self._core:
+                try:
+                    with open(path) as file:
+                        for lang in json.load(file):
+                            self._register(lang, (path, lang))
+                except (OSError, ValueError) as exc:
+                    self._logger.error(f"Keeping old translations: {exc}")
+                    continue
+                # Every locale may have changed, and default strings are
+                # used to validate every other locale.
+                changed.add(self.locale)
+            elif directory in self._directories and extension == ".json":
+                source = (path, None)
+                if os.path.exists(path):
+                    self._register(locale, source)
+                elif source in self._sources.get(locale, ()):
+                    self._sources[locale].remove(source)
+                    if not self._sources[locale]:
+                        del self._sources[locale]
+                changed.add(locale)
+            elif (
+                self.catalog
+                and os.path.normpath(directory) == os.path.normpath(self.catalog)
+                and extension == catalog.EXTENSION
+            ):
+                changed.add(locale)
+
+        if not changed:
+            return
+
+        self._logger.info(f"Reloading locales {', '.join(sorted(changed))}")
+        if self.locale not in changed:
+            for locale in changed:
+                self._loaded.pop(locale, None)
+            return
+
+        default = self._default
+        try:
+            if default is not None:
+                default = self._read_default()
+        except (OSError, ValueError) as exc:
+            # Most likely a file caught halfway through being written,
+            # which will be reported again once it is complete.
+            self._logger.error(f"Keeping old translations: {exc}")
+            return
+
+        # Swap both at once, so lookups never mix old and new data.
+        loaded = OrderedDict()
+        if default is not None:
+            loaded[self.locale] = default
+        self._default, self._loaded = default, loaded
+
+    def _register(self, locale: str, source: Tuple[str, Optional[str]]):
+        sources = self._sources.setdefault(locale, [])
+        if source not in sources:
+            self._logger.debug(f"Registering {source[0]} for {locale}")
+            sources.append(source)
+
+    def _reload(self):
+        """Unload every locale, so that they are read again on next use."""
+        self._default = None
+        self._loaded.clear()
+
+    def _load_default(self) -> Tuple[Dict, Dict]:
+        self._default = self._read_default()
+        self._loaded[self.locale] = self._default
+        return self._default
+
+    def _read_default(self) -> Tuple[Dict, Dict]:
+        strings, _ = self._read(self.locale)
+        templates = {}
+        for key, item in strings.items():
+            if not isinstance(item, str):
+                continue
+            try:
+                templates[key] = Template(item)
+            except ValueError as exc:
+                self._logger.error(f"{self.locale} {key} is broken: {exc}")
+        return strings, templates
+
+    def _catalog_path(self, locale: str) -> Optional[str]:
+        """Return the catalog of a locale, if it is newer than its sources."""
+        if not self.catalog:
+            return None
+
+        path = os.path.join(self.catalog, locale + catalog.EXTENSION)
+        try:
+            built = os.stat(path).st_mtime
+            if all(os.stat(source).st_mtime <= built
+                   for source, _ in self._sources[locale]):
+                return path
+        except OSError:
+            pass
+        return None
+
+    def _read_json(self, locale: str) -> Dict[Tuple[str, str], Any]:
+        strings = {}
+        for path, section in self._sources.get(locale, ()):
+            with open(path) as file:
+                data = json.load(file)
+            if section is not None:
+                data = data.get(section, {})
+
+            for cog, items in data.items():
+                for string, item in items.items():
+                    strings[cog, string] = item
+        return strings
+
+    def _read(self, locale: str) -> Tuple[Dict[Tuple[str, str], Any], bool]:
+        """Read every string of a locale, from its catalog if possible.
+
+        Also returns whether the strings come from a catalog, in which case
+        they were validated when it was built.
+        """
+        path = self._catalog_path(locale)
+        if path is not None:
+            try:
+                return catalog.load(path), True
+            except (OSError, catalog.CatalogError):
+                self._logger.warning(f"Ignoring catalog {path}", exc_info=True)
+        return self._read_json(locale), False
+
+    def _peek(self, locale: str, cog: str) -> Dict[str, Any]:
+        """Get every string of a cog, without loading the locale.
+
+        Unlike loaded locales, this leaves out the default locale's strings.
+        """
+        if locale == self.locale:
+            strings = self._load(locale)[0]
+        else:
+            strings, _ = self._read(locale)
+
+        return {
+            string: item
+            for (item_cog, string), item in strings.items()
+            if item_cog == cog
+        }
+
+    def _load(self, locale: str) -> Tuple[Dict, Dict]:
+        """Return the strings and templates of a locale, loading it if needed.
+
+        Both include the default locale's for anything the locale lacks.
+        """
+        loaded = self._loaded.get(locale)
+        if loaded is not None:
+            return loaded
+        default = self._default or self._load_default()
+        if locale == self.locale or locale not in self._sources:
+            return default
+
+        loaded = self._read_locale(locale, default)
+        self._loaded[locale] = loaded
+        self.loads += 1
+        while len(self._loaded) > self.cache_size + 1:
+            unloaded, data = self._loaded.popitem(last=False)
+            if unloaded == self.locale:
+                self._loaded[unloaded] = data
+                continue
+            self._logger.debug(f"Unloading locale {unloaded}")
+        return loaded
+
+    def _read_locale(self, locale: str,
+                     default: Tuple[Dict, Dict]) -> Tuple[Dict, Dict]:
+        """Read a locale other than the default, merged over the default."""
+        self._logger.debug(f"Loading locale {locale}")
+        strings, validated = self._read(locale)
+        # Templates from catalogs are parsed on first use instead.
+        own = {} if validated else self._validate(locale, strings, default[1])
+
+        templates = {
+            key: template
+            for key, template in default[1].items()
+            if key not in strings
+        }
+        templates.update(own)
+        return {**default[0], **strings}, templates
+
+    def _validate(self, locale: str, strings: Dict, defaults: Dict) -> Dict:
+        """Parse the translations of a locale, dropping unusable ones."""
+        templates = {}
+        for key, item in tuple(strings.items()):
+            if not isinstance(item, str):
+                continue
+            template = self._check(locale, key, item, defaults)
+            if template is None:
+                del strings[key]
+            else:
+                templates[key] = template
+        return templates
+
+    def _check(self, locale, key, item, defaults):
+        """Parse a translation, or return None if it is unusable."""
+        try:
+            template = Template(item)
+        except ValueError as exc:
+            self._logger.warning(f"{locale} {key} is broken: {exc}")
+            return None
+
+        fallback = defaults.get(key)
+        if fallback is not None and template.fields != fallback.fields:
+            self._logger.warning(
+                f"{locale} {key} uses fields "
+                f"{sorted(template.fields)}, expected {sorted(fallback.fields)}"
+            )
+            return None
+        return template
+
+    def touch(self, locale: str):
+        """Mark a locale as used, so that it is the last one unloaded.
+
+        Lookups leave the order alone; call this once per command instead.
+        """
+        if locale in self._loaded:
+            self._loaded.move_to_end(locale)
 
     def getstr(self, string: str, *, locale: str, cog: str):
         """Get a localized string.
@@ -108,14 +571,36 @@ class I18n:
         cog: str
             Cog to search for string.
         """
-        try:
-            item = dictwalk(self._i18n_data, [locale, cog, string])
-        except KeyError:
-            try:
-                item = dictwalk(self._i18n_data, [self.locale, cog, string])
-            except KeyError:
-                item = string
-        return item
+        loaded = self._loaded.get(locale)
+        if loaded is None:
+            loaded = self._load(locale)
+        return loaded[0].get((cog, string), string)
+
+    def template(self, string: str, *, locale: str, cog: str) -> Template:
+        """Get a localized string as a parsed template.
+
+        Parameters
+        ----------
+        string: str
+            Internal name of translated string.
+        locale: str
+            Locale to use, defaults to en_US if data not present.
+        cog: str
+            Cog to search for string.
+        """
+        key = (cog, string)
+        loaded = self._loaded.get(locale)
+        if loaded is None:
+            loaded = self._load(locale)
+        strings, templates = loaded
+        template = templates.get(key)
+        if template is None:
+            item = strings.get(key)
+            if isinstance(item, str):
+                template = templates[key] = Template(item)
+            else:
+                template = Template(string)
+        return template
 
     @property
     def lang(self):
@@ -124,22 +609,20 @@ class I18n:
 
     def is_locale(self, locale: str):
         """Check if given locale is valid."""
-        return locale in self._i18n_data.keys()
+        return locale in self._sources
 
     def format_timedelta(self, locale: str, delta: relativedelta):
         """Format a delta to a string."""
-        res = ""
-        time = [delta.__dict__[unit] for unit in TIME_UNITS]
+        parts = []
 
-        for unit, value in zip(TIME_UNITS, time):
-            value = abs(value)
+        for unit in TIME_UNITS:
+            value = abs(getattr(delta, unit))
             if value == 0:
                 continue
             if value == 1:
                 unit = unit[:-1]
-            unit_tr = self.getstr(unit, locale=locale, cog="time")
-            if res:
-                res += ", "
-            res += f"{str(value)} {unit_tr}"
+            template = self.template(unit, locale=locale, cog="time")
+            parts.append(template.render(value))
 
-        return res
+        separator = self.getstr("separator", locale=locale, cog="time")
+        return separator.join(parts)
@@ -0,0 +1,291 @@
+"""
+Exchange messages between the launcher and the clusters it runs.
+
+Messages are JSON objects, one per line, over TCP on localhost. A cluster
+connects with a ``hello`` carrying its id and the launcher's secret. It can
+then ask the launcher to ``gather`` the result of an operation from every
+cluster, e.g. ``stats``, which the launcher requests from each cluster and
+returns keyed by cluster id.
+"""
+
+import asyncio
+import hmac
+import itertools
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Set, Tuple, Union
+
+TIMEOUT = 2
+RECONNECT_DELAY = 5
+LIMIT = 2 ** 20
+
+Handler = Callable[[], Union[Any, Awaitable[Any]]]
+
+
+def _encode(message: dict) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+class IPCError(Exception):
+    """The launcher could not be reached or did not answer in time."""
+
+
+class IPCServer:
+    """Launcher side, relaying requests between clusters.
+
+    Parameters
+    ----------
+    secret: str
+        Secret clusters must present to connect.
+    timeout: float
+        Seconds to wait for every cluster to answer a request.
+    """
+
+    def __init__(self, secret: str, *, timeout: float = TIMEOUT):
+        self._logger = logging.getLogger("nest.ipc")
+        self._secret = secret
+        self._clusters: Dict[int, asyncio.StreamWriter] = {}
+        # Clusters yet to answer, answers and completion of each request.
+        self._pending: Dict[int, Tuple[Set[int], Dict[int, Any],
+                                       asyncio.Event]] = {}
+        self._nonces = itertools.count()
+        self._server = None
+        self.timeout = float(timeout)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """|coro|
+
+        Start listening, and return the port listened on.
+        """
+        self._server = await asyncio.start_server(
+            self._handle, host, port, limit=LIMIT
+        )
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """|coro|
+
+        Stop listening and disconnect every cluster.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for writer in tuple(self._clusters.values()):
+            writer.close()
+
+    async def gather(self, op: str) -> Dict[int, Any]:
+        """|coro|
+
+        Run an operation on every connected cluster.
+
+        Clusters that do not answer within the timeout are left out.
+
+        Parameters
+        ----------
+        op: str
+            Operation to run, e.g. ``stats``.
+        """
+        nonce = next(self._nonces)
+        waiting = set(self._clusters)
+        results = {}
+        done = asyncio.Event()
+        self._pending[nonce] = (waiting, results, done)
+        try:
+            for cluster in waiting:
+                self._clusters[cluster].write(
+                    _encode({"op": op, "nonce": nonce})
+                )
+            if waiting:
+                await asyncio.wait_for(done.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            self._logger.warning(
+                f"Clusters {sorted(waiting)} did not answer {op}"
+            )
+        finally:
+            del self._pending[nonce]
+        return results
+
+    async def _handle(self, reader, writer):
+        cluster = None
+        try:
+            hello = json.loads(await reader.readline() or "{}")
+            if hello.get("op") != "hello" or not hmac.compare_digest(
+                str(hello.get("secret", "")), self._secret
+            ):
+                self._logger.warning("Rejected an IPC connection")
+                return
+
+            cluster = int(hello["cluster"])
+            self._clusters[cluster] = writer
+            self._logger.info(f"Cluster {cluster} connected")
+
+            async for line in reader:
+                message = json.loads(line)
+                if message.get("op") == "reply":
+                    self._reply(cluster, message)
+                elif message.get("op") == "gather":
+                    asyncio.ensure_future(self._gather(writer, message))
+        except (ConnectionError, ValueError, KeyError):
+            self._logger.warning(f"Cluster {cluster} sent invalid data",
+                                 exc_info=True)
+        finally:
+            if cluster is not None and self._clusters.get(cluster) is writer:
+                del self._clusters[cluster]
+                self._logger.info(f"Cluster {cluster} disconnected")
+                # Stop waiting for answers that will never come.
+                for waiting, _, done in self._pending.values():
+                    waiting.discard(cluster)
+                    if not waiting:
+                        done.set()
+            writer.close()
+
+    def _reply(self, cluster: int, message: dict):
+        pending = self._pending.get(message.get("nonce"))
+        if pending is None:
+            return
+        waiting, results, done = pending
+        results[cluster] = message.get("data")
+        waiting.discard(cluster)
+        if not waiting:
+            done.set()
+
+    async def _gather(self, writer, message: dict):
+        results = await self.gather(str(message.get("what")))
+        writer.write(_encode({
+            "op": "result",
+            "nonce": message.get("nonce"),
+            "data": {str(cluster): data for cluster, data in results.items()},
+        }))
+
+
+class IPCClient:
+    """Cluster side, answering the launcher's requests.
+
+    Parameters
+    ----------
+    cluster: int
+        Id of this cluster.
+    port: int
+        Port the launcher listens on.
+    secret: str
+        Secret the launcher expects.
+    host: str
+        Host the launcher listens on.
+
+    Attributes
+    ----------
+    handlers: Dict[str, Callable[[], Any]]
+        Functions or coroutine functions answering each operation.
+    """
+
+    def __init__(self, cluster: int, port: int, secret: str, *,
+                 host: str = "127.0.0.1"):
+        self._logger = logging.getLogger("nest.ipc")
+        self._address = (host, int(port))
+        self._secret = secret
+        self._writer = None
+        self._results: Dict[int, asyncio.Future] = {}
+        self._nonces = itertools.count()
+        self.cluster = int(cluster)
+        self.handlers: Dict[str, Handler] = {}
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    async def run(self):
+        """|coro|
+
+        Stay connected to the launcher, reconnecting whenever the
+        connection is lost.
+        """
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(
+                    *self._address, limit=LIMIT
+                )
+            except OSError as exc:
+                self._logger.warning(f"Cannot reach the launcher: {exc}")
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+
+            writer.write(_encode({
+                "op": "hello", "cluster": self.cluster, "secret": self._secret,
+            }))
+            self._writer = writer
+            try:
+                async for line in reader:
+                    self._dispatch(json.loads(line))
+            except (ConnectionError, ValueError):
+                self._logger.warning("Lost the launcher", exc_info=True)
+            finally:
+                self._writer = None
+                writer.close()
+                for future in self._results.values():
+                    if not future.done():
+                        future.set_exception(IPCError("Lost the launcher"))
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def gather(self, op: str, *, timeout: float = TIMEOUT * 2):
+        """|coro|
+
+        Run an operation on every cluster, this one included.
+
+        Parameters
+        ----------
+        op: str
+            Operation to run, e.g. ``stats``.
+        timeout: float
+            Seconds to wait for the launcher.
+
+        Returns
+        -------
+        Dict[int, Any]:
+            Results by cluster id.
+
+        Raises
+        ------
+        IPCError
+            The launcher could not be reached or did not answer in time.
+        """
+        if self._writer is None:
+            raise IPCError("Not connected to the launcher")
+
+        nonce = next(self._nonces)
+        future = self._results[nonce] = asyncio.get_event_loop().create_future()
+        try:
+            self._writer.write(_encode(
+                {"op": "gather", "what": op, "nonce": nonce}
+            ))
+            data = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise IPCError(f"The launcher did not answer {op}") from None
+        finally:
+            del self._results[nonce]
+        return {int(cluster): result for cluster, result in data.items()}
+
+    def _dispatch(self, message: dict):
+        if message.get("op") == "result":
+            future = self._results.get(message.get("nonce"))
+            if future is not None and not future.done():
+                future.set_result(message.get("data", {}))
+        else:
+            asyncio.ensure_future(self._answer(message))
+
+    async def _answer(self, message: dict):
+        handler = self.handlers.get(message.get("op"))
+        data = None
+        if handler is not None:
+            try:
+                data = handler()
+                if asyncio.iscoroutine(data):
+                    data = await data
+            except Exception:
+                self._logger.exception(f"Failed to answer {message['op']}")
+                data = None
+
+        writer = self._writer
+        if writer is not None:
+            writer.write(_encode(
+                {"op": "reply", "nonce": message.get("nonce"), "data": data}
+            ))
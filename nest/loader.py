@@ -0,0 +1,108 @@
+"""
+Resolve the order modules load in from their manifests.
+
+A module may declare in ``modules/<module>/module.yml``:
+
+- ``requires``: modules that must be loaded first, or it is skipped
+- ``after``: modules that are loaded first if they are loaded at all
+- ``features``: client features it needs, or it is skipped
+
+For example, a module storing data in the database would declare::
+
+    requires: [db]
+    features: [database]
+"""
+
+import os
+from collections import namedtuple
+from typing import Dict, Iterable, List, Set, Tuple
+
+import yaml
+
+from nest import exceptions
+
+MANIFEST = "module.yml"
+
+Manifest = namedtuple("Manifest", "name requires after features")
+
+
+def read_manifest(name: str) -> Manifest:
+    """Read the manifest of a module, if it has one.
+
+    Parameters
+    ----------
+    name: str
+        Name of a folder within the modules directory.
+    """
+    path = os.path.join("modules", name, MANIFEST)
+    data = {}
+    if os.path.isfile(path):
+        with open(path) as file:
+            data = yaml.safe_load(file) or {}
+
+    return Manifest(
+        name=name,
+        requires=frozenset(data.get("requires", ())),
+        after=frozenset(data.get("after", ())),
+        features=frozenset(data.get("features", ())),
+    )
+
+
+def resolve(
+    manifests: Iterable[Manifest],
+    features: Set[str],
+    loaded: Set[str] = frozenset(),
+) -> Tuple[List[str], Dict[str, str]]:
+    """Sort modules so that each one comes after the modules it depends on.
+
+    Parameters
+    ----------
+    manifests: Iterable[Manifest]
+        Manifests of the modules to load.
+    features: Set[str]
+        Features the client has.
+    loaded: Set[str]
+        Modules already loaded, which satisfy requirements.
+
+    Returns
+    -------
+    Tuple[List[str], Dict[str, str]]:
+        Module names in load order, and why each skipped module was skipped.
+
+    Raises
+    ------
+    CircularDependency
+        Some modules depend on each other.
+    """
+    pending = {manifest.name: manifest for manifest in manifests}
+    skipped = {}
+
+    # Skipping a module can leave modules requiring it unsatisfied.
+    changed = True
+    while changed:
+        changed = False
+        for name, manifest in tuple(pending.items()):
+            missing = manifest.features - features
+            if missing:
+                skipped[name] = f"missing features {', '.join(sorted(missing))}"
+            else:
+                missing = manifest.requires - pending.keys() - loaded
+                if not missing:
+                    continue
+                skipped[name] = f"missing modules {', '.join(sorted(missing))}"
+            del pending[name]
+            changed = True
+
+    order = []
+    while pending:
+        ready = sorted(
+            name for name, manifest in pending.items()
+            if not (manifest.requires | manifest.after) & pending.keys()
+        )
+        if not ready:
+            raise exceptions.CircularDependency(sorted(pending))
+
+        order.extend(ready)
+        for name in ready:
+            del pending[name]
+    return order, skipped
@@ -0,0 +1,248 @@
+"""
+Collect timings in histograms and expose them for Prometheus to scrape.
+
+Observing a value is a dict lookup, a bisect and two additions, so hot
+paths can be timed on every message; hot paths keep the
+:meth:`Histogram.child` child they observe to skip the lookup. Gauges are read from callbacks when
+scraped, so values already kept elsewhere, e.g. counters and pool sizes,
+cost nothing until then.
+"""
+
+import bisect
+import logging
+import time
+from typing import (
+    TYPE_CHECKING, Callable, Dict, Iterable, List, Sequence, Tuple, Union,
+)
+
+if TYPE_CHECKING:
+    import aiohttp.web
+
+# Seconds, from a cache hit to a slow API.
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1, 2.5, 5, 10,
+)
+HOST = "127.0.0.1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+GaugeValue = Union[float, Dict[Tuple[str, ...], float]]
+
+
+def _escape(value) -> str:
+    return (str(value).replace("\\", r"\\").replace("\n", r"\n")
+            .replace('"', r"\""))
+
+
+def _labels(names: Sequence[str], values: Sequence[str], **extra) -> str:
+    pairs = [f'{name}="{_escape(value)}"'
+             for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra.items())
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Child:
+    """Observations of a histogram with one combination of label values.
+
+    Returned by :meth:`Histogram.child`.
+    """
+
+    __slots__ = ("_buckets", "_counts")
+
+    def __init__(self, buckets: Tuple[float, ...], counts: List[float]):
+        self._buckets = buckets
+        self._counts = counts
+
+    def observe(self, value: float):
+        """Record a value."""
+        counts = self._counts
+        counts[bisect.bisect_left(self._buckets, value)] += 1
+        counts[-1] += value
+
+
+class Histogram:
+    """Counts of observed values in buckets, per combination of labels.
+
+    Parameters
+    ----------
+    name: str
+        Metric name, e.g. ``nest_command_seconds``.
+    help: str
+        Description of the metric.
+    labels: Sequence[str]
+        Names of the labels every observation is made with.
+    buckets: Sequence[float]
+        Upper bounds of the buckets, in increasing order.
+    """
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Count per bucket, then the +Inf bucket and the sum.
+        self._children: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        """Record a value, with one value for each label."""
+        child = self._children.get(labels)
+        if child is None:
+            child = self._children[labels] = [0] * (len(self.buckets) + 2)
+        child[bisect.bisect_left(self.buckets, value)] += 1
+        child[-1] += value
+
+    def child(self, *labels: str) -> Child:
+        """Return the observations with one value for each label, to be
+        kept by callers observing them often."""
+        child = self._children.get(labels)
+        if child is None:
+            child = self._children[labels] = [0] * (len(self.buckets) + 2)
+        return Child(self.buckets, child)
+
+    def count(self, *labels: str) -> int:
+        """Number of values observed with some labels."""
+        child = self._children.get(labels)
+        return sum(child[:-1]) if child else 0
+
+    def total(self, *labels: str) -> float:
+        """Sum of values observed with some labels."""
+        child = self._children.get(labels)
+        return child[-1] if child else 0.0
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        bounds = [*(repr(float(bound)) for bound in self.buckets), "+Inf"]
+        for labels, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, child):
+                cumulative += count
+                yield (f"{self.name}_bucket"
+                       f"{_labels(self.labels, labels, le=bound)} "
+                       f"{cumulative}")
+            label_text = _labels(self.labels, labels)
+            yield f"{self.name}_sum{label_text} {child[-1]!r}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class Gauge:
+    """Value read from a callback whenever metrics are collected.
+
+    Parameters
+    ----------
+    name: str
+        Metric name, e.g. ``nest_guilds``.
+    help: str
+        Description of the metric.
+    func: Callable[[], Union[float, Dict[Tuple[str, ...], float]]]
+        Returns the value, or values by label values if ``labels`` is set.
+    labels: Sequence[str]
+        Names of the labels values are keyed by.
+    """
+
+    def __init__(self, name: str, help: str, func: Callable[[], GaugeValue],
+                 labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.labels = tuple(labels)
+
+    def collect(self) -> Iterable[str]:
+        values = self.func()
+        if not self.labels:
+            values = {(): values}
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {float(value)!r}"
+
+
+class Registry:
+    """Every metric of the client, by name.
+
+    Registering a metric that exists returns the existing one, so modules
+    keep their history when reloaded.
+    """
+
+    def __init__(self):
+        self._logger = logging.getLogger("nest.metrics")
+        self._metrics: Dict[str, Union[Histogram, Gauge]] = {}
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  **kwargs) -> Histogram:
+        """Register a :class:`Histogram`, or return the existing one."""
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = Histogram(
+                name, help, labels, **kwargs
+            )
+        return metric
+
+    def gauge(self, name: str, help: str, func: Callable[[], GaugeValue],
+              labels: Sequence[str] = ()) -> Gauge:
+        """Register a :class:`Gauge`, replacing the callback of one that
+        exists."""
+        metric = self._metrics[name] = Gauge(name, help, func, labels)
+        return metric
+
+    def unregister(self, name: str):
+        """Remove a metric, e.g. a gauge reading from an unloaded module."""
+        self._metrics.pop(name, None)
+
+    def __getitem__(self, name: str) -> Union[Histogram, Gauge]:
+        return self._metrics[name]
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text format."""
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            try:
+                lines.extend(list(metric.collect()))
+            except Exception:
+                self._logger.exception(f"Could not collect {name}")
+        return "\n".join(lines) + "\n"
+
+
+async def serve(registry: Registry, port: int,
+                host: str = HOST) -> "aiohttp.web.AppRunner":
+    """|coro|
+
+    Serve metrics over HTTP at ``/metrics``.
+
+    Parameters
+    ----------
+    registry: Registry
+        Metrics to serve.
+    port: int
+        Port to listen on.
+    host: str
+        Address to listen on, only the local host by default.
+
+    Returns
+    -------
+    aiohttp.web.AppRunner:
+        Runner to clean up to stop serving.
+    """
+    # Only imported when serving, as it is slow to import.
+    from aiohttp import web
+
+    async def metrics(request):
+        start = time.perf_counter()
+        body = registry.render()
+        registry.histogram(
+            "nest_metrics_render_seconds", "Time spent rendering metrics."
+        ).observe(time.perf_counter() - start)
+        return web.Response(
+            body=body.encode(), headers={"Content-Type": CONTENT_TYPE}
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, int(port)).start()
+    logging.getLogger("nest.metrics").info(
+        f"Serving metrics on http://{host}:{port}/metrics"
+    )
+    return runner
@@ -0,0 +1,228 @@
+"""
+Watch directories for changed files, with inotify or by polling.
+"""
+
+import abc
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import sys
+from typing import Callable, Dict, Set, Tuple
+
+DELAY = 0.5
+INTERVAL = 2
+
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+IN_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+_EVENT = struct.Struct("iIII")
+
+
+def _libc() -> ctypes.CDLL:
+    return ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+
+class Watcher(abc.ABC):
+    """Report files changed in watched directories.
+
+    Changes are collected for ``delay`` seconds after the first one, so
+    that a file written in several steps is reported once.
+
+    Parameters
+    ----------
+    callback: Callable[[Set[str]], None]
+        Called with the paths of changed, created or deleted files.
+    loop: asyncio.AbstractEventLoop
+        Loop to watch from.
+    delay: float
+        Seconds to wait for more changes before calling back.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[Set[str]], None],
+        *,
+        loop: asyncio.AbstractEventLoop = None,
+        delay: float = DELAY,
+    ):
+        self._logger = logging.getLogger("nest.watcher")
+        self._callback = callback
+        self._loop = loop or asyncio.get_event_loop()
+        self._pending: Set[str] = set()
+        self._flush = None
+        self.delay = float(delay)
+
+    @abc.abstractmethod
+    def add(self, directory: str):
+        """Start watching a directory."""
+
+    def close(self):
+        """Stop watching."""
+        if self._flush is not None:
+            self._flush.cancel()
+            self._flush = None
+
+    def _changed(self, path: str):
+        self._pending.add(path)
+        if self._flush is None:
+            self._flush = self._loop.call_later(self.delay, self._report)
+
+    def _report(self):
+        self._flush = None
+        paths, self._pending = self._pending, set()
+        try:
+            self._callback(paths)
+        except Exception:
+            self._logger.exception(f"Could not handle changes to {paths}")
+
+
+class InotifyWatcher(Watcher):
+    """Watcher woken up by the kernel through inotify, on Linux only.
+
+    Check :meth:`available` before creating one.
+
+    Raises
+    ------
+    OSError
+        No inotify instance could be created, e.g. past the user's limit.
+    """
+
+    def __init__(self, callback, **kwargs):
+        super().__init__(callback, **kwargs)
+        self._libc = _libc()
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        self._directories: Dict[int, str] = {}
+        self._loop.add_reader(self._fd, self._read)
+
+    @staticmethod
+    def available() -> bool:
+        """Whether inotify can be used on this platform."""
+        return sys.platform.startswith("linux") \
+            and hasattr(_libc(), "inotify_init1")
+
+    def add(self, directory: str):
+        if directory in self._directories.values():
+            return
+
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(directory), IN_MASK
+        )
+        if wd < 0:
+            errno = ctypes.get_errno()
+            self._logger.warning(
+                f"Cannot watch {directory}: {os.strerror(errno)}"
+            )
+            return
+        self._directories[wd] = directory
+
+    def close(self):
+        super().close()
+        if self._fd >= 0:
+            self._loop.remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = -1
+
+    def _read(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            directory = self._directories.get(wd)
+            if directory is not None and name:
+                self._changed(os.path.join(directory, os.fsdecode(name)))
+
+
+class PollingWatcher(Watcher):
+    """Watcher comparing modification times every ``interval`` seconds.
+
+    Parameters
+    ----------
+    interval: float
+        Seconds between scans.
+    """
+
+    def __init__(self, callback, *, interval: float = INTERVAL, **kwargs):
+        super().__init__(callback, **kwargs)
+        self._directories: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        self._task = self._loop.create_task(self._poll())
+        self.interval = float(interval)
+
+    def add(self, directory: str):
+        if directory not in self._directories:
+            self._directories[directory] = self._scan(directory)
+
+    def close(self):
+        super().close()
+        self._task.cancel()
+
+    @staticmethod
+    def _scan(directory: str) -> Dict[str, Tuple[int, int]]:
+        files = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            pass
+        return files
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            for directory, before in tuple(self._directories.items()):
+                after = self._scan(directory)
+                self._directories[directory] = after
+                for path in before.keys() | after.keys():
+                    if before.get(path) != after.get(path):
+                        self._changed(path)
+
+
+def watch(
+    callback: Callable[[Set[str]], None], *, poll: bool = False, **kwargs
+) -> Watcher:
+    """Create a watcher, using inotify unless unavailable or ``poll`` is set.
+
+    Parameters
+    ----------
+    callback: Callable[[Set[str]], None]
+        Called with the paths of changed, created or deleted files.
+    poll: bool
+        Always poll, e.g. for network filesystems inotify cannot watch.
+    **kwargs:
+        Passed to the watcher, e.g. ``loop``, ``delay`` and ``interval``.
+    """
+    interval = kwargs.pop("interval", INTERVAL)
+    logger = logging.getLogger("nest.watcher")
+    if not poll:
+        if InotifyWatcher.available():
+            try:
+                return InotifyWatcher(callback, **kwargs)
+            except OSError as exc:
+                logger.warning(f"Cannot use inotify, polling instead: {exc}")
+        else:
+            logger.info("inotify is not available, polling instead")
+    return PollingWatcher(callback, interval=interval, **kwargs)
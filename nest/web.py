@@ -0,0 +1,693 @@
+"""
+Fetch data from web APIs, caching responses per API.
+"""
+
+import asyncio
+import base64
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from multidict import CIMultiDict
+
+from nest import exceptions
+from nest.cache import LRUCache, MISSING
+
+CACHE_SIZE = 1024
+
+# Seconds a response stays fresh, per API.
+DEFAULT_TTLS = {
+    "xkcd": 3600,
+    "pypi": 3600,
+    "npm": 3600,
+    "kitsu": 86400,
+    "jisho": 86400,
+    "urban": 600,
+}
+
+MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+# Seconds a request may take, and may wait for its host to be free.
+TIMEOUT = 10
+QUEUE_TIMEOUT = 5
+# Requests in flight per host, unless configured.
+CONCURRENCY = 8
+# Consecutive failures opening an API's circuit, and seconds until it is
+# probed again.
+BREAKER_THRESHOLD = 5
+BREAKER_RESET = 30
+# Seconds past expiry a response may be served while its API is failing.
+MAX_STALE = 86400
+# Seconds after which a leftover temporary file is deleted.
+TMP_AGE = 3600
+
+
+class Response:
+    """A fetched response, with its body read.
+
+    Responses may be served to several commands at once, so the parsed
+    JSON they return must not be mutated.
+
+    Attributes
+    ----------
+    status: int
+        HTTP status code.
+    headers: multidict.CIMultiDict
+        Response headers.
+    body: bytes
+        Response body.
+    """
+
+    __slots__ = ("status", "headers", "body", "_json")
+
+    def __init__(self, status: int, headers, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self._json = MISSING
+
+    def json(self):
+        """Parse the body as JSON, regardless of the content type."""
+        if self._json is MISSING:
+            self._json = json.loads(self.body)
+        return self._json
+
+    def text(self, encoding: str = "utf-8") -> str:
+        """Decode the body."""
+        return self.body.decode(encoding)
+
+
+class CacheEntry:
+    """A cached response and how long it may be served without revalidating."""
+
+    __slots__ = ("response", "expires")
+
+    def __init__(self, response: Response, expires: float):
+        self.response = response
+        self.expires = expires
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires > time.time()
+
+    @property
+    def stale_for(self) -> float:
+        """Seconds since the entry expired."""
+        return time.time() - self.expires
+
+    def validators(self) -> Dict[str, str]:
+        """Headers for revalidating the entry with a conditional request."""
+        headers = {}
+        if "ETag" in self.response.headers:
+            headers["If-None-Match"] = self.response.headers["ETag"]
+        if "Last-Modified" in self.response.headers:
+            headers["If-Modified-Since"] = self.response.headers["Last-Modified"]
+        return headers
+
+
+class HostLimiter:
+    """Token bucket and cap on requests in flight for one host.
+
+    Parameters
+    ----------
+    rate: float
+        Requests allowed per second, or None for no limit.
+    burst: int
+        Requests allowed at once after being idle.
+    concurrency: int
+        Requests allowed in flight at once.
+
+    Attributes
+    ----------
+    requests: int
+        Requests let through.
+    rejected: int
+        Requests that gave up waiting.
+    queued: float
+        Total seconds requests spent waiting.
+    max_queued: float
+        Longest a single request waited.
+    """
+
+    def __init__(self, rate: float = None, burst: int = 1,
+                 concurrency: int = CONCURRENCY):
+        self.rate = float(rate) if rate else None
+        self.burst = max(int(burst), 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._semaphore = asyncio.Semaphore(int(concurrency))
+
+        self.requests = 0
+        self.rejected = 0
+        self.queued = 0.0
+        self.max_queued = 0.0
+
+    def pause(self, seconds: float):
+        """Let no request through for some time, e.g. after a Retry-After."""
+        self._paused_until = max(
+            self._paused_until, time.monotonic() + seconds
+        )
+
+    async def acquire(self, timeout: float):
+        """|coro|
+
+        Wait for a free slot and a token.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            Neither was available within the timeout.
+        """
+        start = time.monotonic()
+        deadline = start + timeout
+
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise
+
+        try:
+            while True:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0:
+                    wait = self._take(now)
+                    if wait <= 0:
+                        break
+                if now + wait > deadline:
+                    raise asyncio.TimeoutError()
+                await asyncio.sleep(wait)
+        except BaseException as exc:
+            self._semaphore.release()
+            if isinstance(exc, asyncio.TimeoutError):
+                self.rejected += 1
+            raise
+
+        waited = time.monotonic() - start
+        self.requests += 1
+        self.queued += waited
+        self.max_queued = max(self.max_queued, waited)
+
+    def release(self):
+        """Free the slot taken by :meth:`acquire`."""
+        self._semaphore.release()
+
+    def _take(self, now: float) -> float:
+        """Take a token, or return how long until one is available."""
+        if self.rate is None:
+            return 0
+
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def stats(self) -> Dict[str, float]:
+        """Return request and queueing counters."""
+        return {
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+        }
+
+
+class CircuitBreaker:
+    """Fails requests to an API fast while it keeps failing.
+
+    After ``threshold`` consecutive failures the circuit opens, and
+    requests fail without being sent. Once ``reset`` seconds have passed it
+    is half-open: one probe request is let through, which closes the
+    circuit if it succeeds and opens it again if it fails.
+
+    Attributes
+    ----------
+    failures: int
+        Consecutive failures.
+    trips: int
+        Times the circuit opened.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD,
+                 reset: float = BREAKER_RESET):
+        self.threshold = int(threshold)
+        self.reset = float(reset)
+        self.failures = 0
+        self.trips = 0
+        self._opened = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened >= self.reset:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    @property
+    def opened(self) -> Optional[float]:
+        """Seconds since the circuit opened, if it is not closed."""
+        return None if self._opened is None else time.monotonic() - self._opened
+
+    def allow(self) -> bool:
+        """Check if a request may be sent, taking the probe if half-open."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def success(self):
+        self.failures = 0
+        self._opened = None
+        self._probing = False
+
+    def failure(self):
+        self.failures += 1
+        if self._probing or (
+            self._opened is None and self.failures >= self.threshold
+        ):
+            self.trips += 1
+            self._opened = time.monotonic()
+        self._probing = False
+
+    def release(self):
+        """Record a request that neither succeeded nor failed."""
+        self._probing = False
+
+
+def retry_after(value: str) -> Optional[float]:
+    """Parse a Retry-After header into seconds from now."""
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0)
+
+
+class WebClient:
+    """Makes GET requests to web APIs, with a response cache.
+
+    Concurrent identical requests are coalesced: only the first one is
+    sent, and every caller gets its response.
+
+    Requests are scheduled per host by a :class:`HostLimiter`, configured
+    by ``limits``. Those waiting longer than its ``queue_timeout`` fail, and
+    a ``Retry-After`` in a 429 or 503 response pauses the host.
+
+    Each API has a :class:`CircuitBreaker`, counting connection errors,
+    timeouts and 5xx responses as failures. While a request fails, or the
+    circuit is open, an expired response is served if one is cached.
+
+    Successful responses are kept for the TTL configured for their API, or
+    the ``max-age`` the API sends when none is configured, and never when
+    it sends ``no-store``. Expired responses stay cached, and are revalidated
+    with ``If-None-Match``/``If-Modified-Since`` when the API sent an
+    ``ETag`` or ``Last-Modified`` header.
+
+    Parameters
+    ----------
+    session: aiohttp.ClientSession
+        Session to make requests with.
+    size: int
+        Maximum number of responses kept in memory.
+    ttl: Dict[str, float]
+        Seconds responses stay fresh, per API. Merged over DEFAULT_TTLS.
+    path: str
+        Directory to also persist responses to, if any. Files are named
+        after a digest of the URL and parameters, which are not stored as
+        they may hold API keys. A file is deleted once its response is
+        evicted from memory, or ``max_stale`` seconds after it expired, so
+        the files never hold more than ``size`` responses: they only keep
+        the cache across restarts.
+    max_stale: float
+        Seconds past expiry a response may be served on errors.
+    limits: dict
+        ``timeout`` and ``queue_timeout`` in seconds, the ``rate``,
+        ``burst`` and ``concurrency`` of each of ``hosts``, and the
+        ``threshold`` and ``reset`` of every API's ``breaker``.
+    histogram: nest.metrics.Histogram
+        Histogram labelled by API to record the time requests take, once
+        let through by their host's limiter, if any.
+    queue_histogram: nest.metrics.Histogram
+        Histogram labelled by host to record the time requests wait for
+        their host's limiter, including those that give up, if any.
+
+    Attributes
+    ----------
+    coalesced: int
+        Requests answered by joining an identical one already in flight.
+    limiters: Dict[str, HostLimiter]
+        Limiter of each host requested so far.
+    breakers: Dict[str, CircuitBreaker]
+        Circuit breaker of each API requested so far.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        *,
+        size: int = CACHE_SIZE,
+        ttl: Dict[str, float] = None,
+        path: str = None,
+        max_stale: float = MAX_STALE,
+        limits: dict = None,
+        histogram=None,
+        queue_histogram=None,
+    ):
+        self._logger = logging.getLogger("nest.web")
+        self.session = session
+        self.cache = LRUCache(maxsize=int(size), on_evict=self._evicted)
+        self.ttls = {
+            api: float(value)
+            for api, value in {**DEFAULT_TTLS, **(ttl or {})}.items()
+        }
+        self.max_stale = float(max_stale)
+        self.path = path
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._sweep()
+
+        self.coalesced = 0
+        self._histogram = histogram
+        self._queue_histogram = queue_histogram
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+        limits = limits or {}
+        self._timeout = aiohttp.ClientTimeout(
+            total=float(limits.get("timeout", TIMEOUT))
+        )
+        self._queue_timeout = float(limits.get("queue_timeout", QUEUE_TIMEOUT))
+        self._host_limits = limits.get("hosts", {})
+        self.limiters: Dict[str, HostLimiter] = {}
+        self._breaker = limits.get("breaker", {})
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    async def fetch(
+        self,
+        url: str,
+        *,
+        api: str,
+        params: dict = None,
+        headers: dict = None,
+        cache: bool = True,
+    ) -> Response:
+        """|coro|
+
+        GET a URL, serving it from the cache where possible.
+
+        Parameters
+        ----------
+        url: str
+            URL to request.
+        api: str
+            Name of the API, used to look up its TTL.
+        params: dict
+            Query parameters.
+        headers: dict
+            Request headers. These are not part of the cache key.
+        cache: bool
+            Set to False for endpoints that return a different result on
+            every request, which are then neither cached nor coalesced.
+
+        Raises
+        ------
+        nest.exceptions.WebAPIUnreachable
+            The request failed or timed out.
+        """
+        if not cache:
+            return await self._request(api, url, params, headers)
+
+        key = (url, tuple(sorted((k, str(v)) for k, v in (params or {}).items())))
+        entry = self.cache.get(key, None)
+        if entry is not None and entry.fresh:
+            return entry.response
+
+        task = self._inflight.get(key)
+        if task is None:
+            # The request runs as its own task, so that a caller being
+            # cancelled doesn't cancel it for every other caller.
+            task = asyncio.ensure_future(
+                self._fetch(key, entry, api, url, params, headers)
+            )
+            task.add_done_callback(functools.partial(self._done, key))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _done(self, key, task: asyncio.Future):
+        del self._inflight[key]
+        # Mark the exception as retrieved if every caller was cancelled.
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch(self, key, entry, api, url, params, headers) -> Response:
+        if entry is None and self.path:
+            entry = await self._load(key)
+
+        if entry is not None:
+            if entry.fresh:
+                return entry.response
+            headers = {**(headers or {}), **entry.validators()}
+
+        try:
+            response = await self._request(api, url, params, headers)
+        except (exceptions.WebAPIUnreachable, exceptions.WebAPIRateLimited):
+            if entry is not None and entry.stale_for < self.max_stale:
+                return entry.response
+            raise
+
+        if response.status >= 500 and entry is not None \
+                and entry.stale_for < self.max_stale:
+            return entry.response
+
+        if response.status == 304 and entry is not None:
+            # Without a TTL the entry stays expired, to be revalidated again.
+            expires = self._expiry(api, response) or time.time()
+            entry = CacheEntry(entry.response, expires)
+            await self._store(key, entry)
+            return entry.response
+
+        if response.status == 200:
+            expires = self._expiry(api, response)
+            if expires is not None:
+                await self._store(key, CacheEntry(response, expires))
+
+        return response
+
+    def limiter(self, host: str) -> HostLimiter:
+        """Return the limiter of a host, creating it on first use."""
+        limiter = self.limiters.get(host)
+        if limiter is None:
+            limiter = HostLimiter(**self._host_limits.get(host, {}))
+            self.limiters[host] = limiter
+        return limiter
+
+    def breaker(self, api: str) -> CircuitBreaker:
+        """Return the circuit breaker of an API, creating it on first use."""
+        breaker = self.breakers.get(api)
+        if breaker is None:
+            breaker = CircuitBreaker(**self._breaker)
+            self.breakers[api] = breaker
+        return breaker
+
+    async def _request(self, api, url, params, headers) -> Response:
+        breaker = self.breaker(api)
+        if not breaker.allow():
+            raise exceptions.WebAPIUnreachable(api=api)
+
+        try:
+            response = await self._send(api, url, params, headers)
+        except exceptions.WebAPIUnreachable:
+            breaker.failure()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+
+        if response.status >= 500:
+            breaker.failure()
+        else:
+            breaker.success()
+        return response
+
+    async def _send(self, api, url, params, headers) -> Response:
+        host = urlsplit(url).hostname
+        limiter = self.limiter(host)
+        start = time.perf_counter()
+        try:
+            await limiter.acquire(self._queue_timeout)
+        except asyncio.TimeoutError:
+            raise exceptions.WebAPIRateLimited(api=api)
+        finally:
+            if self._queue_histogram is not None:
+                self._queue_histogram.observe(
+                    time.perf_counter() - start, host
+                )
+
+        start = time.perf_counter()
+        try:
+            async with self.session.get(
+                url, params=params, headers=headers, timeout=self._timeout
+            ) as resp:
+                response = Response(
+                    resp.status, resp.headers.copy(), await resp.read()
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            raise exceptions.WebAPIUnreachable(api=api)
+        finally:
+            limiter.release()
+            if self._histogram is not None:
+                self._histogram.observe(time.perf_counter() - start, api)
+
+        if response.status in (429, 503) and "Retry-After" in response.headers:
+            delay = retry_after(response.headers["Retry-After"])
+            if delay:
+                limiter.pause(delay)
+
+        return response
+
+    def _expiry(self, api: str, response: Response) -> Optional[float]:
+        """Return when a response expires, or None if it can't be stored."""
+        control = response.headers.get("Cache-Control", "").lower()
+        if "no-store" in control:
+            return None
+
+        ttl = self.ttls.get(api)
+        if ttl is None:
+            match = MAX_AGE_RE.search(control)
+            ttl = int(match.group(1)) if match else 0
+        if "no-cache" in control:
+            ttl = 0
+
+        has_validators = (
+            "ETag" in response.headers or "Last-Modified" in response.headers
+        )
+        if ttl <= 0 and not has_validators:
+            return None
+        return time.time() + ttl
+
+    async def _store(self, key, entry: CacheEntry):
+        self.cache.set(key, entry)
+        if self.path:
+            await asyncio.get_event_loop().run_in_executor(
+                None, self._write, key, entry
+            )
+
+    @staticmethod
+    def _digest(key) -> str:
+        return hashlib.sha256(repr(key).encode()).hexdigest()
+
+    def _filename(self, key) -> str:
+        return os.path.join(self.path, f"{self._digest(key)}.json")
+
+    def _write(self, key, entry: CacheEntry):
+        filename = self._filename(key)
+        tmp = filename + ".tmp"
+        response = entry.response
+        data = {
+            "digest": self._digest(key),
+            "status": response.status,
+            "headers": list(response.headers.items()),
+            "body": base64.b64encode(response.body).decode("ascii"),
+            "expires": entry.expires,
+        }
+        try:
+            with open(tmp, "w") as file:
+                json.dump(data, file)
+            # The modification time is when the file may be deleted.
+            discard = entry.expires + self.max_stale
+            os.utime(tmp, (discard, discard))
+            os.replace(tmp, filename)
+        except OSError:
+            self._logger.exception("Could not persist cached response")
+
+    def _read(self, key) -> Optional[CacheEntry]:
+        try:
+            with open(self._filename(key)) as file:
+                data = json.load(file)
+            digest, expires = data["digest"], data["expires"]
+            response = Response(
+                data["status"],
+                CIMultiDict(data["headers"]),
+                base64.b64decode(data["body"]),
+            )
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError):
+            self._logger.warning("Ignoring unreadable cached response")
+            return None
+        if digest != self._digest(key):
+            return None
+        if expires + self.max_stale <= time.time():
+            self._remove(key)
+            return None
+        return CacheEntry(response, expires)
+
+    def _remove(self, key):
+        try:
+            os.remove(self._filename(key))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            self._logger.exception("Could not delete cached response")
+
+    def _evicted(self, key, entry: CacheEntry):
+        if self.path:
+            asyncio.get_event_loop().run_in_executor(None, self._remove, key)
+
+    def _sweep(self):
+        """Delete persisted responses past ``max_stale``, and temporary files
+        left over from an interrupted write."""
+        now = time.time()
+        for file in os.scandir(self.path):
+            try:
+                if file.name.endswith(".json.tmp"):
+                    expired = file.stat().st_mtime < now - TMP_AGE
+                elif file.name.endswith(".json"):
+                    expired = file.stat().st_mtime <= now
+                else:
+                    continue
+                if expired:
+                    os.remove(file.path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                self._logger.exception(
+                    f"Could not delete cached response {file.name}"
+                )
+
+    async def _load(self, key) -> Optional[CacheEntry]:
+        entry = await asyncio.get_event_loop().run_in_executor(
+            None, self._read, key
+        )
+        if entry is not None:
+            self.cache.set(key, entry)
+        return entry
@@ -0,0 +1,61 @@
+"""
+Fixtures shared by the tests.
+
+Tests needing PostgreSQL run against a throwaway database created on the
+server given by the NEST_TEST_DSN environment variable, e.g.
+``postgresql://postgres@127.0.0.1/postgres``, and are skipped without it.
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from urllib.parse import urlsplit
+
+import asyncpg
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    loop.run_until_complete(loop.shutdown_asyncgens())
+    loop.close()
+    asyncio.set_event_loop(None)
+
+
+@pytest.fixture
+def database(loop, monkeypatch) -> str:
+    """Name of an empty database, dropped after the test.
+
+    The server's address is exported as PG* environment variables, so
+    code connecting with only a database name reaches it too.
+    """
+    dsn = os.environ.get("NEST_TEST_DSN")
+    if not dsn:
+        pytest.skip("NEST_TEST_DSN is not set")
+
+    parts = urlsplit(dsn)
+    for name, value in (("PGHOST", parts.hostname), ("PGPORT", parts.port),
+                        ("PGUSER", parts.username),
+                        ("PGPASSWORD", parts.password)):
+        if value is not None:
+            monkeypatch.setenv(name, str(value))
+
+    name = f"nest_test_{uuid.uuid4().hex[:12]}"
+
+    async def admin(statement: str):
+        conn = await asyncpg.connect(dsn)
+        try:
+            await conn.execute(statement)
+        finally:
+            await conn.close()
+
+    loop.run_until_complete(admin(f"CREATE DATABASE {name}"))
+    yield name
+    loop.run_until_complete(admin(f"DROP DATABASE {name} WITH (FORCE)"))
@@ -0,0 +1,159 @@
+"""
+Caches of two processes sharing a database, kept in sync by NOTIFY.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import asyncpg
+import pytest
+
+from modules.db.db import PostgreSQL
+from modules.db.locale import LocaleStore
+from modules.db.prefix import PrefixStore
+from nest import metrics
+from nest.cache import MISSING
+
+GUILD = 1
+USER = 2
+SCHEMA = """
+CREATE TABLE guild (id BIGINT PRIMARY KEY, prefix text);
+CREATE TABLE userdata (id BIGINT PRIMARY KEY, locale text);
+"""
+
+
+class Process:
+    """The database cogs of one bot process."""
+
+    def __init__(self, database: str, loop: asyncio.AbstractEventLoop):
+        self.bot = SimpleNamespace(
+            loop=loop, options={"database": database}, guilds=[],
+            metrics=metrics.Registry(), caches={},
+        )
+        self.db = PostgreSQL(self.bot)
+        self.bot.get_cog = lambda name: self.db
+        self.prefixes = PrefixStore(self.bot)
+        self.locales = LocaleStore(self.bot)
+
+        self.listening = asyncio.Event()
+        self.changed = asyncio.Queue()
+        self.db.on_change("locale", self._changed)
+        self.db.on_change("prefix", self._changed)
+
+    def _changed(self, key):
+        if key is None:
+            self.listening.set()
+        else:
+            self.changed.put_nowait(key)
+
+    async def close(self):
+        for task in (self.db._listen_task, *self.db._pool_tasks):
+            task.cancel()
+        if self.db._listener is not None:
+            await self.db._listener.close()
+        for workload in self.db.workloads.values():
+            if workload.pool is not None:
+                await workload.pool.close()
+
+
+def context(user_id: int = USER, guild_id: int = GUILD):
+    author = SimpleNamespace(id=user_id)
+    guild = SimpleNamespace(id=guild_id, shard_id=None)
+    message = SimpleNamespace(author=author, guild=guild, content="?ping")
+    return SimpleNamespace(author=author, guild=guild, message=message)
+
+
+@pytest.fixture
+def processes(loop, database):
+    async def start():
+        conn = await asyncpg.connect(database=database)
+        try:
+            await conn.execute(SCHEMA)
+        finally:
+            await conn.close()
+        started = [Process(database, loop), Process(database, loop)]
+        for process in started:
+            await asyncio.wait_for(process.listening.wait(), 10)
+        return started
+
+    started = loop.run_until_complete(start())
+    yield started
+    for process in started:
+        loop.run_until_complete(process.close())
+
+
+def test_changes_evict_other_processes(loop, processes):
+    first, second = processes
+
+    async def run():
+        ctx = context()
+        assert await second.locales.get(ctx) is None
+        assert await second.prefixes.get(ctx.message) is None
+
+        await first.locales.set(ctx, "fi_FI")
+        await first.prefixes.set(ctx, "?")
+        assert await asyncio.wait_for(second.changed.get(), 5) == USER
+        assert await asyncio.wait_for(second.changed.get(), 5) == GUILD
+
+        assert second.locales.cache.get(USER) is MISSING
+        assert await second.locales.get(ctx) == "fi_FI"
+        assert await second.prefixes.get(ctx.message) == "?"
+
+        # The writer updated its own caches, and ignores its notifications.
+        assert first.changed.empty()
+        assert first.prefixes.cache.get(GUILD) == "?"
+        assert first.prefixes.first_chars == {"?"}
+
+    loop.run_until_complete(run())
+
+
+def test_change_during_lookup_is_not_cached(loop, processes):
+    first, second = processes
+    read = asyncio.Event()
+    resume = asyncio.Event()
+    load = second.locales._load
+
+    async def slow_load(user_id):
+        locale = await load(user_id)
+        read.set()
+        await resume.wait()
+        return locale
+
+    second.locales._load = slow_load
+
+    async def run():
+        ctx = context()
+        lookups = [asyncio.ensure_future(second.locales.get(ctx))
+                   for _ in range(3)]
+        await asyncio.wait_for(read.wait(), 5)
+
+        # Written and heard about while the old locale is in flight.
+        await first.locales.set(ctx, "fi_FI")
+        assert await asyncio.wait_for(second.changed.get(), 5) == USER
+        resume.set()
+
+        assert await asyncio.gather(*lookups) == [None, None, None]
+        assert second.locales.cache.get(USER) is MISSING
+        second.locales._load = load
+        assert await second.locales.get(ctx) == "fi_FI"
+
+    loop.run_until_complete(run())
+
+
+def test_concurrent_lookups_share_a_query(loop, processes):
+    process = processes[0]
+    calls = []
+    load = process.locales._load
+
+    async def counted_load(user_id):
+        calls.append(user_id)
+        return await load(user_id)
+
+    process.locales._load = counted_load
+
+    async def run():
+        ctx = context()
+        await asyncio.gather(*(process.locales.get(ctx) for _ in range(10)))
+        assert calls == [USER]
+
+    loop.run_until_complete(run())
@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+
+import asyncpg
+import pytest
+
+from utils import migrate
+
+ARGS = argparse.Namespace(partitioned=False, allow_type_changes=False)
+
+
+@pytest.fixture
+def modules(tmp_path, monkeypatch):
+    """A modules directory with one table and an index built concurrently."""
+    module = tmp_path / "sample"
+    (module / "migrations").mkdir(parents=True)
+    (module / "db.yml").write_text("sample:\n  value: integer\n")
+    (module / "migrations" / "0001_value_index.sql").write_text(
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS sample_value_idx\n"
+        "    ON sample (value);\n"
+    )
+    monkeypatch.setattr(migrate, "MODULES", str(tmp_path))
+    monkeypatch.setattr(migrate, "LOCK_POLL", 0.05)
+
+
+def test_split_statements_keeps_quoted_semicolons():
+    sql = (
+        "-- nest: no-transaction\n"
+        "CREATE FUNCTION touch() RETURNS trigger AS $$\n"
+        "BEGIN NEW.seen = now(); RETURN NEW; END;\n"
+        "$$ LANGUAGE plpgsql;\n"
+        "INSERT INTO sample VALUES (1, ';'); /* done; */\n"
+        "-- trailing comment;\n"
+    )
+    assert migrate.split_statements(sql) == [
+        "-- nest: no-transaction\n"
+        "CREATE FUNCTION touch() RETURNS trigger AS $$\n"
+        "BEGIN NEW.seen = now(); RETURN NEW; END;\n"
+        "$$ LANGUAGE plpgsql",
+        "INSERT INTO sample VALUES (1, ';')",
+    ]
+
+
+async def connect(database: str) -> asyncpg.Connection:
+    return await asyncpg.connect(database=database)
+
+
+async def index_valid(conn: asyncpg.Connection):
+    return await conn.fetchval(
+        "SELECT indisvalid FROM pg_index "
+        "WHERE indexrelid = to_regclass('sample_value_idx')"
+    )
+
+
+def test_apply_is_idempotent(loop, database, modules):
+    async def run():
+        conn = await connect(database)
+        try:
+            await migrate.apply(conn, ARGS)
+            await migrate.apply(conn, ARGS)
+            assert await index_valid(conn) is True
+            assert await conn.fetchval(
+                "SELECT count(*) FROM schema_migrations"
+            ) == 1
+            assert await migrate.pending(conn) == []
+        finally:
+            await conn.close()
+
+    loop.run_until_complete(run())
+
+
+def test_invalid_index_is_rebuilt(loop, database, modules):
+    async def run():
+        conn = await connect(database)
+        try:
+            await conn.execute(
+                "CREATE TABLE sample (id BIGINT PRIMARY KEY, value integer)"
+            )
+            await conn.execute("INSERT INTO sample VALUES (1, 1), (2, 1)")
+            # Fails on the duplicate, leaving an INVALID index behind.
+            with pytest.raises(asyncpg.UniqueViolationError):
+                await conn.execute(
+                    "CREATE UNIQUE INDEX CONCURRENTLY sample_value_idx "
+                    "ON sample (value)"
+                )
+            assert await index_valid(conn) is False
+
+            await conn.execute("DELETE FROM sample WHERE id = 2")
+            await migrate.apply(conn, ARGS)
+            assert await index_valid(conn) is True
+        finally:
+            await conn.close()
+
+    loop.run_until_complete(run())
+
+
+def test_concurrent_applies_do_not_deadlock(loop, database, modules):
+    async def run():
+        first, second = await connect(database), await connect(database)
+        try:
+            await asyncio.wait_for(asyncio.gather(
+                migrate.apply(first, ARGS), migrate.apply(second, ARGS),
+            ), 30)
+            assert await index_valid(first) is True
+            assert await first.fetchval(
+                "SELECT count(*) FROM schema_migrations"
+            ) == 1
+        finally:
+            await first.close()
+            await second.close()
+
+    loop.run_until_complete(run())
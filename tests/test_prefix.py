@@ -0,0 +1,117 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from modules.db.prefix import PrefixStore
+
+GUILD = 1
+
+
+class Database:
+    """Answers the prefix queries from a dict, counting them."""
+
+    def __init__(self, prefixes):
+        self.prefixes = prefixes
+        self.queries = 0
+        self.first_char_queries = 0
+
+    def subscribe(self, kind, cache):
+        pass
+
+    def on_change(self, kind, callback):
+        pass
+
+    def acquire(self, workload):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def fetch(self, query, guild_ids=None):
+        await asyncio.sleep(0)
+        if guild_ids is None:
+            self.first_char_queries += 1
+            return [{"first": prefix[:1]}
+                    for prefix in set(self.prefixes.values())]
+        self.queries += 1
+        return [{"id": guild_id, "prefix": self.prefixes[guild_id]}
+                for guild_id in guild_ids if guild_id in self.prefixes]
+
+
+@pytest.fixture
+def store(loop):
+    database = Database({GUILD: "?"})
+    bot = SimpleNamespace(loop=loop, options={}, caches={}, guilds=[],
+                          get_cog=lambda name: database)
+    return PrefixStore(bot), database
+
+
+def message(content: str, guild_id: int = GUILD):
+    return SimpleNamespace(
+        content=content, guild=SimpleNamespace(id=guild_id, shard_id=0),
+    )
+
+
+def test_preload_does_not_count_as_lookups(loop, store):
+    prefixes, database = store
+
+    async def run():
+        for guild_id in range(GUILD, GUILD + 10):
+            await prefixes.on_guild_available(
+                SimpleNamespace(id=guild_id, shard_id=0)
+            )
+        await prefixes.on_shard_ready(0)
+        await asyncio.gather(*set(prefixes._loads.values()))
+        assert await prefixes.get(message("?ping")) == "?"
+        assert await prefixes.get(message("?ping", GUILD + 1)) is None
+
+    loop.run_until_complete(run())
+    assert database.queries == 1
+    assert (prefixes.cache.hits, prefixes.cache.misses) == (2, 0)
+
+
+def test_concurrent_lookups_share_a_query(loop, store):
+    prefixes, database = store
+
+    async def run():
+        return await asyncio.gather(
+            *(prefixes.get(message("?ping")) for _ in range(10))
+        )
+
+    assert loop.run_until_complete(run()) == ["?"] * 10
+    assert database.queries == 1
+
+
+@pytest.mark.parametrize("default", ["nest!", ("nest!", "nest@", "nest#")])
+def test_messages_without_any_prefix_skip_the_query(loop, store, default):
+    prefixes, database = store
+    prefixes.first_chars = {"?"}
+
+    async def run():
+        assert await prefixes.get(message("hello"), default=default) is None
+        assert await prefixes.get(message("nest!ban"), default=default) \
+            == "?"
+
+    loop.run_until_complete(run())
+    assert prefixes.skipped == 1
+    assert database.queries == 1
+
+
+def test_first_chars_load_when_the_store_starts(loop, store):
+    prefixes, database = store
+    assert prefixes.first_chars is None
+    loop.run_until_complete(asyncio.sleep(0.01))
+    assert prefixes.first_chars == {"?"}
+    assert database.first_char_queries == 1
+
+
+def test_any_of_several_defaults_needs_the_query(store):
+    prefixes, _ = store
+    prefixes.first_chars = {"?"}
+    defaults = ("nest!", "nest@", "nest#")
+    assert prefixes._may_start_with_prefix("nest#reload", defaults)
+    assert not prefixes._may_start_with_prefix("nest reload", defaults)
@@ -0,0 +1,174 @@
+import asyncio
+import os
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from multidict import CIMultiDict
+
+from nest import exceptions, metrics
+from nest.web import CacheEntry, Response, WebClient
+
+CALLERS = 10
+
+
+class Upstream:
+    """A stub API counting requests, held until released."""
+
+    def __init__(self):
+        self.hits = 0
+        self.release = asyncio.Event()
+        self.fail = False
+        app = web.Application()
+        app.router.add_get("/data", self.handle)
+        self.server = TestServer(app)
+
+    async def handle(self, request):
+        self.hits += 1
+        await self.release.wait()
+        if self.fail:
+            # Drop the connection, as a crashed upstream would.
+            request.transport.close()
+        return web.json_response({"query": request.query.get("q")})
+
+    def url(self, path: str = "/data") -> str:
+        return str(self.server.make_url(path))
+
+
+async def new_session() -> aiohttp.ClientSession:
+    return aiohttp.ClientSession()
+
+
+@pytest.fixture
+def upstream(loop):
+    upstream = Upstream()
+    loop.run_until_complete(upstream.server.start_server())
+    yield upstream
+    loop.run_until_complete(upstream.server.close())
+
+
+@pytest.fixture
+def session(loop):
+    session = loop.run_until_complete(new_session())
+    yield session
+    loop.run_until_complete(session.close())
+
+
+@pytest.fixture
+def client(upstream, session):
+    return upstream, WebClient(session, ttl={"stub": 60})
+
+
+async def fetch_all(upstream: Upstream, web_client: WebClient):
+    fetches = [
+        asyncio.ensure_future(web_client.fetch(
+            upstream.url(), api="stub", params={"q": "same"},
+        ))
+        for _ in range(CALLERS)
+    ]
+    # Only release the stub once every caller has joined the request.
+    for _ in range(500):
+        if web_client.coalesced >= CALLERS - 1:
+            break
+        await asyncio.sleep(0.01)
+    upstream.release.set()
+    return await asyncio.gather(*fetches, return_exceptions=True)
+
+
+def test_identical_requests_are_coalesced(loop, client):
+    upstream, web_client = client
+    responses = loop.run_until_complete(fetch_all(upstream, web_client))
+
+    assert upstream.hits == 1
+    assert [response.json() for response in responses] == \
+        [{"query": "same"}] * CALLERS
+
+
+def test_upstream_error_reaches_every_caller(loop, client):
+    upstream, web_client = client
+    upstream.fail = True
+    results = loop.run_until_complete(fetch_all(upstream, web_client))
+
+    assert upstream.hits == 1
+    assert all(isinstance(result, exceptions.WebAPIUnreachable)
+               for result in results)
+    assert not web_client._inflight
+
+
+def test_queue_wait_is_recorded_per_host(loop, upstream, session):
+    upstream.release.set()
+    registry = metrics.Registry()
+    requests = registry.histogram("requests", "", labels=("api",))
+    queued = registry.histogram("queued", "", labels=("host",))
+    host = upstream.server.host
+    web_client = WebClient(
+        session, limits={"hosts": {host: {"rate": 10}}},
+        histogram=requests, queue_histogram=queued,
+    )
+
+    async def fetch_two():
+        await asyncio.gather(*(
+            web_client.fetch(upstream.url(), api="stub", params={"q": q})
+            for q in ("a", "b")
+        ))
+
+    loop.run_until_complete(fetch_two())
+    assert queued.count(host) == 2
+    assert requests.count("stub") == 2
+    # The second request waited for a token, outside of nest_http_seconds.
+    assert web_client.limiters[host].max_queued >= 0.05
+
+
+def test_persisted_responses_hold_no_parameters(loop, upstream, session,
+                                                tmp_path):
+    upstream.release.set()
+    web_client = WebClient(session, ttl={"stub": 60}, path=str(tmp_path),
+                           size=1)
+
+    async def fetch(key: str):
+        await web_client.fetch(upstream.url(), api="stub",
+                               params={"k": key})
+        # Files are written and deleted in the executor.
+        await asyncio.sleep(0.1)
+
+    loop.run_until_complete(fetch("secret-api-key"))
+    files = os.listdir(str(tmp_path))
+    assert len(files) == 1
+    assert b"secret-api-key" not in (tmp_path / files[0]).read_bytes()
+
+    # Evicting the response from memory deletes its file.
+    loop.run_until_complete(fetch("other"))
+    assert len(os.listdir(str(tmp_path))) == 1
+    assert os.listdir(str(tmp_path)) != files
+
+
+def test_persisted_responses_round_trip(session, tmp_path):
+    web_client = WebClient(session, path=str(tmp_path))
+    headers = CIMultiDict([("ETag", '"1"'), ("Set-Cookie", "a"),
+                           ("Set-Cookie", "b")])
+    body = bytes(range(256))
+    expires = time.time() + 60
+    web_client._write(("key", ()), CacheEntry(Response(200, headers, body),
+                                              expires))
+
+    entry = web_client._read(("key", ()))
+    assert entry.expires == expires
+    assert entry.response.status == 200
+    assert entry.response.headers == headers
+    assert entry.response.body == body
+    assert web_client._read(("other", ())) is None
+
+
+def test_expired_files_are_swept(session, tmp_path):
+    writer = WebClient(session, path=str(tmp_path), max_stale=10)
+    response = Response(200, {}, b"{}")
+    writer._write(("fresh", ()), CacheEntry(response, time.time() + 60))
+    writer._write(("stale", ()), CacheEntry(response, time.time() - 60))
+    (tmp_path / "unrelated.txt").write_bytes(b"")
+
+    WebClient(session, path=str(tmp_path), max_stale=10)
+    assert sorted(os.listdir(str(tmp_path))) == sorted([
+        os.path.basename(writer._filename(("fresh", ()))), "unrelated.txt",
+    ])
@@ -0,0 +1,41 @@
+"""
+Compile translations into one catalog per locale.
+
+Reads ``nest/i18n.json`` and ``modules/*/i18n/*.json`` and writes
+``<locale>.cat`` files, which the bot loads instead of the JSON files when
+``i18n.catalog`` points at their directory and they are up to date.
+Run from the repository root:
+
+    python -m utils.build_i18n --output build/i18n
+"""
+
+import argparse
+import os
+
+from nest.i18n import I18n
+
+
+def main():
+    """
+    Run as a script.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument(
+        "--output", default=os.path.join("build", "i18n"),
+        help="Directory to write catalogs to.",
+    )
+    args = parser.parse_args()
+
+    i18n = I18n(locale="en_US")
+    for module in sorted(os.listdir("modules")):
+        if not module.startswith("."):
+            i18n.load_module(module)
+
+    for path in i18n.build(args.output):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Manage the partitioned command log and its hourly rollup.
+
+Create the table with `python -m utils.migrate apply --partitioned`, which also
+creates the rollup, then run `maintain` periodically (e.g. hourly from cron):
+
+    python -m utils.command_log maintain --retention 6
+"""
+
+import argparse
+import asyncio
+import re
+from datetime import date
+
+import asyncpg
+
+PARTITION_NAME = "command_y{year:04d}m{month:02d}"
+PARTITION_RE = re.compile(r"^command_y(\d{4})m(\d{2})$")
+
+SQL_CREATE = """
+CREATE TABLE IF NOT EXISTS command (
+    id BIGINT NOT NULL,
+    command TEXT,
+    message TEXT,
+    author BIGINT,
+    guild BIGINT,
+    created TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, created)
+) PARTITION BY RANGE (created);
+CREATE INDEX IF NOT EXISTS command_guild_created ON command (guild, created);
+"""
+
+SQL_PARTITION = """
+CREATE TABLE IF NOT EXISTS {name} PARTITION OF command
+    FOR VALUES FROM ('{start}') TO ('{end}');
+"""
+
+SQL_PARTITIONS = """
+SELECT child.relname FROM pg_inherits
+    JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+    JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+    WHERE parent.relname = 'command';
+"""
+
+# Recount the most recent hours, so late rows are picked up. The range
+# condition on created lets the planner skip every older partition.
+# DMs have no guild and are counted under guild 0.
+SQL_ROLLUP = """
+INSERT INTO command_hourly (hour, command, guild, count)
+    SELECT date_trunc('hour', created), command, COALESCE(guild, 0), count(*)
+        FROM command
+        WHERE created >= date_trunc('hour', now()) - $1 * interval '1 hour'
+        GROUP BY 1, 2, 3
+    ON CONFLICT (hour, command, guild) DO UPDATE SET count = EXCLUDED.count;
+"""
+
+SQL_TOP_COMMANDS = """
+SELECT command, sum(count) AS uses FROM command_hourly
+    WHERE hour >= now() - interval '7 days'
+    GROUP BY command ORDER BY uses DESC LIMIT $1;
+"""
+
+
+def add_months(day: date, months: int) -> date:
+    """Return the first day of the month `months` after `day`."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_queries(today: date, ahead: int):
+    """Build queries creating partitions from this month to `ahead` months on."""
+    queries = []
+    for offset in range(ahead + 1):
+        start = add_months(today, offset)
+        end = add_months(start, 1)
+        name = PARTITION_NAME.format(year=start.year, month=start.month)
+        queries.append(SQL_PARTITION.format(name=name, start=start, end=end))
+    return queries
+
+
+async def create(conn: asyncpg.Connection, ahead: int = 2):
+    """Create the partitioned table and upcoming partitions."""
+    kind = await conn.fetchval(
+        "SELECT relkind FROM pg_class WHERE relname = 'command'"
+    )
+    if kind not in (None, "p"):
+        raise SystemExit(
+            "command exists and is not partitioned, migrate it manually."
+        )
+
+    await conn.execute(SQL_CREATE)
+    for query in partition_queries(date.today(), ahead):
+        await conn.execute(query)
+
+
+async def drop_partitions(conn: asyncpg.Connection, retention: int):
+    """Drop partitions that end before the last `retention` months."""
+    cutoff = add_months(date.today(), -retention)
+    dropped = []
+
+    for record in await conn.fetch(SQL_PARTITIONS):
+        match = PARTITION_RE.match(record["relname"])
+        if not match:
+            continue
+        start = date(int(match.group(1)), int(match.group(2)), 1)
+        if add_months(start, 1) <= cutoff:
+            await conn.execute(f"DROP TABLE {record['relname']}")
+            dropped.append(record["relname"])
+
+    return dropped
+
+
+async def maintain(conn: asyncpg.Connection, retention: int, ahead: int,
+                   hours: int):
+    """Create upcoming partitions, drop expired ones and update the rollup."""
+    for query in partition_queries(date.today(), ahead):
+        await conn.execute(query)
+
+    for name in await drop_partitions(conn, retention):
+        print(f"Dropped {name}")
+
+    await conn.execute(SQL_ROLLUP, hours)
+
+
+async def top(conn: asyncpg.Connection, limit: int):
+    """Print the most used commands of the last week from the rollup."""
+    for record in await conn.fetch(SQL_TOP_COMMANDS, limit):
+        print(f"{record['command']}: {record['uses']}")
+
+
+async def run(args):
+    conn = await asyncpg.connect(database=args.database)
+    try:
+        if args.action == "maintain":
+            await maintain(conn, args.retention, args.ahead, args.hours)
+        else:
+            await top(conn, args.limit)
+    finally:
+        await conn.close()
+
+
+def main():
+    """
+    Run as a script.
+    """
+    # migrate imports this module for the partitioned table.
+    from utils import migrate
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("action", choices=("maintain", "top"))
+    parser.add_argument("--database", default=migrate.default_database())
+    parser.add_argument(
+        "--ahead", type=int, default=2,
+        help="Months of partitions to create in advance.",
+    )
+    parser.add_argument(
+        "--retention", type=int, default=6,
+        help="Months of raw command rows to keep.",
+    )
+    parser.add_argument(
+        "--hours", type=int, default=2,
+        help="Hours of rows to recount into the rollup.",
+    )
+    parser.add_argument("--limit", type=int, default=10)
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,452 @@
+"""
+Migrate the database schema to what the loaded modules need.
+
+Modules declare columns in ``db.yml`` and may ship versioned SQL migrations
+as ``modules/<module>/migrations/<version>_<name>.sql``. ``apply`` first
+creates missing tables and columns declared in ``db.yml``, then runs every
+migration not yet recorded in the ``schema_migrations`` table.
+
+A migration runs in a single transaction, unless its first line is
+``-- nest: no-transaction`` or it uses ``CONCURRENTLY``. Such migrations
+run one ``;``-terminated statement at a time, so that they can build
+indexes without locking writes. They should be idempotent, e.g. with
+``IF NOT EXISTS``, in case a statement fails halfway through. An index
+left INVALID by a failed ``CREATE INDEX CONCURRENTLY`` is dropped before
+the statement is retried, as ``IF NOT EXISTS`` would skip it otherwise.
+
+    python -m utils.migrate plan       # Show what apply would do
+    python -m utils.migrate apply      # Apply it without prompting
+    python -m utils.migrate status     # List applied and pending versions
+
+The database is taken from --dsn/--database, the NESTBOT_DATABASE
+environment variable or the database setting in config.yml, in that order.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import sys
+from collections import namedtuple
+from typing import Dict, List
+
+import asyncpg
+import yaml
+
+from utils import command_log
+
+MODULES = "modules"
+LOCK_ID = 0x6E657374  # "nest"
+LOCK_POLL = 1
+INDEX_RETRIES = 2
+
+SQL_TABLECREATE = "CREATE TABLE IF NOT EXISTS {table} (id BIGINT PRIMARY KEY);"
+SQL_ADDCOLUMN = "ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {field} {ftype};"
+SQL_ALTERTYPE = (
+    "ALTER TABLE {table} ALTER COLUMN {field} TYPE {ftype} "
+    "USING {field}::{ftype};"
+)
+
+SQL_VERSIONS = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    module TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    applied TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (module, version)
+);
+"""
+
+SQL_LIVE_COLUMNS = """
+SELECT c.relname AS table, a.attname AS field,
+       format_type(a.atttypid, a.atttypmod) AS ftype
+    FROM pg_attribute a
+    JOIN pg_class c ON a.attrelid = c.oid
+    JOIN pg_namespace n ON c.relnamespace = n.oid
+    WHERE n.nspname = current_schema()
+        AND c.relkind IN ('r', 'p')
+        AND NOT c.relispartition
+        AND a.attnum > 0
+        AND NOT a.attisdropped;
+"""
+
+FILENAME_RE = re.compile(r"^(\d+)_(\w+)\.sql$")
+NO_TRANSACTION_RE = re.compile(r"^--\s*nest:\s*no-transaction\s*$", re.M)
+CONCURRENTLY_RE = re.compile(r"\bCONCURRENTLY\b", re.I)
+# Comments, quoted strings and identifiers, dollar-quoted bodies, and the
+# semicolons that end statements outside of them.
+STATEMENT_RE = re.compile(
+    r"""
+    --[^\n]*
+    | /\*.*?\*/
+    | '(?:[^']|'')*'
+    | "(?:[^"]|"")*"
+    | \$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?\$(?P=tag)\$
+    | (?P<end>;)
+    """,
+    re.S | re.X,
+)
+CREATE_INDEX_RE = re.compile(
+    r"^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+"
+    r"(?:IF\s+NOT\s+EXISTS\s+)?((?:\w+\.)?\w+)",
+    re.I | re.M,
+)
+
+# Words that end the type in a db.yml column definition.
+CONSTRAINT_RE = re.compile(
+    r"\s+(?:NOT|NULL|DEFAULT|PRIMARY|REFERENCES|UNIQUE|CHECK|COLLATE)\b",
+    re.I,
+)
+# Aliases mapped to the names format_type() returns.
+TYPE_ALIASES = {
+    "int": "integer",
+    "int4": "integer",
+    "int8": "bigint",
+    "int2": "smallint",
+    "bool": "boolean",
+    "float": "double precision",
+    "float8": "double precision",
+    "float4": "real",
+    "timestamptz": "timestamp with time zone",
+    "timestamp": "timestamp without time zone",
+    "varchar": "character varying",
+}
+
+Migration = namedtuple(
+    "Migration", "module version name sql checksum transactional"
+)
+
+
+def normalize_type(ftype: str) -> str:
+    """Reduce a column definition to its type, as named by format_type()."""
+    ftype = CONSTRAINT_RE.split(ftype, 1)[0].strip().lower()
+    base, paren, rest = ftype.partition("(")
+    base = TYPE_ALIASES.get(base.strip(), base.strip())
+    return base + paren + rest.replace(" ", "") if paren else base
+
+
+def load_declared() -> Dict[str, Dict[str, str]]:
+    """
+    Load fields and types from module configurations.
+    """
+    data = {}
+
+    for module in sorted(os.listdir(MODULES)):
+        path = os.path.join(MODULES, module, "db.yml")
+        if module.startswith(".") or not os.path.exists(path):
+            continue
+        with open(path) as dbdata:
+            for table, fields in (yaml.safe_load(dbdata) or {}).items():
+                data.setdefault(table, {}).update(fields)
+
+    return data
+
+
+def load_migrations() -> List[Migration]:
+    """
+    Load SQL migrations of every module, ordered by module and version.
+    """
+    migrations = []
+
+    for module in sorted(os.listdir(MODULES)):
+        path = os.path.join(MODULES, module, "migrations")
+        if module.startswith(".") or not os.path.isdir(path):
+            continue
+
+        versions = set()
+        for filename in sorted(os.listdir(path)):
+            match = FILENAME_RE.match(filename)
+            if not match:
+                continue
+
+            version = int(match.group(1))
+            if version in versions:
+                raise SystemExit(f"{module} has two migrations {version}.")
+            versions.add(version)
+
+            with open(os.path.join(path, filename)) as file:
+                sql = file.read()
+
+            migrations.append(Migration(
+                module=module,
+                version=version,
+                name=match.group(2),
+                sql=sql,
+                checksum=hashlib.sha256(sql.encode()).hexdigest(),
+                transactional=not (
+                    NO_TRANSACTION_RE.search(sql)
+                    or CONCURRENTLY_RE.search(sql)
+                ),
+            ))
+
+    return migrations
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split a migration into statements, dropping comment-only chunks.
+
+    Semicolons within comments, quotes and ``$$``-quoted function bodies
+    do not end a statement.
+    """
+    statements = []
+    start = last = 0
+    code = False
+    for match in STATEMENT_RE.finditer(sql + ";"):
+        # Text between tokens is code, unless it is only whitespace.
+        code = code or bool(sql[last:match.start()].strip())
+        last = match.end()
+        if match.group("end") is not None:
+            if code:
+                statements.append(sql[start:match.start()].strip())
+            start = last
+            code = False
+        elif not match.group().startswith(("--", "/*")):
+            code = True
+    return statements
+
+
+def index_name(statement: str):
+    """Name of the index a ``CREATE INDEX CONCURRENTLY`` builds, if any."""
+    code = "\n".join(
+        line for line in statement.splitlines()
+        if not line.strip().startswith("--")
+    )
+    match = CREATE_INDEX_RE.match(code)
+    return match.group(1) if match else None
+
+
+async def drop_invalid_index(conn: asyncpg.Connection, index: str):
+    """Drop an index left INVALID by a failed concurrent build."""
+    valid = await conn.fetchval(
+        "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)",
+        index,
+    )
+    if valid is False:
+        print(f"Dropping invalid index {index}", file=sys.stderr)
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index}")
+
+
+async def run_statement(conn: asyncpg.Connection, statement: str):
+    """Run a statement outside a transaction, rebuilding failed indexes."""
+    index = index_name(statement)
+    if index is None:
+        await conn.execute(statement)
+        return
+
+    for attempt in range(INDEX_RETRIES + 1):
+        await drop_invalid_index(conn, index)
+        try:
+            await conn.execute(statement)
+            return
+        except asyncpg.PostgresError as error:
+            if attempt == INDEX_RETRIES:
+                raise
+            print(f"Building {index} failed, retrying: {error}",
+                  file=sys.stderr)
+
+
+async def fetch_live(conn: asyncpg.Connection) -> Dict[str, Dict[str, str]]:
+    """Read the columns of every table in the live schema."""
+    live = {}
+    for record in await conn.fetch(SQL_LIVE_COLUMNS):
+        live.setdefault(record["table"], {})[record["field"]] = record["ftype"]
+    return live
+
+
+def diff(declared: Dict[str, Dict[str, str]],
+         live: Dict[str, Dict[str, str]]):
+    """Compute statements bringing the live schema to the declared one.
+
+    Returns
+    -------
+    Tuple[List[str], List[str]]
+        Additive statements, and type changes that rewrite the table.
+    """
+    additive = []
+    rewrites = []
+
+    for table, fields in declared.items():
+        columns = live.get(table)
+        if columns is None:
+            additive.append(SQL_TABLECREATE.format(table=table))
+            columns = {}
+
+        for field, ftype in fields.items():
+            if field not in columns:
+                additive.append(
+                    SQL_ADDCOLUMN.format(table=table, field=field, ftype=ftype)
+                )
+            elif normalize_type(ftype) != columns[field]:
+                rewrites.append(SQL_ALTERTYPE.format(
+                    table=table, field=field, ftype=normalize_type(ftype)
+                ))
+
+    return additive, rewrites
+
+
+async def fetch_applied(conn: asyncpg.Connection) -> Dict[tuple, str]:
+    """Map (module, version) of applied migrations to their checksum."""
+    exists = await conn.fetchval("SELECT to_regclass('schema_migrations')")
+    if not exists:
+        return {}
+    records = await conn.fetch(
+        "SELECT module, version, checksum FROM schema_migrations"
+    )
+    return {(r["module"], r["version"]): r["checksum"] for r in records}
+
+
+async def pending(conn: asyncpg.Connection) -> List[Migration]:
+    """Return migrations not applied yet, warning about edited ones."""
+    applied = await fetch_applied(conn)
+    result = []
+
+    for migration in load_migrations():
+        checksum = applied.get((migration.module, migration.version))
+        if checksum is None:
+            result.append(migration)
+        elif checksum != migration.checksum:
+            print(
+                f"Warning: {migration.module} {migration.version} was "
+                "edited after it was applied.",
+                file=sys.stderr,
+            )
+
+    return result
+
+
+async def run_migration(conn: asyncpg.Connection, migration: Migration):
+    record = (
+        "INSERT INTO schema_migrations (module, version, name, checksum) "
+        "VALUES ($1, $2, $3, $4)"
+    )
+    args = (migration.module, migration.version, migration.name,
+            migration.checksum)
+
+    if migration.transactional:
+        async with conn.transaction():
+            await conn.execute(migration.sql)
+            await conn.execute(record, *args)
+        return
+
+    for statement in split_statements(migration.sql):
+        await run_statement(conn, statement)
+    await conn.execute(record, *args)
+
+
+async def plan(conn: asyncpg.Connection, args):
+    additive, rewrites = diff(load_declared(), await fetch_live(conn))
+
+    for statement in additive:
+        print(statement)
+    for statement in rewrites:
+        print(statement, "-- rewrites table, needs --allow-type-changes")
+    for migration in await pending(conn):
+        mode = "" if migration.transactional else " (no transaction)"
+        print(f"-- {migration.module} {migration.version:04d}_"
+              f"{migration.name}{mode}")
+
+
+async def lock(conn: asyncpg.Connection):
+    """Wait until no other process is migrating.
+
+    ``pg_advisory_lock`` would hold a snapshot while waiting, which
+    ``CREATE INDEX CONCURRENTLY`` in the process holding the lock waits
+    for in turn, so the lock is polled instead.
+    """
+    waiting = False
+    while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", LOCK_ID):
+        if not waiting:
+            print("Waiting for another migration to finish", file=sys.stderr)
+            waiting = True
+        await asyncio.sleep(LOCK_POLL)
+
+
+async def apply(conn: asyncpg.Connection, args):
+    # Only one process may migrate at a time, e.g. during rolling deploys.
+    await lock(conn)
+    try:
+        await conn.execute(SQL_VERSIONS)
+        if args.partitioned:
+            await command_log.create(conn)
+
+        additive, rewrites = diff(load_declared(), await fetch_live(conn))
+        if rewrites and not args.allow_type_changes:
+            for statement in rewrites:
+                print(f"Skipping {statement}", file=sys.stderr)
+            rewrites = []
+
+        for statement in additive + rewrites:
+            print(statement)
+            await conn.execute(statement)
+
+        for migration in await pending(conn):
+            print(f"Applying {migration.module} "
+                  f"{migration.version:04d}_{migration.name}")
+            await run_migration(conn, migration)
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", LOCK_ID)
+
+
+async def status(conn: asyncpg.Connection, args):
+    applied = await fetch_applied(conn)
+    for migration in load_migrations():
+        state = "applied" if (
+            migration.module, migration.version
+        ) in applied else "pending"
+        print(f"{migration.module} {migration.version:04d}_"
+              f"{migration.name}: {state}")
+
+
+def default_database() -> str:
+    """Find the database name from the environment or config.yml."""
+    if "NESTBOT_DATABASE" in os.environ:
+        return os.environ["NESTBOT_DATABASE"]
+    if os.path.isfile("config.yml"):
+        with open("config.yml") as file:
+            config = yaml.safe_load(file)
+        database = config.get("settings", {}).get("database")
+        if isinstance(database, str):
+            return database
+    return "nest"
+
+
+async def run(args):
+    conn = await asyncpg.connect(
+        dsn=args.dsn, database=args.database or default_database()
+    )
+    try:
+        await ACTIONS[args.action](conn, args)
+    finally:
+        await conn.close()
+
+
+ACTIONS = {"plan": plan, "apply": apply, "status": status}
+
+
+def main():
+    """
+    Run as a script.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument("action", choices=ACTIONS)
+    parser.add_argument("--dsn", help="libpq connection string or URI.")
+    parser.add_argument("--database", help="Database name.")
+    parser.add_argument(
+        "--partitioned", action="store_true",
+        help="Create the command log as a monthly partitioned table.",
+    )
+    parser.add_argument(
+        "--allow-type-changes", action="store_true",
+        help="Apply column type changes, which rewrite the table.",
+    )
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()